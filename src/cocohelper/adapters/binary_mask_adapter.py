@@ -145,6 +145,10 @@ class BinaryMaskDatasetAdapter(DatasetAdapter):
         """
         Separates disjoint objects inside the same array.
 
+        Each object is extracted from the crop of its bounding box
+        (`scipy.ndimage.find_objects`), so encoding it costs time and memory
+        proportional to its size rather than to the size of the mask.
+
         Objects are separated based on two rules:
           1. objects have different labels in the input mask (e.g. one is
             associated with 1, the other with 2);
@@ -175,18 +179,24 @@ class BinaryMaskDatasetAdapter(DatasetAdapter):
             if class_val == 0:
                 continue
 
-            labeled_array, num_feature = ndimage.label((mask == class_val).astype(int), **kwargs)
+            labeled_array, num_feature = ndimage.label(mask == class_val, **kwargs)
 
-            for label_id in range(1, num_feature + 1):
-                instance = np.zeros_like(labeled_array)
-                instance[labeled_array == label_id] = 1
+            # each instance is processed on the crop of its bounding box only:
+            for label_id, slices in enumerate(ndimage.find_objects(labeled_array), start=1):
+                if slices is None:
+                    continue
+                instance = (labeled_array[slices] == label_id).astype(labeled_array.dtype)
+                offset = (slices[0].start, slices[1].start)
 
                 # encode segmentation in COCO format from numpy array
-                segm = encode_mask(instance, mode=mode, compression_factor=compression_factor)
+                segm = encode_mask(instance, mode=mode, compression_factor=compression_factor,
+                                   offset=offset, size=mask.shape)
                 segmentations.extend(segm)  # segm is already a list of polygons for the same class --> extend
 
                 # compute bounding box from mask
                 bbox = self.extract_bbox_from_binary_mask(instance)
+                bbox[0] += offset[1]
+                bbox[1] += offset[0]
                 bounding_boxes.append(bbox)
 
                 categories.append(self.categories[class_val]['id'])
@@ -0,0 +1,479 @@
+"""
+Evaluate object detection and instance segmentation predictions with the COCO metrics.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Union
+import dataclasses
+import numpy as np
+import pandas as pd
+from pycocotools import mask as coco_mask
+from cocohelper import COCOHelper
+
+
+# Evaluation parameters, the same of `pycocotools.cocoeval.Params`:
+IOU_THRESHOLDS = np.linspace(.5, 0.95, int(np.round((0.95 - .5) / .05)) + 1, endpoint=True)
+RECALL_THRESHOLDS = np.linspace(.0, 1.00, int(np.round((1.00 - .0) / .01)) + 1, endpoint=True)
+MAX_DETECTIONS = (1, 10, 100)
+AREA_RANGES = {
+    'all': (0 ** 2, 1e5 ** 2),
+    'small': (0 ** 2, 32 ** 2),
+    'medium': (32 ** 2, 96 ** 2),
+    'large': (96 ** 2, 1e5 ** 2),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class COCOEvaluation:
+    """
+    The results of a COCO evaluation, laid out as in `COCOeval.eval`.
+
+    Attributes:
+        cat_ids: the ids of the evaluated categories (K).
+        precision: the interpolated precision, with shape T×R×K×A×M (IoU
+            thresholds, recall thresholds, categories, area ranges, max
+            detections). Missing values are -1.
+        recall: the recall, with shape T×K×A×M. Missing values are -1.
+        scores: the score of the detections at each recall threshold, with
+            the same shape of `precision`.
+    """
+    cat_ids: np.ndarray
+    precision: np.ndarray
+    recall: np.ndarray
+    scores: np.ndarray
+
+    @property
+    def stats(self) -> np.ndarray:
+        """The 12 summary metrics, in the order of `COCOeval.stats`."""
+        return np.array([
+            self._summarize(ap=True),
+            self._summarize(ap=True, iou_thr=.5),
+            self._summarize(ap=True, iou_thr=.75),
+            self._summarize(ap=True, area_rng='small'),
+            self._summarize(ap=True, area_rng='medium'),
+            self._summarize(ap=True, area_rng='large'),
+            self._summarize(ap=False, max_dets=MAX_DETECTIONS[0]),
+            self._summarize(ap=False, max_dets=MAX_DETECTIONS[1]),
+            self._summarize(ap=False, max_dets=MAX_DETECTIONS[2]),
+            self._summarize(ap=False, area_rng='small'),
+            self._summarize(ap=False, area_rng='medium'),
+            self._summarize(ap=False, area_rng='large'),
+        ])
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Get the summary metrics by name.
+
+        Returns:
+            A dictionary with AP, AP50, AP75, APs, APm, APl, AR1, AR10, AR100,
+            ARs, ARm and ARl.
+        """
+        names = ['AP', 'AP50', 'AP75', 'APs', 'APm', 'APl', 'AR1', 'AR10', 'AR100', 'ARs', 'ARm', 'ARl']
+        return dict(zip(names, self.stats.tolist()))
+
+    def _summarize(
+            self,
+            ap: bool,
+            iou_thr: float = None,
+            area_rng: str = 'all',
+            max_dets: int = MAX_DETECTIONS[-1]
+    ) -> float:
+        """Average the precision (or the recall) over the valid entries, as `COCOeval.summarize` does."""
+        a = list(AREA_RANGES).index(area_rng)
+        m = MAX_DETECTIONS.index(max_dets)
+        values = self.precision[..., a, m] if ap else self.recall[..., a, m]
+        if iou_thr is not None:
+            values = values[np.where(iou_thr == IOU_THRESHOLDS)[0]]
+        values = values[values > -1]
+        return float(np.mean(values)) if len(values) > 0 else -1.
+
+
+class COCOEvaluator:
+
+    def __init__(
+            self,
+            coco_helper: COCOHelper,
+            iou_type: str = 'bbox',
+            num_workers: int = 0
+    ):
+        """
+        Evaluate predictions against a ground-truth dataset with the COCO
+        metrics (mAP and mAR), as `pycocotools.cocoeval.COCOeval` does.
+
+        Instead of evaluating each (image, category) pair with Python loops,
+        the evaluation works on the arrays of the annotations tables:
+          - the IoU of all the (prediction, ground-truth) pairs of the same
+            image and category are computed at once (bounding boxes are
+            compared with NumPy, masks with `pycocotools.mask.iou`);
+          - the greedy matching runs over the prediction ranks: the r-th
+            prediction of every image is matched at once, for all the IoU
+            thresholds and area ranges;
+          - precision and recall are accumulated over the sorted predictions
+            of each category with cumulative sums.
+
+        Categories are independent: with `num_workers > 0` they are evaluated
+        by a pool of threads.
+
+        The results are the same of `COCOeval`, except for ground truth
+        annotations with id 0: pycocotools takes their matches as misses,
+        while here matches never depend on the annotation ids.
+
+        Args:
+            coco_helper: the ground-truth dataset.
+            iou_type: the type of IoU, either 'bbox' or 'segm'.
+            num_workers: Number of threads evaluating the categories. If 0,
+                the categories are evaluated in the calling thread.
+        """
+        if iou_type not in ('bbox', 'segm'):
+            raise ValueError(f"COCOEvaluator: unsupported iou_type '{iou_type}', use 'bbox' or 'segm'.")
+        if num_workers < 0:
+            raise ValueError("COCOEvaluator: `num_workers` must be non-negative.")
+        self._coco_helper = coco_helper
+        self._iou_type = iou_type
+        self._num_workers = num_workers
+
+        imgs, anns = coco_helper.imgs, coco_helper.anns
+        self._img_ids = np.unique(imgs.index.to_numpy())
+        self._cat_ids = np.unique(coco_helper.cats.index.to_numpy())
+        self._img_sizes = imgs[~imgs.index.duplicated()][['height', 'width']]
+
+        keep = anns['image_id'].isin(self._img_ids).to_numpy() & anns['category_id'].isin(self._cat_ids).to_numpy()
+        anns = anns[keep]
+        crowd = anns['iscrowd'].to_numpy() if 'iscrowd' in anns.columns else np.zeros(len(anns))
+        self._gt = _Instances(
+            img_ids=anns['image_id'].to_numpy(),
+            cat_ids=anns['category_id'].to_numpy(),
+            areas=anns['area'].to_numpy(dtype=float),
+            crowd=crowd.astype(bool),
+            scores=np.zeros(len(anns)),
+            regions=self._regions(anns),
+        ).sorted_by_image()
+
+    @property
+    def coco_helper(self) -> COCOHelper:
+        return self._coco_helper
+
+    def evaluate(
+            self,
+            predictions: Union[pd.DataFrame, List[dict]]
+    ) -> COCOEvaluation:
+        """
+        Evaluate the predictions.
+
+        Args:
+            predictions: the predictions, either as a table or as a list of
+                records in the COCO results format. Each prediction has an
+                'image_id', a 'category_id', a 'score', and a 'bbox' (for the
+                'bbox' IoU type) or a 'segmentation' (for the 'segm' IoU type).
+                Predictions of categories that are not in the ground truth are
+                not evaluated.
+
+        Returns:
+            The evaluation results.
+
+        Raises:
+            ValueError: if some predictions refer to images that are not in
+                the ground truth, or if the predictions miss the columns
+                needed by the IoU type.
+        """
+        dts = self._prepare_predictions(pd.DataFrame(predictions))
+        gts = self._gt
+        cat_ids = self._cat_ids
+        gt_bounds = np.searchsorted(gts.cat_ids, cat_ids, side='left'), np.searchsorted(gts.cat_ids, cat_ids, 'right')
+        dt_bounds = np.searchsorted(dts.cat_ids, cat_ids, side='left'), np.searchsorted(dts.cat_ids, cat_ids, 'right')
+
+        def evaluate_category(k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            return self._evaluate_category(gts[gt_bounds[0][k]:gt_bounds[1][k]], dts[dt_bounds[0][k]:dt_bounds[1][k]])
+
+        if self._num_workers > 0:
+            with ThreadPoolExecutor(max_workers=self._num_workers) as executor:
+                results = list(executor.map(evaluate_category, range(len(cat_ids))))
+        else:
+            results = [evaluate_category(k) for k in range(len(cat_ids))]
+
+        T, R, A, M = len(IOU_THRESHOLDS), len(RECALL_THRESHOLDS), len(AREA_RANGES), len(MAX_DETECTIONS)
+        precision = -np.ones((T, R, len(cat_ids), A, M))
+        recall = -np.ones((T, len(cat_ids), A, M))
+        scores = -np.ones((T, R, len(cat_ids), A, M))
+        for k, (cat_precision, cat_recall, cat_scores) in enumerate(results):
+            precision[:, :, k] = cat_precision
+            recall[:, k] = cat_recall
+            scores[:, :, k] = cat_scores
+        return COCOEvaluation(cat_ids=cat_ids, precision=precision, recall=recall, scores=scores)
+
+    def _prepare_predictions(self, preds: pd.DataFrame) -> "_Instances":
+        """Get the predictions of the evaluated categories, sorted by category, image and score."""
+        missing = {'image_id', 'category_id', 'score'} - set(preds.columns)
+        if len(preds) > 0 and len(missing) > 0:
+            raise ValueError(f"COCOEvaluator: the predictions miss the columns {sorted(missing)}.")
+        if len(preds) == 0:
+            return _Instances.empty(self._iou_type)
+        if not preds['image_id'].isin(self._img_ids).all():
+            raise ValueError("COCOEvaluator: some predictions refer to images that are not in the ground truth.")
+        # areas are computed as in `COCO.loadRes`: from the boxes, if the predictions have them, else from the masks.
+        has_boxes = 'bbox' in preds.columns and np.ndim(preds['bbox'].iloc[0]) > 0 and len(preds['bbox'].iloc[0]) > 0
+        preds = preds[preds['category_id'].isin(self._cat_ids).to_numpy()]
+        if not has_boxes and 'segmentation' not in preds.columns:
+            raise ValueError("COCOEvaluator: the predictions need a 'bbox' or a 'segmentation' column.")
+        if self._iou_type == 'segm' and 'segmentation' not in preds.columns:
+            raise ValueError("COCOEvaluator: the predictions need a 'segmentation' column for the 'segm' IoU type.")
+        rles = self._rles(preds) if self._iou_type == 'segm' or not has_boxes else None
+        if has_boxes:
+            boxes = _boxes(preds['bbox'])
+            areas = boxes[:, 2] * boxes[:, 3]
+        else:
+            boxes = coco_mask.toBbox(rles).reshape(-1, 4)
+            areas = coco_mask.area(rles).astype(float)
+
+        dts = _Instances(
+            img_ids=preds['image_id'].to_numpy(),
+            cat_ids=preds['category_id'].to_numpy(),
+            areas=areas,
+            crowd=np.zeros(len(preds), dtype=bool),
+            scores=preds['score'].to_numpy(dtype=float),
+            regions=rles if self._iou_type == 'segm' else boxes,
+        ).sorted_by_image()
+        # only the best `MAX_DETECTIONS[-1]` predictions of each image (and category) are evaluated:
+        return dts[dts.ranks() < MAX_DETECTIONS[-1]]
+
+    def _regions(self, anns: pd.DataFrame) -> Union[np.ndarray, List[dict]]:
+        """Get the regions compared by the IoU type: the boxes, or the RLEs of the masks."""
+        return _boxes(anns['bbox']) if self._iou_type == 'bbox' else self._rles(anns)
+
+    def _rles(self, anns: pd.DataFrame) -> List[dict]:
+        """Convert the segmentations to compressed RLEs, as `COCO.annToRLE` does."""
+        sizes = self._img_sizes.reindex(anns['image_id'])
+        rles = []
+        for segm, height, width in zip(anns['segmentation'], sizes['height'].tolist(), sizes['width'].tolist()):
+            if isinstance(segm, list):
+                rles.append(coco_mask.merge(coco_mask.frPyObjects(segm, height, width)))
+            elif isinstance(segm['counts'], list):
+                rles.append(coco_mask.frPyObjects(segm, height, width))
+            else:
+                rles.append(segm)
+        return rles
+
+    def _ious(self, gts: "_Instances", dts: "_Instances") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute the IoU of the (prediction, ground truth) pairs of the same
+        image, for the predictions and ground truths of a category.
+
+        Returns:
+            The positions of the predictions and of the ground truths of each
+            pair, and their IoU.
+        """
+        gt_starts = np.searchsorted(gts.img_ids, dts.img_ids, side='left')
+        gt_counts = np.searchsorted(gts.img_ids, dts.img_ids, side='right') - gt_starts
+        pair_dts = np.repeat(np.arange(len(dts)), gt_counts)
+        pair_offsets = np.arange(len(pair_dts)) - np.repeat(np.cumsum(gt_counts) - gt_counts, gt_counts)
+        pair_gts = np.repeat(gt_starts, gt_counts) + pair_offsets
+
+        if self._iou_type == 'bbox':
+            return pair_dts, pair_gts, _box_ious(dts.regions[pair_dts], gts.regions[pair_gts], gts.crowd[pair_gts])
+
+        # pairs are sorted by prediction, then by ground truth: the pairs of each image are a contiguous block.
+        ious = np.empty(len(pair_dts))
+        img_ids, dt_starts, dt_counts = np.unique(dts.img_ids, return_index=True, return_counts=True)
+        gt_starts = np.searchsorted(gts.img_ids, img_ids, side='left')
+        gt_counts = np.searchsorted(gts.img_ids, img_ids, side='right') - gt_starts
+        block_start = 0
+        for dt_start, dt_count, gt_start, gt_count in zip(dt_starts.tolist(), dt_counts.tolist(),
+                                                          gt_starts.tolist(), gt_counts.tolist()):
+            if gt_count == 0:
+                continue
+            block = coco_mask.iou(dts.regions[dt_start:dt_start + dt_count], gts.regions[gt_start:gt_start + gt_count],
+                                  gts.crowd[gt_start:gt_start + gt_count].astype(np.uint8).tolist())
+            ious[block_start:block_start + dt_count * gt_count] = np.asarray(block).ravel()
+            block_start += dt_count * gt_count
+        return pair_dts, pair_gts, ious
+
+    def _evaluate_category(
+            self,
+            gts: "_Instances",
+            dts: "_Instances"
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Evaluate the predictions of a category.
+
+        Args:
+            gts: the ground truths of the category, sorted by image.
+            dts: the predictions of the category, sorted by image and score.
+
+        Returns:
+            The precision (T×R×A×M), the recall (T×A×M) and the scores
+            (T×R×A×M) of the category.
+        """
+        T, R, A, M = len(IOU_THRESHOLDS), len(RECALL_THRESHOLDS), len(AREA_RANGES), len(MAX_DETECTIONS)
+        precision, recall, scores = -np.ones((T, R, A, M)), -np.ones((T, A, M)), -np.ones((T, R, A, M))
+        area_rngs = np.array(list(AREA_RANGES.values()))
+        # ground truths not ignored in each area range (crowds are always ignored):
+        gt_valid = ~gts.crowd & (gts.areas >= area_rngs[:, :1]) & (gts.areas <= area_rngs[:, 1:])
+        num_valid = gt_valid.sum(axis=1)
+        if not num_valid.any():
+            return precision, recall, scores
+
+        dt_matched, dt_ignored = self._match(gts, dts, gt_valid)
+        # unmatched predictions out of the area range are ignored:
+        dt_out_of_range = (dts.areas < area_rngs[:, :1]) | (dts.areas > area_rngs[:, 1:])
+        dt_ignored |= ~dt_matched & dt_out_of_range[:, np.newaxis, :]
+
+        # predictions of all the images sorted by score, as in `COCOeval.accumulate`:
+        ranks = dts.ranks()
+        order = np.lexsort((np.arange(len(dts)), dts.img_ids, -dts.scores))
+        for m, max_dets in enumerate(MAX_DETECTIONS):
+            dt_order = order[ranks[order] < max_dets]
+            dt_scores = dts.scores[dt_order]
+            matched, ignored = dt_matched[:, :, dt_order], dt_ignored[:, :, dt_order]
+            tp_sums = np.cumsum(matched & ~ignored, axis=2).astype(dtype=float)
+            fp_sums = np.cumsum(~matched & ~ignored, axis=2).astype(dtype=float)
+            num_dts = len(dt_order)
+            for a in range(A):
+                if num_valid[a] == 0:
+                    continue
+                tp, fp = tp_sums[a], fp_sums[a]
+                rc = tp / num_valid[a]
+                pr = tp / (fp + tp + np.spacing(1))
+                recall[:, a, m] = rc[:, -1] if num_dts > 0 else 0
+                # interpolated precision: the maximum precision at any higher recall.
+                pr = np.maximum.accumulate(pr[:, ::-1], axis=1)[:, ::-1]
+                for t in range(T):
+                    inds = np.searchsorted(rc[t], RECALL_THRESHOLDS, side='left')
+                    found = inds < num_dts
+                    inds = inds[found]
+                    precision[t, :, a, m] = 0
+                    precision[t, :len(inds), a, m] = pr[t, inds]
+                    scores[t, :, a, m] = 0
+                    scores[t, :len(inds), a, m] = dt_scores[inds]
+        return precision, recall, scores
+
+    def _match(
+            self,
+            gts: "_Instances",
+            dts: "_Instances",
+            gt_valid: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Greedily match the predictions of a category with its ground truths.
+
+        Each prediction, from the highest score, is matched with the ground
+        truth with the highest IoU above the threshold that is not matched
+        yet (crowds can be matched many times); ground truths not ignored are
+        preferred, and ties go to the last ground truth, as in
+        `COCOeval.evaluateImg`. The predictions of different images never
+        compete for the same ground truth, so the r-th predictions of all the
+        images are matched at once.
+
+        Args:
+            gts: the ground truths of the category, sorted by image.
+            dts: the predictions of the category, sorted by image and score.
+            gt_valid: the ground truths not ignored in each area range (A×G).
+
+        Returns:
+            Two A×T×D boolean arrays, telling whether each prediction is
+            matched, and whether it is matched with an ignored ground truth.
+        """
+        T, A = len(IOU_THRESHOLDS), len(gt_valid)
+        dt_matched = np.zeros((A, T, len(dts)), dtype=bool)
+        dt_ignored = np.zeros((A, T, len(dts)), dtype=bool)
+        thresholds = np.minimum(IOU_THRESHOLDS, 1 - 1e-10)
+        pair_dts, pair_gts, pair_ious = self._ious(gts, dts)
+        candidates = np.flatnonzero(pair_ious >= thresholds.min())
+        ranks = dts.ranks()
+        # candidate pairs sorted by prediction rank, prediction, IoU and ground truth:
+        order = candidates[np.lexsort((pair_gts[candidates], pair_ious[candidates], pair_dts[candidates],
+                                       ranks[pair_dts[candidates]]))]
+        pair_dts, pair_gts, pair_ious = pair_dts[order], pair_gts[order], pair_ious[order]
+        if len(pair_dts) == 0:
+            return dt_matched, dt_ignored
+
+        gt_matched = np.zeros((A, T, len(gts)), dtype=bool)
+        pair_ranks = ranks[pair_dts]
+        rank_bounds = np.flatnonzero(np.diff(pair_ranks)) + 1
+        for start, end in zip(np.r_[0, rank_bounds].tolist(), np.r_[rank_bounds, len(pair_dts)].tolist()):
+            rank_dts, rank_gts, rank_ious = pair_dts[start:end], pair_gts[start:end], pair_ious[start:end]
+            dt_starts = np.r_[0, np.flatnonzero(np.diff(rank_dts)) + 1]
+            dt_counts = np.diff(np.r_[dt_starts, len(rank_dts)])
+            # position of each pair among the pairs of its prediction, sorted by IoU and ground truth:
+            positions = np.arange(len(rank_dts)) - np.repeat(dt_starts, dt_counts)
+            num_positions = int(dt_counts.max())
+
+            available = ~gt_matched[:, :, rank_gts] | gts.crowd[rank_gts]
+            above = rank_ious >= thresholds[:, np.newaxis]
+            # the best pair of each prediction has the highest key: not ignored first, then by IoU and ground truth.
+            keys = gt_valid[:, rank_gts][:, np.newaxis, :] * num_positions + positions + 1
+            keys = np.where(available & above, keys, 0)
+            best = np.maximum.reduceat(keys, dt_starts, axis=2)
+
+            a, t, d = np.nonzero(best)
+            best_pairs = dt_starts[d] + (best[a, t, d] - 1) % num_positions
+            matched_gts, matched_dts = rank_gts[best_pairs], rank_dts[best_pairs]
+            gt_matched[a, t, matched_gts] = True
+            dt_matched[a, t, matched_dts] = True
+            dt_ignored[a, t, matched_dts] = ~gt_valid[a, matched_gts]
+        return dt_matched, dt_ignored
+
+
+@dataclasses.dataclass(frozen=True)
+class _Instances:
+    """The ground truths or the predictions evaluated, as parallel arrays."""
+    img_ids: np.ndarray
+    cat_ids: np.ndarray
+    areas: np.ndarray
+    crowd: np.ndarray
+    scores: np.ndarray
+    regions: Union[np.ndarray, List[dict]]
+
+    @staticmethod
+    def empty(iou_type: str) -> "_Instances":
+        return _Instances(img_ids=np.empty(0, dtype=np.int64), cat_ids=np.empty(0, dtype=np.int64),
+                          areas=np.empty(0), crowd=np.empty(0, dtype=bool), scores=np.empty(0),
+                          regions=np.empty((0, 4)) if iou_type == 'bbox' else [])
+
+    def __len__(self) -> int:
+        return len(self.img_ids)
+
+    def __getitem__(self, selector: Union[slice, np.ndarray]) -> "_Instances":
+        if isinstance(self.regions, list):
+            positions = np.arange(len(self))[selector]
+            regions = [self.regions[pos] for pos in positions.tolist()]
+        else:
+            regions = self.regions[selector]
+        return _Instances(img_ids=self.img_ids[selector], cat_ids=self.cat_ids[selector], areas=self.areas[selector],
+                          crowd=self.crowd[selector], scores=self.scores[selector], regions=regions)
+
+    def sorted_by_image(self) -> "_Instances":
+        """Sort (stably) by category, image and decreasing score."""
+        return self[np.lexsort((np.arange(len(self)), -self.scores, self.img_ids, self.cat_ids))]
+
+    def ranks(self) -> np.ndarray:
+        """The position of each instance among the instances of the same category and image (once sorted)."""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        new_group = np.r_[True, (np.diff(self.img_ids) != 0) | (np.diff(self.cat_ids) != 0)]
+        group_starts = np.flatnonzero(new_group)
+        group_ids = np.cumsum(new_group) - 1
+        return np.arange(len(self)) - group_starts[group_ids]
+
+
+def _boxes(bboxes: pd.Series) -> np.ndarray:
+    """Stack the [x, y, width, height] boxes of a column."""
+    return np.array(bboxes.tolist(), dtype=float).reshape(-1, 4)
+
+
+def _box_ious(dt_boxes: np.ndarray, gt_boxes: np.ndarray, crowd: np.ndarray) -> np.ndarray:
+    """
+    Compute the IoU of pairs of boxes, with the same operations of
+    `pycocotools.mask.iou`: for crowd ground truths, the union is the area of
+    the prediction.
+    """
+    widths = np.minimum(dt_boxes[:, 2] + dt_boxes[:, 0], gt_boxes[:, 2] + gt_boxes[:, 0]) - \
+        np.maximum(dt_boxes[:, 0], gt_boxes[:, 0])
+    heights = np.minimum(dt_boxes[:, 3] + dt_boxes[:, 1], gt_boxes[:, 3] + gt_boxes[:, 1]) - \
+        np.maximum(dt_boxes[:, 1], gt_boxes[:, 1])
+    dt_areas = dt_boxes[:, 2] * dt_boxes[:, 3]
+    gt_areas = gt_boxes[:, 2] * gt_boxes[:, 3]
+    intersections = widths * heights
+    unions = np.where(crowd, dt_areas, dt_areas + gt_areas - intersections)
+    overlap = (widths > 0) & (heights > 0)
+    ious = np.zeros(len(dt_boxes))
+    np.divide(intersections, unions, out=ious, where=overlap)
+    return ious
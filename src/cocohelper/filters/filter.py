@@ -2,8 +2,9 @@
 Generic Filter interface and filtering operations.
 """
 from pandas import DataFrame
-from typing import Tuple
+from typing import List, Tuple
 from numbers import Number
+import numpy as np
 import abc
 from abc import ABC
 import warnings
@@ -29,6 +30,24 @@ class Filter(ABC):
         """
         pass
 
+    def mask(
+            self,
+            df: DataFrame
+    ) -> np.ndarray:
+        """
+        Get a boolean mask of the rows of the DataFrame kept by the filter.
+
+        By default, the mask is computed from the index of the rows returned
+        by `apply`: all the rows sharing the index of a kept row are kept.
+
+        Args:
+            df: DataFrame to filter.
+
+        Returns:
+            A boolean array with an element for each row of the DataFrame.
+        """
+        return df.index.isin(self.apply(df).index)
+
 
 class ComposeFilter(Filter, ABC):
 
@@ -39,15 +58,16 @@ class ComposeFilter(Filter, ABC):
         """
         Generic interface for filter composition.
 
+        Composite filters combine the boolean masks of their filters and slice
+        the DataFrame only once. As for multi-row DataFrames (with duplicated
+        indices, e.g. images joined with their annotations), each filter keeps
+        or discards all the rows sharing the same index.
+
         Args:
             *filters: The filters to combine.
         """
         self._filters = filters
 
-
-class AndFilter(ComposeFilter):
-    """Composite filters with an 'and' behaviour."""
-
     def apply(
             self,
             df: DataFrame
@@ -62,31 +82,43 @@ class AndFilter(ComposeFilter):
             The filtered DataFrame.
         """
         if len(self._filters) > 0:
-            filtered_indices = [set(fltr.apply(df).index) for fltr in self._filters]
-            return df.loc[list(set.intersection(*filtered_indices))].sort_index()
+            return df[self.mask(df)]
         return df
 
+    def _filters_masks(
+            self,
+            df: DataFrame
+    ) -> List[np.ndarray]:
+        """Get the masks of the composed filters, extended to all the rows sharing the same index."""
+        return [_index_level_mask(df, fltr.mask(df)) for fltr in self._filters]
 
-class OrFilter(ComposeFilter):
-    """Composite filters with an 'or' behaviour."""
 
-    def apply(
+class AndFilter(ComposeFilter):
+    """Composite filters with an 'and' behaviour."""
+
+    def mask(
             self,
             df: DataFrame
-    ) -> DataFrame:
-        """
-        Applies the filter to the given DataFrame.
+    ) -> np.ndarray:
+        mask = np.ones(len(df), dtype=bool)
+        for fltr_mask in self._filters_masks(df):
+            mask &= fltr_mask
+        return mask
 
-        Args:
-            df: DataFrame to filter.
 
-        Returns:
-            The filtered DataFrame.
-        """
-        if len(self._filters) > 0:
-            filtered_indices = [set(fltr.apply(df).index) for fltr in self._filters]
-            return df.loc[list(set.union(*filtered_indices))].sort_index()
-        return df
+class OrFilter(ComposeFilter):
+    """Composite filters with an 'or' behaviour."""
+
+    def mask(
+            self,
+            df: DataFrame
+    ) -> np.ndarray:
+        if len(self._filters) == 0:
+            return np.ones(len(df), dtype=bool)
+        mask = np.zeros(len(df), dtype=bool)
+        for fltr_mask in self._filters_masks(df):
+            mask |= fltr_mask
+        return mask
 
 
 class NotFilter(Filter):
@@ -117,8 +149,13 @@ class NotFilter(Filter):
         Returns:
             The filtered DataFrame.
         """
-        ids = self._filter.apply(df).index
-        return df[~df.index.isin(ids)]
+        return df[self.mask(df)]
+
+    def mask(
+            self,
+            df: DataFrame
+    ) -> np.ndarray:
+        return ~_index_level_mask(df, self._filter.mask(df))
 
 
 class ColumnFilter(Filter, ABC):
@@ -162,6 +199,28 @@ class ColumnFilter(Filter, ABC):
             warnings.warn("Filtering a dataframe using a column that does not exist: returning original data.")
         return df
 
+    def mask(
+            self,
+            df: DataFrame
+    ) -> np.ndarray:
+        """
+        Get a boolean mask of the rows of the DataFrame kept by the filter.
+
+        Args:
+            df: DataFrame to filter.
+
+        Returns:
+            A boolean array with an element for each row of the DataFrame.
+        """
+        if self._values is None:
+            return np.ones(len(df), dtype=bool)
+        elif self._column in df.columns:
+            return self._mask(self._values, self._column, df)
+        elif self._column == df.index.name:
+            return self._mask(self._values, self._column, df.reset_index())
+        warnings.warn("Filtering a dataframe using a column that does not exist: returning original data.")
+        return np.ones(len(df), dtype=bool)
+
     @abc.abstractmethod
     def _apply(
             self,
@@ -182,6 +241,25 @@ class ColumnFilter(Filter, ABC):
         """
         pass
 
+    def _mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        """
+        Get a boolean mask of the given DataFrame rows kept by the filter.
+
+        Args:
+            values: values to filter in the DataFrame.
+            column: column to filter in the DataFrame.
+            df: DataFrame to filter.
+
+        Returns:
+            A boolean array with an element for each row of the DataFrame.
+        """
+        return df.index.isin(self._apply(values, column, df).index)
+
 
 class ValueFilter(ColumnFilter):
 
@@ -255,6 +333,14 @@ class ValueFilter(ColumnFilter):
         """
         return self._strategy.apply(values, column, df)
 
+    def _mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return self._strategy.mask(values, column, df)
+
 
 class RangeFilter(ColumnFilter):
 
@@ -308,3 +394,21 @@ class RangeFilter(ColumnFilter):
             The filtered DataFrame.
         """
         return self._strategy.apply(values, column, df)
+
+    def _mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return self._strategy.mask(values, column, df)
+
+
+def _index_level_mask(
+        df: DataFrame,
+        mask: np.ndarray
+) -> np.ndarray:
+    """Extend a mask over the rows of a DataFrame to all the rows sharing the index of a selected row."""
+    if df.index.is_unique:
+        return mask
+    return df.index.isin(df.index[mask])
@@ -0,0 +1,217 @@
+"""
+Query plans evaluating filters on the COCO tables without joining them.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from pandas import DataFrame
+import pandas as pd
+import numpy as np
+import abc
+from abc import ABC
+from cocohelper.filters.filter import Filter, AndFilter, OrFilter, NotFilter, ValueFilter, RangeFilter
+from cocohelper.filters.strategies.strategies import HavingValueFilterStrategy, AnyValueFilterStrategy, \
+    AllValueFilterStrategy, InRangeFilterStrategy, NotInRangeFilterStrategy
+
+
+if TYPE_CHECKING:
+    from cocohelper import COCOHelper
+
+
+# Strategies evaluating each row on its own: on tables with unique ids they give the same result on the owner table
+# and on the annotations joined with it.
+_ROW_WISE_STRATEGIES = (HavingValueFilterStrategy, AnyValueFilterStrategy, AllValueFilterStrategy,
+                        InRangeFilterStrategy, NotInRangeFilterStrategy)
+
+
+class PlanNode(ABC):
+    """A node of a filter query plan, evaluated to a mask over the annotations."""
+
+    @abc.abstractmethod
+    def evaluate(self, plan: FilterPlan) -> np.ndarray:
+        """
+        Evaluate the node.
+
+        Args:
+            plan: the plan the node belongs to, giving access to the tables.
+
+        Returns:
+            A boolean mask over the rows of the annotations table.
+        """
+        pass
+
+
+class AndNode(PlanNode):
+
+    def __init__(self, *nodes: PlanNode):
+        """Keep the annotations selected by all the child nodes."""
+        self.nodes = nodes
+
+    def evaluate(self, plan: FilterPlan) -> np.ndarray:
+        mask = np.ones(len(plan.anns), dtype=bool)
+        for node in self.nodes:
+            mask &= node.evaluate(plan)
+        return mask
+
+
+class OrNode(PlanNode):
+
+    def __init__(self, *nodes: PlanNode):
+        """Keep the annotations selected by at least one of the child nodes."""
+        self.nodes = nodes
+
+    def evaluate(self, plan: FilterPlan) -> np.ndarray:
+        if len(self.nodes) == 0:
+            return np.ones(len(plan.anns), dtype=bool)
+        mask = np.zeros(len(plan.anns), dtype=bool)
+        for node in self.nodes:
+            mask |= node.evaluate(plan)
+        return mask
+
+
+class NotNode(PlanNode):
+
+    def __init__(self, node: PlanNode):
+        """Keep the annotations not selected by the child node."""
+        self.node = node
+
+    def evaluate(self, plan: FilterPlan) -> np.ndarray:
+        return ~self.node.evaluate(plan)
+
+
+class LeafNode(PlanNode):
+
+    def __init__(
+            self,
+            fltr: Filter,
+            table: str
+    ):
+        """
+        Evaluate a column filter on the table owning the column.
+
+        The filter is applied to the owner table, then the result is
+        propagated to the annotations through their foreign key (a semi-join).
+        Annotations whose foreign key does not exist in the owner table get
+        the result of the filter on a row of missing values, as in a left join.
+
+        Args:
+            fltr: the filter.
+            table: the owner table, one of 'annotations', 'images' or
+                'categories'.
+        """
+        self.filter = fltr
+        self.table = table
+
+    def evaluate(self, plan: FilterPlan) -> np.ndarray:
+        table = plan.tables[self.table]
+        mask = self.filter.mask(table)
+        if self.table == 'annotations':
+            return mask
+        missing_row = DataFrame({col: [np.nan] for col in table.columns},
+                                index=pd.Index([_missing_label(table.index)], name=table.index.name))
+        missing_mask = self.filter.mask(missing_row)
+        # the last position is used for the foreign keys not found (position -1):
+        return np.concatenate([mask, missing_mask])[plan.fk_positions[self.table]]
+
+
+class FilterPlan:
+
+    def __init__(self, coco_helper: COCOHelper):
+        """
+        Evaluate filters on the COCO tables with predicate pushdown.
+
+        `COCOHelper.filter` applies a filter to the annotations joined with
+        their categories and images (`joins.anns_cats_imgs`). A plan gives the
+        same result without computing the join: each column filter is pushed
+        down to the table owning the column (annotations, categories or
+        images), and its result is propagated to the annotations through
+        their foreign keys. Composite filters are then combined as boolean
+        masks over the annotations.
+
+        Args:
+            coco_helper: the COCOHelper object representing a COCO dataset.
+        """
+        self.anns = coco_helper.anns
+        cats = DataFrame(coco_helper.cats)
+        if 'name' in cats.columns:
+            cats = cats.assign(category_name=cats['name'])
+        self.tables: Dict[str, DataFrame] = {
+            'annotations': self.anns,
+            'categories': cats,
+            'images': coco_helper.imgs,
+        }
+        self._fk_columns = {'categories': 'category_id', 'images': 'image_id'}
+        self._fk_positions: Dict[str, np.ndarray] = dict()
+
+    @property
+    def fk_positions(self) -> Dict[str, np.ndarray]:
+        """Positions in the categories and images tables of the annotations' foreign keys (-1 if not found)."""
+        if len(self._fk_positions) == 0:
+            for table, fk_column in self._fk_columns.items():
+                self._fk_positions[table] = self.tables[table].index.get_indexer(self.anns[fk_column])
+        return self._fk_positions
+
+    def is_supported(self) -> bool:
+        """Check if the tables allow pushdown: ids must be unique and foreign key columns must exist."""
+        return all(table.index.is_unique for table in self.tables.values()) and \
+            all(fk_column in self.anns.columns for fk_column in self._fk_columns.values())
+
+    def compile(self, fltr: Filter) -> Optional[PlanNode]:
+        """
+        Compile a filter to a plan.
+
+        Args:
+            fltr: the filter.
+
+        Returns:
+            The root node of the plan, or None if the filter (or one of its
+            components) is not supported: only `AndFilter`, `OrFilter`,
+            `NotFilter`, and `ValueFilter`/`RangeFilter` with the builtin
+            strategies can be pushed down.
+        """
+        if type(fltr) in (AndFilter, OrFilter):
+            nodes = [self.compile(f) for f in fltr._filters]
+            if any(node is None for node in nodes):
+                return None
+            return AndNode(*nodes) if type(fltr) is AndFilter else OrNode(*nodes)
+        if type(fltr) is NotFilter:
+            node = self.compile(fltr._filter)
+            return NotNode(node) if node is not None else None
+        if type(fltr) in (ValueFilter, RangeFilter) and isinstance(fltr._strategy, _ROW_WISE_STRATEGIES):
+            return LeafNode(fltr, self._owner_table(fltr._column))
+        return None
+
+    def _owner_table(self, column: str) -> str:
+        """Get the table owning a column of the annotations joined with categories and images."""
+        for name, table in self.tables.items():
+            if column in table.columns or column == table.index.name:
+                return name
+        # the filter will warn and keep all the rows, as on the join:
+        return 'annotations'
+
+    def execute(self, fltr: Filter) -> Optional[Tuple[DataFrame, DataFrame, DataFrame]]:
+        """
+        Filter the dataset, keeping the annotations selected by the filter and
+        the images and categories they refer to.
+
+        Args:
+            fltr: the filter.
+
+        Returns:
+            The filtered categories, images and annotations, or None if the
+            filter can't be evaluated with a plan.
+        """
+        root = self.compile(fltr)
+        if root is None or not self.is_supported():
+            return None
+        anns = self.anns[root.evaluate(self)]
+        cats = self.tables['categories'].reindex(pd.unique(anns['category_id']))
+        cats = cats[[col for col in cats.columns if col != 'category_name']]
+        imgs = self.tables['images'].reindex(pd.unique(anns['image_id']))
+        return cats, imgs, anns
+
+
+def _missing_label(index: pd.Index):
+    """Get a label that does not exist in an index."""
+    if pd.api.types.is_numeric_dtype(index) and len(index) > 0:
+        return index.max() + 1
+    return object()
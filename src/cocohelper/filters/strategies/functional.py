@@ -1,10 +1,12 @@
 """
 Filtering strategies, as functions.
 """
-from typing import Optional, Any, Tuple, Set
+from typing import Optional, Any, Tuple
 from pandas import DataFrame
 from pandas.core.dtypes.inference import is_list_like
+from pandas.api.types import is_scalar
 import pandas as pd
+import numpy as np
 
 
 def filter_multi_rows_having_any(
@@ -14,10 +16,19 @@ def filter_multi_rows_having_any(
 ) -> DataFrame:
     if values is None:
         return df
-    ids: Set[int] = set()
-    for val in values:
-        ids = ids.union(set(df[df[column] == val].index))
-    return df.loc[list(ids)]
+    return df[multi_rows_having_any_mask(values, column, df)]
+
+
+def multi_rows_having_any_mask(
+        values: Optional[Any],
+        column: str,
+        df: pd.DataFrame
+) -> np.ndarray:
+    if values is None:
+        return np.ones(len(df), dtype=bool)
+    values, _ = _split_missing(values)
+    hits = df[column].isin(values).to_numpy()
+    return df.index.isin(df.index[hits])
 
 
 def filter_rows_having(
@@ -27,8 +38,18 @@ def filter_rows_having(
 ) -> DataFrame:
     if values is None:
         return df
+    return df[rows_having_mask(values, column, df)]
+
+
+def rows_having_mask(
+        values: Optional[Any],
+        column: str,
+        df: pd.DataFrame
+) -> np.ndarray:
+    if values is None:
+        return np.ones(len(df), dtype=bool)
     values = [values] if not is_list_like(values) else values
-    return df[df[column].isin(values)]
+    return df[column].isin(values).to_numpy()
 
 
 def filter_multi_rows_having_all(
@@ -38,12 +59,39 @@ def filter_multi_rows_having_all(
 ) -> DataFrame:
     if values is None:
         return df
-    values = [values] if not is_list_like(values) else values
+    return df[multi_rows_having_all_mask(values, column, df)]
+
+
+def multi_rows_having_all_mask(
+        values: Optional[Any],
+        column: str,
+        df: pd.DataFrame
+) -> np.ndarray:
+    if values is None:
+        return np.ones(len(df), dtype=bool)
+    values, has_missing = _split_missing(values)
+    values = list(dict.fromkeys(values))
+    if has_missing:
+        # missing values never compare equal: no multi-row can have them.
+        return np.zeros(len(df), dtype=bool)
+    if len(values) == 0:
+        return np.ones(len(df), dtype=bool)
+
+    # One pass over the column: position of each row value among the requested values (-1 if not requested).
+    value_codes = pd.Index(values).get_indexer(df[column])
+    group_codes, groups = pd.factorize(df.index, use_na_sentinel=False)
+    found = value_codes >= 0
+    # Count the distinct requested values found in each multi-row (group of rows sharing the index).
+    pairs = np.unique(group_codes[found].astype(np.int64) * len(values) + value_codes[found])
+    counts = np.bincount(pairs // len(values), minlength=len(groups))
+    return (counts == len(values))[group_codes]
 
-    ids = set(df.index)
-    for val in values:
-        ids = ids.intersection(set(df[df[column] == val].index))
-    return df.loc[list(ids)]
+
+def _split_missing(values: Any) -> Tuple[list, bool]:
+    """Convert the values to a list, removing the missing ones (NaN, None), and report if any was removed."""
+    values = [values] if not is_list_like(values) else list(values)
+    missing = [v is None or (is_scalar(v) and pd.isna(v)) for v in values]
+    return [v for v, is_missing in zip(values, missing) if not is_missing], any(missing)
 
 
 def filter_rows_in_range(
@@ -52,11 +100,22 @@ def filter_rows_in_range(
         df: pd.DataFrame,
         inclusive: str = "both"
 ) -> DataFrame:
+    if rng is None:
+        return df
+    return df[rows_in_range_mask(rng, column, df, inclusive)]
+
+
+def rows_in_range_mask(
+        rng: Optional[Tuple[int, int]],
+        column: str,
+        df: pd.DataFrame,
+        inclusive: str = "both"
+) -> np.ndarray:
     if inclusive is True or inclusive is False:
         inclusive = "both" if inclusive else "neither"
 
     if rng is None:
-        return df
+        return np.ones(len(df), dtype=bool)
     else:
         if inclusive == "both":
             left, right = rng[0] <= df[column], df[column] <= rng[1]
@@ -68,7 +127,7 @@ def filter_rows_in_range(
             left, right = rng[0] < df[column], df[column] < rng[1]
         else:
             raise ValueError("Parameter `inclusive` has to be either string of 'both', 'left', 'right', or 'neither'.")
-        return df[left * right]
+        return (left * right).to_numpy(dtype=bool)
 
 
 def filter_rows_out_range(
@@ -77,11 +136,22 @@ def filter_rows_out_range(
         df: pd.DataFrame,
         inclusive: str = "none"
 ) -> DataFrame:
+    if rng is None:
+        return df
+    return df[rows_out_range_mask(rng, column, df, inclusive)]
+
+
+def rows_out_range_mask(
+        rng: Optional[Tuple[int, int]],
+        column: str,
+        df: pd.DataFrame,
+        inclusive: str = "none"
+) -> np.ndarray:
     if inclusive is True or inclusive is False:
         inclusive = "both" if inclusive else "neither"
 
     if rng is None:
-        return df
+        return np.ones(len(df), dtype=bool)
     else:
         if inclusive == "both":
             left, right = df[column] <= rng[0], rng[1] <= df[column]
@@ -93,4 +163,4 @@ def filter_rows_out_range(
             left, right = df[column] < rng[0], rng[1] < df[column]
         else:
             raise ValueError("Parameter `inclusive` has to be either string of 'both', 'left', 'right', or 'neither'.")
-        return df[left + right]
+        return (left + right).to_numpy(dtype=bool)
@@ -3,12 +3,14 @@
 from __future__ import annotations  # for sure needed for python <= 3.7, don't know about python 3.8+
 from typing import TYPE_CHECKING, Tuple
 from pandas import DataFrame
+import numpy as np
 import abc
 from abc import ABC
 
 from cocohelper.filters.strategies.functional import filter_multi_rows_having_any, filter_multi_rows_having_all, \
     filter_rows_in_range, \
-    filter_rows_out_range, filter_rows_having
+    filter_rows_out_range, filter_rows_having, rows_having_mask, rows_in_range_mask, rows_out_range_mask, \
+    multi_rows_having_any_mask, multi_rows_having_all_mask
 
 
 if TYPE_CHECKING:
@@ -27,6 +29,15 @@ class ValueFilterStrategy(ABC):
     ):
         pass
 
+    def mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        """Boolean mask of the rows kept by `apply` (rows sharing the index of a kept row are kept too)."""
+        return df.index.isin(self.apply(values, column, df).index)
+
     def __call__(
             self,
             fltr: ValueFilter
@@ -47,6 +58,14 @@ class HavingValueFilterStrategy(ValueFilterStrategy):
     ) -> DataFrame:
         return filter_rows_having(values, column, df)
 
+    def mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return rows_having_mask(values, column, df)
+
 
 class AnyValueFilterStrategy(ValueFilterStrategy):
     """
@@ -129,6 +148,14 @@ class AnyValueFilterStrategy(ValueFilterStrategy):
     ) -> DataFrame:
         return filter_multi_rows_having_any(values, column, df)
 
+    def mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return multi_rows_having_any_mask(values, column, df)
+
 
 class AllValueFilterStrategy(ValueFilterStrategy):
     """
@@ -209,6 +236,14 @@ class AllValueFilterStrategy(ValueFilterStrategy):
     ) -> DataFrame:
         return filter_multi_rows_having_all(values=values, column=column, df=df)
 
+    def mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return multi_rows_having_all_mask(values=values, column=column, df=df)
+
 
 # RANGE FILTER STRATEGY
 class RangeFilterStrategy(ABC):
@@ -223,6 +258,15 @@ class RangeFilterStrategy(ABC):
     ) -> DataFrame:
         pass
 
+    def mask(
+            self,
+            values,
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        """Boolean mask of the rows kept by `apply` (rows sharing the index of a kept row are kept too)."""
+        return df.index.isin(self.apply(values, column, df).index)
+
     def __call__(
             self,
             fltr: RangeFilter
@@ -242,6 +286,14 @@ class InRangeFilterStrategy(RangeFilterStrategy):
     ) -> DataFrame:
         return filter_rows_in_range(rng=rng, column=column, df=df)
 
+    def mask(
+            self,
+            rng: Tuple[int, int],
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return rows_in_range_mask(rng=rng, column=column, df=df)
+
 
 class NotInRangeFilterStrategy(RangeFilterStrategy):
     """Strategy to filter rows in dataframe having values out of a certain range."""
@@ -254,6 +306,14 @@ class NotInRangeFilterStrategy(RangeFilterStrategy):
     ) -> DataFrame:
         return filter_rows_out_range(rng=rng, column=column, df=df)
 
+    def mask(
+            self,
+            rng: Tuple[int, int],
+            column: str,
+            df: DataFrame
+    ) -> np.ndarray:
+        return rows_out_range_mask(rng=rng, column=column, df=df)
+
 
 HAVING_VALUE = HavingValueFilterStrategy()
 ANY_VALUE = AnyValueFilterStrategy()
@@ -7,30 +7,39 @@ from pycocotools.coco import COCO
 from json import JSONDecodeError
 from pandas import DataFrame
 from pathlib import Path
-from PIL import Image
 import datetime as dt
 import pandas as pd
 import numpy as np
 import dataclasses
+import functools
 import logging
 import copy
+import pickle
 import json
 import os
-from cocohelper.utils.dataframe import df_to_records, drop_duplicate_rows, fix_fk_after_drop_duplicate
+from cocohelper.utils.dataframe import df_to_records, df_to_records_chunks, drop_duplicate_rows, \
+    fix_fk_after_drop_duplicate, remap_ids
+from cocohelper.utils.jsonstream import read_coco_tables, open_json_file, JsonObjectWriter
+from cocohelper.utils.columnar import save_tables, load_tables, file_fingerprint
+from cocohelper.utils.image import read_image, ImageCache, ImagePrefetcher
 from cocohelper.errors.not_found_error import COCOImageNotFoundError, COCOAnnotationNotFoundError
 from cocohelper.filters.filter import Filter, AndFilter, NotFilter, ComposeFilter
 from cocohelper.errors.validation_error import COCOValidationError
 from cocohelper.utils.colmapper import ColMap, ColsMapper
 from cocohelper.filters import cocofilters as cfilters
+from cocohelper.filters.plan import FilterPlan
 from cocohelper.joins import COCOJoins, COCODataFrame
+from cocohelper.index import COCOIndex
+from cocohelper.pycoco import build_coco, copy_coco
 from cocohelper.utils.timer import Timer
 from cocohelper.utils.types._types import IDXSelector
-from cocohelper.validator import COCOValidator
+from cocohelper.validator import COCODataFrameValidator
 
 
 # IMPORTS FOR TYPE-CHECKING ONLY
 if TYPE_CHECKING:
     from cocohelper.transforms import Transform
+    from cocohelper.views import COCODatasetView
 
 
 @dataclasses.dataclass(frozen=True)
@@ -95,6 +104,10 @@ class COCOHelper:
         self._lics = COCODataFrame(lic_df, 'license') if cat_df is not None else None
         self._info = info if info is not None else COCOHelper.new_info_dict()
         self._colmaps: COCOColsMapper = COCOColsMapper()
+        self._index: Optional[COCOIndex] = None
+        self._joins: Optional[COCOJoins] = None
+        self._coco: Optional[COCO] = None
+        self._img_cache: Optional[ImageCache] = None
 
         # validate the dataset
         if validate:
@@ -115,6 +128,10 @@ class COCOHelper:
         When changing categories or images, annotations that
         result as invalid will be removed.
 
+        The copy shares the unchanged dataframes with this dataset, and the new
+        dataframes are wrapped without copying their data: dataframes of a
+        COCOHelper must never be modified in place.
+
         Args:
             cat_df: New category dataframe, optional
             img_df: New image dataframe, optional
@@ -127,7 +144,13 @@ class COCOHelper:
         Returns:
             A new `COCOHelper` object.
         """
-        helper = copy.deepcopy(self)
+        helper = copy.copy(self)
+        helper._info = copy.deepcopy(self._info)
+        helper._paths = copy.copy(self._paths)
+        # cached structures are bound to the tables of this dataset:
+        helper._index = None
+        helper._joins = None
+        helper._coco = None
         if cat_df is not None:
             helper._cats = COCODataFrame(pd.DataFrame(cat_df), 'category')
         if img_df is not None:
@@ -151,9 +174,11 @@ class COCOHelper:
         """Remove annotations that have non-existing image or categories ids."""
         linked_images = self.anns['image_id'].isin(self.imgs.index)
         linked_cats = self.anns['category_id'].isin(self.cats.index)
+        linked = linked_images & linked_cats
 
-        # Update the annotations in self to remove unlinked anns
-        self._anns = COCODataFrame(pd.DataFrame(self.anns[linked_images & linked_cats]), 'annotation')
+        # Update the annotations in self to remove unlinked anns (keeping the same table if all are linked)
+        if not linked.all():
+            self._anns = COCODataFrame(pd.DataFrame(self.anns[linked]), 'annotation')
 
     def _validate(self) -> None:
         """
@@ -167,12 +192,32 @@ class COCOHelper:
             logging.error(f" Validation checks ({num_passed}/{num_checks}): {error_dict}")
             raise COCOValidationError()
 
-    def to_coco(self) -> COCO:
-        """Convert `COCOHelper` to `pycocotools.COCO`"""
-        coco = COCO(None)
-        coco.dataset = self.to_json_dataset()
-        coco.createIndex()
-        return coco
+    def to_coco(self, cached: bool = True) -> COCO:
+        """
+        Convert `COCOHelper` to `pycocotools.COCO`.
+
+        The COCO object is built directly from the tables (see `build_coco`)
+        and, by default, cached: the following calls reuse the built records
+        and lookup structures, without converting the dataset again. Since a
+        COCOHelper is never modified in place, the cache is never outdated
+        (copies and filtered datasets build their own COCO object).
+
+        Each call returns a new COCO object with its own annotation dicts
+        (see `copy_coco`), since `COCOeval` writes to them: evaluating it
+        does not alter the cache.
+
+        Args:
+            cached: If True, reuse the cached COCO records. If False, build a
+                new COCO object from scratch.
+
+        Returns:
+            A `pycocotools.COCO` object with the dataset.
+        """
+        if not cached:
+            return build_coco(self)
+        if self._coco is None:
+            self._coco = build_coco(self)
+        return copy_coco(self._coco)
 
     #
     # # # # # # # # # # # #
@@ -248,7 +293,11 @@ class COCOHelper:
             cls,
             json_annotations_file: str,
             img_dir: str = COCOHelperPaths.img_dir,
-            validate: bool = False
+            validate: bool = False,
+            stream: bool = False,
+            skip_columns: Optional[Sequence[str]] = None,
+            use_cache: bool = False,
+            cache_dir: Optional[Union[str, Path]] = None
     ) -> COCOHelper:
         """
         Create COCOHelper from json annotation file of the COCO dataset stored in a directory.
@@ -259,13 +308,29 @@ class COCOHelper:
             img_dir: name/relative-path to the directory where images are
                 stored, respect to the coco dataset root.
             validate: If True, validate the dataset.
+            stream: If True, parse the json file incrementally, building the
+                dataframes column by column. This keeps the peak memory close
+                to the size of the final dataframes, and is advised for very
+                large annotation files.
+            skip_columns: columns of the COCO tables that are not loaded (e.g.
+                `['segmentation']`). Used only if `stream=True`.
+            use_cache: If True, load the dataset from its columnar cache (see
+                `save_cache`) when the cache is up-to-date with the json file,
+                otherwise parse the json file and (re)write the cache.
+            cache_dir: directory of the columnar cache. By default, the cache
+                is stored next to the json file, in `<json file>.cache/`.
 
         Returns:
             A COCOHelper object.
         """
         # TODO add coco_dir parameter and change the anns_dir accordingly if specified.
+        if use_cache:
+            return cls._load_json_with_cache(json_annotations_file, img_dir, validate, stream, skip_columns, cache_dir)
         try:
-            annotations = cls._read_annotations_file(json_annotations_file)
+            if stream:
+                annotations = cls._stream_annotations_file(json_annotations_file, skip_columns)
+            else:
+                annotations = cls._read_annotations_file(json_annotations_file)
             ann_dir = os.path.dirname(json_annotations_file)
             ann_fname = os.path.basename(json_annotations_file)
         except FileNotFoundError as e:
@@ -288,15 +353,15 @@ class COCOHelper:
     ) -> COCOHelper:
 
         with Timer("Loading dataframes...", "Done: ", log_fn=logging.info):
-            imgs_df = DataFrame.from_records(annotations['images'])
-            anns_df = DataFrame.from_records(annotations['annotations'])
+            imgs_df = _to_dataframe(annotations['images'])
+            anns_df = _to_dataframe(annotations['annotations'])
             cats_df = None
             lics_df = None
             info = None
             if 'categories' in annotations.keys():
-                cats_df = DataFrame.from_records(annotations['categories'])
+                cats_df = _to_dataframe(annotations['categories'])
             if 'licenses' in annotations.keys():
-                lics_df = DataFrame.from_records(annotations['licenses'])
+                lics_df = _to_dataframe(annotations['licenses'])
             if 'info' in annotations.keys():
                 info = annotations['info']
 
@@ -305,21 +370,171 @@ class COCOHelper:
                                      coco_dir=coco_dir, paths=paths, validate=validate)
         return coco_helper
 
-    def write_annotations_file(self, annotation_file_path: Union[str, Path]):
-        """Save the current COCOHelper as a COCO json file."""
+    def write_annotations_file(
+            self,
+            annotation_file_path: Union[str, Path],
+            compact: bool = False,
+            chunk_size: int = 10000
+    ):
+        """
+        Save the current COCOHelper as a COCO json file.
+
+        The tables are serialized one chunk of rows at a time, directly to the
+        file, so the whole json text is never held in memory. The file is
+        gzip-compressed if its name ends with `.gz`.
+
+        Args:
+            annotation_file_path: path to the output json file.
+            compact: If True, write the json without indentation and spaces,
+                otherwise indent it by 4 spaces (as `json.dump(indent=4)`).
+            chunk_size: number of rows of the tables serialized at a time.
+        """
         os.makedirs(os.path.dirname(annotation_file_path), exist_ok=True)
-        with open(annotation_file_path, 'w') as ann_file:
-            ann_file.write(json.dumps(self.to_json_dataset(), indent=4))
+        indent, separators = (None, (',', ':')) if compact else (4, None)
+        tables = {
+            'categories': (self.cats, self._colmaps.cat),
+            'images': (self.imgs, self._colmaps.img),
+            'annotations': (self.anns, self._colmaps.ann),
+            'licenses': (self.licenses, self._colmaps.lic),
+        }
+        with open_json_file(annotation_file_path, 'w') as ann_file:
+            with JsonObjectWriter(ann_file, indent=indent, separators=separators) as writer:
+                for key, (table, colmap) in tables.items():
+                    writer.write_array_chunks(key, df_to_records_chunks(table, colmap, chunk_size))
+                writer.write('info', self._info)
 
     @classmethod
     def _read_annotations_file(cls, annotation_file: str) -> dict:
         """Read a COCO json file as a dict."""
         with Timer("Loading annotations into memory...", "Done: ", log_fn=logging.info):
-            with open(annotation_file, 'r') as f:
+            with open_json_file(annotation_file, 'r') as f:
                 annotations = json.load(f)
             assert type(annotations) == dict, 'annotation file format {} not supported'.format(type(annotations))
         return annotations
 
+    @classmethod
+    def _stream_annotations_file(
+            cls,
+            annotation_file: str,
+            skip_columns: Optional[Sequence[str]] = None
+    ) -> dict:
+        """Stream a COCO json file as a dict, where the COCO tables are already converted to DataFrames."""
+        with Timer("Streaming annotations into memory...", "Done: ", log_fn=logging.info):
+            with open_json_file(annotation_file, 'r') as f:
+                annotations = read_coco_tables(f, skip_columns=skip_columns)
+        return annotations
+
+    def save_cache(self, cache_dir: Optional[Union[str, Path]] = None) -> Path:
+        """
+        Save the current COCOHelper in a columnar binary format, fast to reload.
+
+        Each column of the `imgs`, `anns`, `cats` and `licenses` tables is
+        stored in its own file: numeric columns as `.npy` files (that are
+        memory-mapped when reloading), object columns (e.g. `file_name`,
+        `bbox`, `segmentation`) pickled. The `info` dict and the
+        `COCOHelperPaths` are stored in a json metadata file.
+
+        The cache is not bound to the source json file (the tables may have
+        been filtered or modified), so `load_json(use_cache=True)` never
+        reuses it: load it with `load_cache`.
+
+        Args:
+            cache_dir: output directory. By default, the cache is stored next
+                to the annotation file, in `<annotation file>.cache/`.
+
+        Returns:
+            The directory where the cache has been stored.
+        """
+        return self._save_cache(cache_dir)
+
+    def _save_cache(
+            self,
+            cache_dir: Optional[Union[str, Path]] = None,
+            skip_columns: Optional[Sequence[str]] = None,
+            source: Optional[dict] = None
+    ) -> Path:
+        """
+        Save the columnar cache, recording the columns skipped when loading the dataset and the fingerprint of
+        the json file the tables were parsed from (only when they are exactly its content).
+        """
+        source_file = os.path.join(self.paths.ann_dir, self.paths.ann_fname)
+        cache_dir = Path(cache_dir) if cache_dir is not None else _default_cache_dir(source_file)
+        meta = {
+            'info': self._info,
+            'paths': dataclasses.asdict(self._paths),
+            'root_path': str(self._root_path),
+            'source': source,
+            'skip_columns': skip_columns,
+        }
+        tables = {'images': self.imgs, 'annotations': self.anns, 'categories': self.cats}
+        if self.licenses is not None:
+            tables['licenses'] = self.licenses
+        with Timer("Saving columnar cache...", "Done: ", log_fn=logging.info):
+            save_tables(cache_dir, tables, meta)
+        return cache_dir
+
+    @classmethod
+    def load_cache(
+            cls,
+            cache_dir: Union[str, Path],
+            validate: bool = False,
+            mmap: bool = True
+    ) -> COCOHelper:
+        """
+        Create a COCOHelper from a columnar cache written by `save_cache`.
+
+        Args:
+            cache_dir: directory containing the cache.
+            validate: If True, validate the dataset.
+            mmap: If True, memory-map the numeric columns instead of reading
+                them in memory.
+
+        Returns:
+            A COCOHelper object.
+
+        Raises:
+            FileNotFoundError if the directory does not contain a cache.
+        """
+        with Timer("Loading columnar cache...", "Done: ", log_fn=logging.info):
+            tables, meta = load_tables(cache_dir, mmap=mmap)
+        return COCOHelper(tables['images'], tables['annotations'], tables['categories'], tables.get('licenses'),
+                          meta['info'], coco_dir=meta['root_path'], paths=COCOHelperPaths(**meta['paths']),
+                          validate=validate)
+
+    @classmethod
+    def _load_json_with_cache(
+            cls,
+            json_annotations_file: str,
+            img_dir: str,
+            validate: bool,
+            stream: bool,
+            skip_columns: Optional[Sequence[str]],
+            cache_dir: Optional[Union[str, Path]]
+    ) -> COCOHelper:
+        """Load a json annotation file reusing its columnar cache if up-to-date, or refreshing it otherwise."""
+        cache_dir = Path(cache_dir) if cache_dir is not None else _default_cache_dir(json_annotations_file)
+        skip_columns = sorted(skip_columns) if stream and skip_columns else None
+        source = file_fingerprint(json_annotations_file)
+        try:
+            tables, meta = load_tables(cache_dir)
+            if meta.get('source') is not None and meta.get('source') == source and meta.get('skip_columns') == skip_columns:
+                ann_dir = os.path.dirname(json_annotations_file)
+                paths = COCOHelperPaths(ann_fname=os.path.basename(json_annotations_file), ann_dir=ann_dir,
+                                        img_dir=img_dir)
+                return COCOHelper(tables['images'], tables['annotations'], tables['categories'],
+                                  tables.get('licenses'), meta['info'], coco_dir=os.path.dirname(ann_dir),
+                                  paths=paths, validate=validate)
+            logging.info("Columnar cache is outdated, reloading the json annotation file.")
+        except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+            logging.info("Columnar cache not found or unreadable, loading the json annotation file.")
+
+        coco_helper = cls.load_json(json_annotations_file, img_dir, validate, stream=stream, skip_columns=skip_columns)
+        try:
+            coco_helper._save_cache(cache_dir, skip_columns, source)
+        except OSError as e:
+            logging.warning(f"Cannot write the columnar cache to {cache_dir}: {e}")
+        return coco_helper
+
     def to_json_dataset(self) -> dict:
         """Convert the current COCOHelper to a dict with the same structure of the COCO json file."""
         return {
@@ -383,14 +598,23 @@ class COCOHelper:
         self._root_path = Path(value)
 
     @property
-    def joins(self):
-        """Get a COCOJoins object, that enable easy access to different joins dataset tables."""
-        return COCOJoins(self)
+    def joins(self) -> COCOJoins:
+        """Get the COCOJoins object, that enable easy (and cached) access to different joins dataset tables."""
+        if self._joins is None:
+            self._joins = COCOJoins(self)
+        return self._joins
+
+    @property
+    def index(self) -> COCOIndex:
+        """Get the COCOIndex of the dataset, built at first access and cached."""
+        if self._index is None:
+            self._index = COCOIndex(self)
+        return self._index
 
     @property
-    def validator(self):
+    def validator(self) -> COCODataFrameValidator:
         """Get a COCOValidator object, that enable easy access to different validation methods."""
-        return COCOValidator(json_data=self.to_json_dataset(), dataset_dir=self.root_path)
+        return COCODataFrameValidator(self.imgs, self.anns, self.cats, self.licenses, dataset_dir=self.root_path)
 
     #
     # # # # # # # # # # # # # # #
@@ -588,7 +812,11 @@ class COCOHelper:
             composition: a composition type for the filters (defaults to "and"
                 behavior between each filter).
             invert: if True, invert the way the filter works.
-            drop_orphans: if True, drop orphans when applying the filter.
+            drop_orphans: if True, drop orphans when applying the filter. The
+                filter is evaluated on the annotations joined with categories
+                and images; for the builtin filters, the join is not computed
+                and each condition is evaluated on the table owning its column
+                (see `FilterPlan`).
 
         Returns:
             A COCOHelper with data filtered according to the given filters.
@@ -602,11 +830,16 @@ class COCOHelper:
                 cfilter = NotFilter(cfilter)
 
         if drop_orphans:
-            joined_anns = self.joins.anns_cats_imgs
-            joined_anns = cfilter.apply(joined_anns)
-            cats = self.joins.extract_cats(joined_anns)
-            imgs = self.joins.extract_imgs(joined_anns)
-            anns = self.joins.extract_anns(joined_anns)
+            # push the filter down to the tables, falling back to the full join for custom filters:
+            filtered = FilterPlan(self).execute(cfilter)
+            if filtered is not None:
+                cats, imgs, anns = filtered
+            else:
+                joined_anns = self.joins.anns_cats_imgs
+                joined_anns = COCODataFrame(DataFrame(cfilter.apply(joined_anns)), joined_anns.name)
+                cats = self.joins.extract_cats(joined_anns)
+                imgs = self.joins.extract_imgs(joined_anns)
+                anns = self.joins.extract_anns(joined_anns)
         else:
             cats = self.filtered_cats(cfilter)
             imgs = self.filtered_imgs(cfilter)
@@ -757,7 +990,7 @@ class COCOHelper:
 
     def drop_duplicate_anns(self):
         """Drop duplicate annotations (same values with different index)."""
-        anns, id_mapping = drop_duplicate_rows(self.anns.copy(), ignore_columns=['bbox', 'segmentation'])
+        anns, id_mapping = drop_duplicate_rows(self.anns)
         return self.copy(ann_df=anns)
 
     def drop_duplicate_licenses(self):
@@ -771,6 +1004,37 @@ class COCOHelper:
 
         return self.copy(lic_df=lic_df)
 
+    def drop_duplicates(self) -> COCOHelper:
+        """
+        Drop duplicate categories, images, annotations and licenses (same
+        values with different index).
+
+        This is the same as `drop_duplicate_cats().drop_duplicate_imgs()
+        .drop_duplicate_anns().drop_duplicate_licenses()`, but the id mappings
+        of the tables are computed first, and the foreign keys are remapped at
+        once: a single new COCOHelper is built, without copying the tables.
+
+        Returns:
+            A COCOHelper without duplicates.
+        """
+        cat_df, cat_mapping = drop_duplicate_rows(self.cats)
+        img_df, img_mapping = drop_duplicate_rows(self.imgs)
+
+        # annotations are compared once their foreign keys point to the kept categories and images:
+        ann_df = self.anns.copy(deep=False)
+        ann_df['category_id'] = remap_ids(ann_df['category_id'], *cat_mapping)
+        ann_df['image_id'] = remap_ids(ann_df['image_id'], *img_mapping)
+        ann_df, _ = drop_duplicate_rows(ann_df)
+
+        lic_df = None
+        if self.licenses is not None:
+            lic_df, lic_mapping = drop_duplicate_rows(self.licenses)
+            # license_id is an optional field, if the column is there it will be fixed.
+            if 'license_id' in img_df.columns:
+                img_df = img_df.copy(deep=False)
+                img_df['license_id'] = remap_ids(img_df['license_id'], *lic_mapping)
+        return self.copy(cat_df=cat_df, img_df=img_df, ann_df=ann_df, lic_df=lic_df)
+
     def merge(
             self,
             *coco_helper: COCOHelper,
@@ -796,26 +1060,88 @@ class COCOHelper:
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def get_img(
             self,
-            img_id: int
+            img_id: int,
+            backend: str = 'pil',
+            max_size: Optional[int] = None
     ) -> np.ndarray:
         """
         Load the image with img_id as a numpy array.
 
+        If the dataset has an image cache (see `with_img_cache`), the image
+        is read from the cache.
+
         Args:
             img_id: The id of the image to load.
+            backend: The library decoding the image: 'pil' or 'cv2' (usually
+                faster on JPEG files).
+            max_size: If not None, the image is downsampled so that its
+                longest side is at most `max_size` pixels.
 
         Returns:
             A numpy array with shape (H, W, C).
         """
         try:
-            image_file_name = self.filtered_imgs().loc[img_id, 'file_name']
+            image_path = self.index.img_path(img_id)
         except KeyError:
             raise COCOImageNotFoundError(img_id)
+        if self._img_cache is not None:
+            return self._img_cache.read(image_path, backend=backend, max_size=max_size)
+        return read_image(image_path, backend=backend, max_size=max_size)
 
-        image_path = self.root_path / self.paths.img_dir / image_file_name
-        with Image.open(image_path) as img:
-            image_array: np.ndarray = np.array(img)
-        return image_array
+    def with_img_cache(
+            self,
+            img_cache: Union[ImageCache, int, None]
+    ) -> COCOHelper:
+        """
+        Get a copy of the dataset loading its images through an in-memory
+        LRU cache of decoded images.
+
+        The cache is shared with the copies of the new dataset (e.g. the
+        filtered ones), since they read the same image files.
+
+        Args:
+            img_cache: An ImageCache, the memory budget in bytes of a new
+                ImageCache, or None to disable the cache.
+
+        Returns:
+            A new `COCOHelper` object with the given image cache.
+        """
+        helper = self.copy()
+        helper._img_cache = ImageCache(img_cache) if isinstance(img_cache, (int, np.integer)) else img_cache
+        return helper
+
+    @property
+    def img_cache(self) -> Optional[ImageCache]:
+        """The cache of decoded images of the dataset (None if images are not cached)."""
+        return self._img_cache
+
+    def iter_imgs(
+            self,
+            img_ids: Optional[Sequence[int]] = None,
+            num_workers: int = 4,
+            queue_depth: int = 8,
+            backend: str = 'pil'
+    ) -> ImagePrefetcher:
+        """
+        Iterate over images loaded in the background by a pool of threads.
+
+        The upcoming images are decoded while the current one is processed,
+        and are delivered in the order of `img_ids`.
+
+        Args:
+            img_ids: The ids of the images to load, in iteration order. If
+                None, all the images of the dataset.
+            num_workers: The number of loading threads.
+            queue_depth: The maximum number of images loaded ahead.
+            backend: The library decoding the images: 'pil' or 'cv2'.
+
+        Returns:
+            An iterable of (image id, image array) tuples.
+        """
+        if img_ids is None:
+            img_ids = self.imgs.index.tolist()
+        return ImagePrefetcher(functools.partial(self.get_img, backend=backend), img_ids,
+                               num_workers=num_workers, queue_depth=queue_depth)
 
     #
     # # # # # # # # # #
@@ -847,10 +1173,11 @@ class COCOHelper:
         if ann_id is None:
             ann_id = self.anns.index[idx]
         try:
-            ann_cat = self.joins.anns_cats.loc[ann_id]
+            ann_pos = self.index.ann_position(ann_id)
         except KeyError:
             raise COCOAnnotationNotFoundError(ann_id)
 
+        ann_cat = self.index.anns_cats_rows(np.array([ann_pos])).iloc[0]
         img_data = self.get_img(ann_cat.image_id)
         anns = ann_cat.to_dict()
         if transform is not None:
@@ -884,21 +1211,41 @@ class COCOHelper:
             img_id = self.imgs.index[idx]
 
         try:
-            img = self.imgs.loc[img_id]
+            img = self.imgs.iloc[self.index.img_position(img_id)]
         except KeyError:
             raise COCOImageNotFoundError(img_id)
 
         img_data = self.get_img(img_id)
-        anns = self.filtered_anns(cfilters.imgs_filter(ids=img_id))
-        ann_cats = self.joins.anns_cats  # .set_index('annotation_id')
-        ann_cats = ann_cats.loc[anns.index]
-        ann_cats = ann_cats.to_dict(orient='records')
+        ann_cats = self.index.img_anns_records(img_id)
         if transform is not None:
             img_data, ann_cats = transform.apply(img_data, ann_cats)
         img = img.to_dict()
         img['image'] = img_data
         return img, ann_cats
 
+    def dataset_view(
+            self,
+            img_ids: Optional[Sequence[int]] = None,
+            load_images: bool = True,
+            segmentation: bool = False
+    ) -> COCODatasetView:
+        """
+        Get a map-style view of the dataset, with one sample per image and
+        the annotation data precomputed in flat arrays, to be shared by the
+        workers of a data loader.
+
+        Args:
+            img_ids: the ids of the images in the view, in order. If None,
+                all the images of the dataset.
+            load_images: whether to load the image files in the samples.
+            segmentation: whether to include the segmentations in the samples.
+
+        Returns:
+            A COCODatasetView of the dataset.
+        """
+        from cocohelper.views import COCODatasetView
+        return COCODatasetView(self, img_ids=img_ids, load_images=load_images, segmentation=segmentation)
+
     @staticmethod
     def new_info_dict() -> dict:
         """Get a generic info dict for COCO format."""
@@ -909,3 +1256,15 @@ class COCOHelper:
             "version": "1.0",
             "year": int(dt.datetime.now().astimezone(dt.timezone.utc).strftime("%Y"))
         }
+
+
+def _to_dataframe(records: Union[DataFrame, Sequence[dict]]) -> DataFrame:
+    """Convert a list of records to a DataFrame (DataFrames are returned as they are)."""
+    if isinstance(records, DataFrame):
+        return records
+    return DataFrame.from_records(records)
+
+
+def _default_cache_dir(annotation_file: Union[str, Path]) -> Path:
+    """Get the default directory of the columnar cache of an annotation file."""
+    return Path(f"{annotation_file}.cache")
@@ -2,14 +2,20 @@
 Generate COCOHelper objects from a generic dataset interface.
 """
 import datetime as dt
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Union
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
 
 from PIL import Image
 from tqdm import tqdm
 
 from cocohelper import COCOHelper, COCOHelperPaths
 from cocohelper.adapters.dataset_adapter import DatasetAdapter
+from cocohelper.utils.jsonstream import JsonObjectWriter, open_json_file, read_coco_tables
+
+
+Sample = Tuple[dict, List[dict]]
 
 
 class Importer:
@@ -40,37 +46,73 @@ class Importer:
             out_coco_dir: Union[str, Path],
             ann_dir: Union[str, Path] = COCOHelperPaths.ann_dir,
             img_dir: Union[str, Path] = COCOHelperPaths.img_dir,
-            save_images: bool = False
+            save_images: bool = False,
+            num_workers: int = 0,
+            stream: bool = False
     ) -> COCOHelper:
         """
         Generate the new COCOHelper, and optionally save it.
 
+        With `num_workers > 0`, the samples are loaded (and their images
+        saved) by a pool of processes. The adapter is sent once to each
+        worker. This needs a picklable adapter, unless processes are forked
+        (the default on Linux). Samples are gathered in order, with at most
+        a few samples per worker in flight. Since each worker sees its own
+        copy of the adapter, annotation ids are then reassigned sequentially
+        (starting from 1) in sample order.
+
+        With `stream=True`, images and annotations are written to the
+        annotation file (`<out_coco_dir>/<ann_dir>/coco.json`) as soon as
+        they are produced, instead of being accumulated in memory. The
+        returned COCOHelper is then loaded from that file with the streaming
+        json parser (see `read_coco_tables`).
+
         Args:
             out_coco_dir: Root path to save the dataset.
             ann_dir: Annotation directory (relative to out_coco_path).
             img_dir: Image directory (relative to out_coco_path).
             save_images: If True saves the image to out_coco_path.
+            num_workers: Number of worker processes used to load the samples.
+                If 0, samples are loaded in the current process.
+            stream: If True, write the records to the annotation file while
+                they are produced, and load the COCOHelper from it.
 
         Returns:
             A new COCOHelper.
+
+        Raises:
+            ValueError if `save_images` or `stream` is True and `out_coco_dir`
+            is not provided.
         """
         if save_images and out_coco_dir is None:
             raise ValueError("Importer.create(): `save_images` can be true only if `out_coco_dir` is provided.")
+        if stream and out_coco_dir is None:
+            raise ValueError("Importer.create(): `stream` can be true only if `out_coco_dir` is provided.")
+        if num_workers < 0:
+            raise ValueError("Importer.create(): `num_workers` must be non-negative.")
 
         json_data = _get_empty_json()
         json_data['categories'] = self._adapter.get_categories()
 
-        for idx, (image, annotations) in enumerate(tqdm(self._adapter)):
-            if save_images:
-                img_array = self._adapter.read_image(idx)
-                image_name = Path(image['file_name']).name
-                image_fname = Path(out_coco_dir) / Path(img_dir) / image_name
-                image_fname.parent.mkdir(parents=True, exist_ok=True)
-                Image.fromarray(img_array).save(image_fname)
-                image['file_name'] = image_name
+        out_img_dir = Path(out_coco_dir) / Path(img_dir) if save_images else None
+        if num_workers > 0:
+            samples = _parallel_samples(self._adapter, out_img_dir, num_workers)
+        else:
+            samples = _serial_samples(self._adapter, out_img_dir)
+
+        if stream:
+            ann_file = Path(out_coco_dir) / Path(ann_dir) / COCOHelperPaths.ann_fname
+            _write_samples(ann_file, json_data, tqdm(samples), reassign_ann_ids=num_workers > 0)
+            with open_json_file(ann_file, 'r') as f:
+                json_data = read_coco_tables(f)
+        else:
+            for image, annotations in tqdm(samples):
+                json_data['images'].append(image)
+                json_data['annotations'] += annotations
 
-            json_data['images'].append(image)
-            json_data['annotations'] += annotations
+            if num_workers > 0:
+                for ann_id, ann in enumerate(json_data['annotations'], start=1):
+                    ann['id'] = ann_id
 
         return COCOHelper.load_data(json_data,
                                     coco_dir=str(out_coco_dir),
@@ -78,6 +120,121 @@ class Importer:
                                     img_dir=str(img_dir))
 
 
+# Adapter of the current worker process, set by `_init_worker`.
+_worker_adapter: Optional[DatasetAdapter] = None
+
+
+def _save_image(
+        adapter: DatasetAdapter,
+        idx: int,
+        image: dict,
+        out_img_dir: Path
+) -> None:
+    """Save the image of a sample to the output directory, updating its file name."""
+    img_array = adapter.read_image(idx)
+    image_name = Path(image['file_name']).name
+    image_fname = out_img_dir / image_name
+    image_fname.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(img_array).save(image_fname)
+    image['file_name'] = image_name
+
+
+def _serial_samples(
+        adapter: DatasetAdapter,
+        out_img_dir: Optional[Path]
+) -> Iterator[Sample]:
+    """Iterate over the samples of an adapter, saving their images if `out_img_dir` is given."""
+    for idx, (image, annotations) in enumerate(adapter):
+        if out_img_dir is not None:
+            _save_image(adapter, idx, image, out_img_dir)
+        yield image, annotations
+
+
+def _init_worker(adapter: DatasetAdapter) -> None:
+    """Store the adapter in a worker process."""
+    global _worker_adapter
+    _worker_adapter = adapter
+
+
+def _load_sample(
+        idx: int,
+        out_img_dir: Optional[Path]
+) -> Optional[Sample]:
+    """Load a sample in a worker process, saving its image if `out_img_dir` is given."""
+    assert _worker_adapter is not None
+    sample = _worker_adapter.get_sample(idx)
+    if sample is not None and out_img_dir is not None:
+        _save_image(_worker_adapter, idx, sample[0], out_img_dir)
+    return sample
+
+
+def _parallel_samples(
+        adapter: DatasetAdapter,
+        out_img_dir: Optional[Path],
+        num_workers: int,
+        prefetch: int = 4
+) -> Iterator[Sample]:
+    """
+    Load the samples of an adapter with a pool of processes, yielding them in order.
+
+    The number of samples is not known in advance: samples are requested by
+    index until the adapter returns None, with at most `prefetch` samples
+    per worker in flight.
+    """
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker, initargs=(adapter,)) as executor:
+        pending: Deque = deque()
+        next_idx = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < num_workers * prefetch:
+                pending.append(executor.submit(_load_sample, next_idx, out_img_dir))
+                next_idx += 1
+            if len(pending) == 0:
+                return
+            sample = pending.popleft().result()
+            if sample is None:
+                # the adapter is exhausted: drop the requests beyond its end.
+                exhausted = True
+                for future in pending:
+                    future.cancel()
+                pending.clear()
+                continue
+            yield sample
+
+
+def _write_samples(
+        ann_file: Path,
+        json_data: dict,
+        samples: Iterable[Sample],
+        reassign_ann_ids: bool
+) -> None:
+    """
+    Write a COCO json file, streaming the images and annotations of the samples.
+
+    Args:
+        ann_file: the output annotation file.
+        json_data: the COCO json content other than images and annotations.
+        samples: the images and annotations of each sample.
+        reassign_ann_ids: if True, assign sequential ids to the annotations.
+    """
+    ann_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(ann_file, 'w') as f, JsonObjectWriter(f, spool_dir=ann_file.parent) as writer:
+        for key, value in json_data.items():
+            if key not in ('images', 'annotations'):
+                writer.write(key, value)
+        # images and annotations are always written, even without any sample:
+        writer.declare_array('images')
+        writer.declare_array('annotations')
+        n_anns = 0
+        for image, annotations in samples:
+            writer.append('images', image)
+            for ann in annotations:
+                n_anns += 1
+                if reassign_ann_ids:
+                    ann['id'] = n_anns
+                writer.append('annotations', ann)
+
+
 def _get_empty_json() -> dict:
     """
     Get an empty COCO dataset as a dict.
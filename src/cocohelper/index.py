@@ -0,0 +1,185 @@
+"""
+Lookup indices over the tables of a COCO dataset.
+"""
+from typing import TYPE_CHECKING, Iterator, List, Tuple
+from pandas import DataFrame
+from pathlib import Path
+import pandas as pd
+import numpy as np
+
+
+if TYPE_CHECKING:
+    from cocohelper import COCOHelper
+
+
+class COCOIndex:
+
+    def __init__(self, coco_helper: "COCOHelper"):
+        """
+        Precomputed lookup structures to access single images and their
+        annotations in O(1), without joining the dataset tables.
+
+        The index is built once from the tables of a `COCOHelper` and is never
+        updated: since the helper tables are never modified in place, every
+        new `COCOHelper` (e.g. obtained with `copy()` or with a filter) builds
+        its own index when needed.
+
+        The index contains:
+          - image_id -> position of the image in `imgs` and its file path;
+          - image_id -> positions of its annotations in `anns`, stored as a
+            contiguous array of annotation row positions grouped by image
+            (`ann_rows[ann_starts[i]:ann_ends[i]]` for the i-th indexed image);
+          - annotation_id -> position of the annotation in `anns`;
+          - category_id -> position of the category in `cats`.
+
+        Args:
+            coco_helper: the COCOHelper object representing a COCO dataset.
+        """
+        self._ch = coco_helper
+        imgs, anns, cats = coco_helper.imgs, coco_helper.anns, coco_helper.cats
+
+        self._img_ids = pd.Index(imgs.index)
+        self._ann_ids = pd.Index(anns.index)
+        self._cat_ids = pd.Index(cats.index)
+        self._file_names = imgs['file_name'].to_numpy() if 'file_name' in imgs.columns else None
+
+        # Annotation positions sorted (stably) by image id: the annotations of the same image are contiguous.
+        ann_img_ids = anns['image_id'].to_numpy() if 'image_id' in anns.columns else np.empty(0, dtype=np.int64)
+        self._ann_rows = np.argsort(ann_img_ids, kind='stable')
+        grouped_img_ids, self._ann_starts, counts = np.unique(ann_img_ids[self._ann_rows],
+                                                              return_index=True, return_counts=True)
+        self._ann_ends = self._ann_starts + counts
+        self._grouped_img_ids = pd.Index(grouped_img_ids)
+
+    def img_position(self, img_id: int) -> int:
+        """
+        Get the row position of an image in the images table.
+
+        Args:
+            img_id: the id of the image.
+
+        Returns:
+            The position of the image in `COCOHelper.imgs`.
+
+        Raises:
+            KeyError if the image id does not exist.
+        """
+        pos = self._img_ids.get_loc(img_id)
+        if not isinstance(pos, (int, np.integer)):
+            raise KeyError(img_id)
+        return int(pos)
+
+    def ann_position(self, ann_id: int) -> int:
+        """
+        Get the row position of an annotation in the annotations table.
+
+        Args:
+            ann_id: the id of the annotation.
+
+        Returns:
+            The position of the annotation in `COCOHelper.anns`.
+
+        Raises:
+            KeyError if the annotation id does not exist.
+        """
+        pos = self._ann_ids.get_loc(ann_id)
+        if not isinstance(pos, (int, np.integer)):
+            raise KeyError(ann_id)
+        return int(pos)
+
+    def cat_positions(self, cat_ids: np.ndarray) -> np.ndarray:
+        """
+        Get the row positions of categories in the categories table.
+
+        Args:
+            cat_ids: an array of category ids.
+
+        Returns:
+            An array with the position of each category in `COCOHelper.cats`,
+            or -1 for the category ids that do not exist.
+        """
+        return self._cat_ids.get_indexer(cat_ids)
+
+    def img_path(self, img_id: int) -> Path:
+        """
+        Get the path to the file of an image.
+
+        Args:
+            img_id: the id of the image.
+
+        Returns:
+            The path of the image file.
+
+        Raises:
+            KeyError if the image id does not exist.
+        """
+        if self._file_names is None:
+            raise KeyError(img_id)
+        file_name = self._file_names[self.img_position(img_id)]
+        return self._ch.root_path / self._ch.paths.img_dir / file_name
+
+    def img_ann_positions(self, img_id: int) -> np.ndarray:
+        """
+        Get the row positions of the annotations of an image.
+
+        Args:
+            img_id: the id of the image.
+
+        Returns:
+            An array with the positions in `COCOHelper.anns` of the annotations
+            of the image (empty if the image has no annotations).
+        """
+        group = self._grouped_img_ids.get_indexer([img_id])[0]
+        if group < 0:
+            return self._ann_rows[:0]
+        return self._ann_rows[self._ann_starts[group]:self._ann_ends[group]]
+
+    def iter_img_ann_positions(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Iterate over the images having annotations, with the positions of
+        their annotations.
+
+        Returns:
+            An iterator over tuples with an image id and an array with the
+            positions in `COCOHelper.anns` of its annotations, in table order.
+        """
+        for img_id, start, end in zip(self._grouped_img_ids.tolist(), self._ann_starts, self._ann_ends):
+            yield img_id, self._ann_rows[start:end]
+
+    def anns_cats_rows(self, ann_positions: np.ndarray) -> DataFrame:
+        """
+        Get annotations joined with their categories, given their positions.
+
+        The result has the same layout of the rows of `COCOJoins.anns_cats`,
+        but only the requested rows are joined.
+
+        Args:
+            ann_positions: positions of the annotations in `COCOHelper.anns`.
+
+        Returns:
+            A DataFrame indexed by annotation id containing the annotation
+            columns, the category columns and the `category_name` column.
+        """
+        anns = DataFrame(self._ch.anns.iloc[ann_positions])
+        cats = self._ch.cats
+        cat_pos = self.cat_positions(anns['category_id'].to_numpy())
+        if (cat_pos >= 0).all():
+            cats_rows = DataFrame(cats.iloc[cat_pos])
+        else:
+            cats_rows = DataFrame(cats).reindex(anns['category_id'].to_numpy())
+        cats_rows.index = anns.index
+        data = pd.concat([anns, cats_rows], axis=1)
+        data["category_name"] = data["name"]
+        return data
+
+    def img_anns_records(self, img_id: int) -> List[dict]:
+        """
+        Get the annotations of an image (joined with their categories) as records.
+
+        Args:
+            img_id: the id of the image.
+
+        Returns:
+            A list of dicts, one for each annotation of the image.
+        """
+        return self.anns_cats_rows(self.img_ann_positions(img_id)).to_dict(orient='records')
@@ -1,78 +1,169 @@
 """
 Access to different joins of a COCO dataset tables.
 """
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Optional
 from pandas import DataFrame
 from cocohelper.dataframe import COCODataFrame
+from cocohelper.utils.cache import LRUCache, CacheStats
 
 
 if TYPE_CHECKING:
     from cocohelper import COCOHelper
 
 
+# Default memory budget of the joins cache of each COCOHelper: 512 MiB.
+DEFAULT_JOINS_CACHE_BYTES = 512 * 2 ** 20
+
+
 class COCOJoins:
 
-    def __init__(self, coco_helper: "COCOHelper"):
+    def __init__(
+            self,
+            coco_helper: "COCOHelper",
+            max_cache_bytes: Optional[int] = DEFAULT_JOINS_CACHE_BYTES
+    ):
         """
         Enable easy access to different joins of a COCO dataset tables.
 
+        Joins are computed on first access and memoized in an LRU cache over
+        the join kinds (e.g. `anns_cats`, `imgs_anns_cats`), bounded by a
+        memory budget. The size of a join is estimated with
+        `DataFrame.memory_usage(deep=False)`, so the content of object columns
+        (e.g. `segmentation` lists, shared with the source tables) is not
+        accounted for.
+
+        The cache is bound to the identity of the `imgs`, `anns` and `cats`
+        tables of the COCOHelper: if any of them is replaced, all the cached
+        joins are invalidated. The returned joins are shared between callers
+        and must be treated as read-only.
+
         Args:
             coco_helper: the COCOHelper object representing a COCO dataset.
+            max_cache_bytes: memory budget of the joins cache, in bytes. Use 0
+                to disable caching, or None for an unbounded cache.
         """
         self._ch = coco_helper
+        self._cache = LRUCache(max_cache_bytes, sizeof=_df_nbytes)
+        self._cached_tables: tuple = tuple()
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        """Hits, misses and evictions of the joins cache."""
+        return self._cache.stats
+
+    def clear_cache(self) -> None:
+        """Remove all the joins from the cache."""
+        self._cache.clear()
+
+    def _cached(
+            self,
+            kind: str,
+            compute: Callable[[], COCODataFrame]
+    ) -> COCODataFrame:
+        """
+        Get a join from the cache, computing and storing it on a cache miss.
+
+        Args:
+            kind: the name of the join.
+            compute: a function computing the join.
+
+        Returns:
+            The requested join.
+        """
+        tables = (self._ch.imgs, self._ch.anns, self._ch.cats)
+        if len(self._cached_tables) != len(tables) or \
+                any(cached is not table for cached, table in zip(self._cached_tables, tables)):
+            self._cache.clear()
+            self._cached_tables = tables
+
+        data = self._cache.get(kind)
+        if data is None:
+            data = compute()
+            self._cache.put(kind, data)
+        return data
 
     @property
     def anns_imgs(self) -> COCODataFrame:
         """Returns a left join between anns and imgs."""
-        return self._ch.anns.cocojoin(self._ch.imgs).auto_reset_index().set_index('image_id')
+        return self._cached('anns_imgs', self._anns_imgs)
 
     @property
     def imgs_anns(self) -> COCODataFrame:
         """Returns a left join between imgs and anns."""
-        return self._ch.imgs.cocojoin(self._ch.anns).auto_reset_index().set_index('image_id')
+        return self._cached('imgs_anns', self._imgs_anns)
 
     @property
     def anns_cats(self) -> COCODataFrame:
         """Returns a left join between anns and cats."""
-        data = self._ch.anns.cocojoin(self._ch.cats).auto_reset_index().set_index('annotation_id')
-        data["category_name"] = data["name"]  # remove "name" ambiguity adding a new column "category_name"
-        return data
+        return self._cached('anns_cats', self._anns_cats)
 
     @property
     def cats_anns(self) -> COCODataFrame:
         """Returns a left join between cats and anns."""
-        data = self._ch.cats.cocojoin(self._ch.anns).auto_reset_index().set_index('category_id')
-        data["category_name"] = data["name"]  # remove "name" ambiguity adding a new column "category_name"
-        return data
+        return self._cached('cats_anns', self._cats_anns)
 
     @property
     def anns_cats_imgs(self) -> COCODataFrame:
         """Returns a left join between anns, cats and imgs."""
-        return self.anns_cats.cocojoin(self._ch.imgs).auto_reset_index().set_index('annotation_id')
+        return self._cached('anns_cats_imgs', self._anns_cats_imgs)
 
     @property
     def anns_imgs_cats(self) -> COCODataFrame:
         """Returns a left join between anns, imgs and cats."""
-        return self.anns_imgs.cocojoin(self._ch.cats).auto_reset_index().set_index('annotation_id')
+        return self._cached('anns_imgs_cats', self._anns_imgs_cats)
 
     @property
     def imgs_anns_cats(self) -> COCODataFrame:
         """Returns a left join between imgs, anns and cats."""
-        return self._ch.imgs.cocojoin(self.anns_cats).auto_reset_index().set_index('image_id')
+        return self._cached('imgs_anns_cats', self._imgs_anns_cats)
 
     @property
     def imgs_cats_anns(self) -> COCODataFrame:
         """Returns a left join between imgs, cats and anns."""
-        return self._ch.imgs.cocojoin(self.cats_anns).auto_reset_index().set_index('image_id')
+        return self._cached('imgs_cats_anns', self._imgs_cats_anns)
 
     @property
     def cats_anns_imgs(self) -> COCODataFrame:
         """Returns a left join between cats, anns and imgs."""
-        return self.cats_anns.cocojoin(self._ch.imgs)
+        return self._cached('cats_anns_imgs', self._cats_anns_imgs)
 
     @property
     def cats_imgs_anns(self) -> COCODataFrame:
         """Returns a left join between imgs, anns and cats."""
+        return self._cached('cats_imgs_anns', self._cats_imgs_anns)
+
+    def _anns_imgs(self) -> COCODataFrame:
+        return self._ch.anns.cocojoin(self._ch.imgs).auto_reset_index().set_index('image_id')
+
+    def _imgs_anns(self) -> COCODataFrame:
+        return self._ch.imgs.cocojoin(self._ch.anns).auto_reset_index().set_index('image_id')
+
+    def _anns_cats(self) -> COCODataFrame:
+        data = self._ch.anns.cocojoin(self._ch.cats).auto_reset_index().set_index('annotation_id')
+        data["category_name"] = data["name"]  # remove "name" ambiguity adding a new column "category_name"
+        return data
+
+    def _cats_anns(self) -> COCODataFrame:
+        data = self._ch.cats.cocojoin(self._ch.anns).auto_reset_index().set_index('category_id')
+        data["category_name"] = data["name"]  # remove "name" ambiguity adding a new column "category_name"
+        return data
+
+    def _anns_cats_imgs(self) -> COCODataFrame:
+        return self.anns_cats.cocojoin(self._ch.imgs).auto_reset_index().set_index('annotation_id')
+
+    def _anns_imgs_cats(self) -> COCODataFrame:
+        return self.anns_imgs.cocojoin(self._ch.cats).auto_reset_index().set_index('annotation_id')
+
+    def _imgs_anns_cats(self) -> COCODataFrame:
+        return self._ch.imgs.cocojoin(self.anns_cats).auto_reset_index().set_index('image_id')
+
+    def _imgs_cats_anns(self) -> COCODataFrame:
+        return self._ch.imgs.cocojoin(self.cats_anns).auto_reset_index().set_index('image_id')
+
+    def _cats_anns_imgs(self) -> COCODataFrame:
+        return self.cats_anns.cocojoin(self._ch.imgs)
+
+    def _cats_imgs_anns(self) -> COCODataFrame:
         return self._ch.cats.cocojoin(self.imgs_anns).auto_reset_index().set_index('category_id')
 
     def extract_cats(
@@ -156,3 +247,8 @@ class COCOJoins:
         # Faster than simply drop_duplicate():
         # https://stackoverflow.com/questions/13035764/remove-pandas-rows-with-duplicate-indices
         return joined_anns[~joined_anns.index.duplicated()]
+
+
+def _df_nbytes(df: DataFrame) -> int:
+    """Estimate the memory used by a DataFrame (object columns are counted as references)."""
+    return int(df.memory_usage(index=True, deep=False).sum())
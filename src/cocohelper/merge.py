@@ -1,9 +1,14 @@
 """
 Merge multiple COCO datasets together.
 """
-from cocohelper import COCOHelper
-from typing import List, Tuple
+from cocohelper import COCOHelper, COCOColsMapper
+from cocohelper.utils.dataframe import IdMapping, remap_ids, row_fingerprints, df_to_records, df_to_records_chunks
+from cocohelper.utils.jsonstream import JsonObjectWriter, open_json_file
+from typing import Dict, Iterable, List, Tuple, Union
+from pathlib import Path
 import pandas as pd
+import numpy as np
+import os
 
 
 def merge_coco(
@@ -31,22 +36,207 @@ def merge_coco(
     cat_df, cat_id_mapping = _merge_categories(*coco_helpers)
     img_df, image_id_mapping = _merge_images(*coco_helpers)
     ann_df = _merge_annotations(*coco_helpers, cat_id_mapping=cat_id_mapping, image_id_mapping=image_id_mapping)
-    info = _merge_info(*coco_helpers)
+    info = _merge_info([ds.info for ds in coco_helpers])
     merged = coco_helpers[0].copy(ann_df=ann_df, img_df=img_df, cat_df=cat_df, lic_df=lic_df, info=info)
 
     if drop_duplicates:
-        return merged.drop_duplicate_cats().drop_duplicate_imgs().drop_duplicate_anns().drop_duplicate_licenses()
+        return merged.drop_duplicates()
     return merged
 
 
+def merge_coco_files(
+        sources: Iterable[Union[str, Path, COCOHelper]],
+        out_file: Union[str, Path],
+        drop_duplicates: bool = True,
+        compact: bool = False,
+        chunk_size: int = 10000
+) -> Path:
+    """
+    Merge many COCO datasets, loading one dataset at a time, and write the
+    merged dataset to a COCO json file.
+
+    Unlike `merge_coco`, the datasets don't need to be in memory at the same
+    time: each dataset is loaded, its ids are remapped to the ids of the
+    merged dataset, and its images and annotations are written to temporary
+    files before loading the next one. Only the id mappings (and the
+    fingerprints of the rows, to drop duplicates) of the datasets already
+    merged are kept in memory.
+
+    As in `merge_coco`, categories with the same name and supercategory are
+    merged together. Ids of the merged tables are assigned sequentially, in
+    order of appearance. With `drop_duplicates`, images, annotations and
+    licenses with the same values as a previous row are dropped (and
+    foreign keys are remapped to the kept row), as in `merge_coco`:
+    duplicates are identified by a 64-bit fingerprint of their values (see
+    `row_fingerprints`) instead of comparing the rows.
+
+    Args:
+        sources: the datasets to merge, as paths to COCO json files (loaded
+            with `COCOHelper.load_json(stream=True)`) or as COCOHelpers.
+        out_file: path to the merged json file, gzip-compressed if its name
+            ends with `.gz`.
+        drop_duplicates: if True, duplicate rows with different ids will be
+            merged together.
+        compact: If True, write the json without indentation and spaces.
+        chunk_size: number of rows of the tables serialized at a time.
+
+    Returns:
+        The path to the merged json file.
+    """
+    out_file = Path(out_file)
+    os.makedirs(out_file.parent, exist_ok=True)
+    indent, separators = (None, (',', ':')) if compact else (4, None)
+    merger = _StreamingMerger(drop_duplicates)
+    with open_json_file(out_file, 'w') as f:
+        with JsonObjectWriter(f, indent=indent, separators=separators, spool_dir=out_file.parent) as writer:
+            # images and annotations are always written, even if no source has any:
+            writer.declare_array('images')
+            writer.declare_array('annotations')
+            for source in sources:
+                coco = source if isinstance(source, COCOHelper) else COCOHelper.load_json(str(source), stream=True)
+                imgs, anns = merger.add(coco)
+                for key, table, colmap in (('images', imgs, merger.colmaps.img),
+                                           ('annotations', anns, merger.colmaps.ann)):
+                    for records in df_to_records_chunks(table, colmap, chunk_size):
+                        writer.extend(key, records)
+            writer.write('categories', df_to_records(merger.categories(), merger.colmaps.cat))
+            writer.write('licenses', df_to_records(merger.licenses(), merger.colmaps.lic))
+            writer.write('info', _merge_info(merger.infos))
+            # the spooled images and annotations are written when the writer is closed.
+    return out_file
+
+
+class _StreamingMerger:
+
+    def __init__(self, drop_duplicates: bool):
+        """
+        Incrementally merge datasets, one at a time.
+
+        Args:
+            drop_duplicates: if True, drop the rows with the same values as a
+                row already merged.
+        """
+        self.drop_duplicates = drop_duplicates
+        self.colmaps = COCOColsMapper()
+        self.infos: List[dict] = []
+        self._cats: List[pd.DataFrame] = []
+        self._lics: List[pd.DataFrame] = []
+        # fingerprint of the rows already merged -> their new id:
+        self._cat_ids: Dict[int, int] = dict()
+        self._img_ids: Dict[int, int] = dict()
+        self._ann_ids: Dict[int, int] = dict()
+        self._lic_ids: Dict[int, int] = dict()
+        self._n_lics = 0
+        self._n_imgs = 0
+        self._n_anns = 0
+
+    def categories(self) -> pd.DataFrame:
+        """Get the merged categories."""
+        return _concat_tables(self._cats, 'category_id')
+
+    def licenses(self) -> pd.DataFrame:
+        """Get the merged licenses."""
+        return _concat_tables(self._lics, 'license_id')
+
+    def add(self, coco: COCOHelper) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Merge a dataset.
+
+        The categories and licenses of the dataset are kept by the merger,
+        the images and annotations are returned.
+
+        Args:
+            coco: the dataset.
+
+        Returns:
+            The new images and annotations of the dataset, with the ids of
+            the merged dataset.
+        """
+        self.infos.append(coco.info)
+
+        lics = coco.licenses
+        lic_ids, new = self._assign_ids(self._lic_ids, self._fingerprints(lics), self._n_lics, self.drop_duplicates)
+        self._n_lics += int(new.sum())
+        self._lics.append(lics[new].set_axis(lic_ids[new], axis=0))
+
+        cats = coco.cats
+        cat_keys = cats[[col for col in ('name', 'supercategory') if col in cats.columns]]
+        cat_ids, new = self._assign_ids(self._cat_ids, row_fingerprints(cat_keys), len(self._cat_ids), True)
+        self._cats.append(cats[new].set_axis(cat_ids[new], axis=0))
+
+        imgs = coco.imgs.copy()
+        for fk_column in ('license', 'license_id'):
+            if fk_column in imgs.columns:
+                imgs[fk_column] = remap_ids(imgs[fk_column], lics.index.to_numpy(), lic_ids)
+        img_ids, new = self._assign_ids(self._img_ids, self._fingerprints(imgs), self._n_imgs, self.drop_duplicates)
+        self._n_imgs += int(new.sum())
+        imgs = imgs[new].set_axis(img_ids[new], axis=0)
+
+        anns = coco.anns.copy()
+        anns['category_id'] = remap_ids(anns['category_id'], cats.index.to_numpy(), cat_ids)
+        anns['image_id'] = remap_ids(anns['image_id'], coco.imgs.index.to_numpy(), img_ids)
+        ann_ids, new = self._assign_ids(self._ann_ids, self._fingerprints(anns), self._n_anns, self.drop_duplicates)
+        self._n_anns += int(new.sum())
+        anns = anns[new].set_axis(ann_ids[new], axis=0)
+
+        return imgs.rename_axis('image_id'), anns.rename_axis('annotation_id')
+
+    def _fingerprints(self, df: pd.DataFrame) -> np.ndarray:
+        """Get the fingerprints of the rows, used to drop duplicates."""
+        if not self.drop_duplicates:
+            return np.empty(len(df), dtype=np.uint64)
+        return row_fingerprints(df)
+
+    @staticmethod
+    def _assign_ids(
+            known_ids: Dict[int, int],
+            fingerprints: np.ndarray,
+            next_id: int,
+            merge_duplicates: bool
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Assign the new ids to the rows of a table.
+
+        Args:
+            known_ids: the new ids of the rows already merged, by fingerprint.
+                It is updated with the new rows.
+            fingerprints: the fingerprints of the rows.
+            next_id: the first new id not assigned yet.
+            merge_duplicates: if True, rows with a known fingerprint get the
+                id of the known row, else every row gets a new id.
+
+        Returns:
+            The new id of each row, and a mask telling which rows are new.
+        """
+        if not merge_duplicates:
+            return np.arange(next_id, next_id + len(fingerprints)), np.ones(len(fingerprints), dtype=bool)
+        new_ids = np.empty(len(fingerprints), dtype=np.int64)
+        new = np.zeros(len(fingerprints), dtype=bool)
+        for pos, fingerprint in enumerate(fingerprints.tolist()):
+            new_id = known_ids.get(fingerprint)
+            if new_id is None:
+                new_id = known_ids[fingerprint] = next_id
+                next_id += 1
+                new[pos] = True
+            new_ids[pos] = new_id
+        return new_ids, new
+
+
+def _concat_tables(tables: List[pd.DataFrame], index_name: str) -> pd.DataFrame:
+    """Concatenate the tables of the merged datasets."""
+    if len(tables) == 0:
+        return pd.DataFrame(index=pd.Index([], name=index_name))
+    return pd.concat(tables).rename_axis(index_name)
+
+
 def _merge_info(
-        *coco_helpers: COCOHelper
+        infos: List[dict]
 ) -> dict:
     """
     Merge multiple COCOHelpers info fields.
 
     Args:
-        *coco_helpers: the list of COCOHelper datasets to merge.
+        infos: the info of the COCOHelper datasets to merge.
 
     Returns:
         A merged dictionary having information about the merging of multiple
@@ -54,7 +244,7 @@ def _merge_info(
     """
     info = COCOHelper.new_info_dict()
     info['contributor'] += ' -- Merger'
-    info['merged_infos'] = [ds.info for ds in coco_helpers]
+    info['merged_infos'] = list(infos)
     return info
 
 
@@ -75,78 +265,57 @@ def _merge_licenses(
 
 def _merge_categories(
         *coco_helpers: COCOHelper
-) -> Tuple[pd.DataFrame, List[dict]]:
+) -> Tuple[pd.DataFrame, List[IdMapping]]:
     """
     Merge the categories of all datasets.
 
+    Categories with the same name and supercategory are identified with a
+    single groupby over the concatenated categories, and all of them are
+    mapped to the new id of the last one.
+
     Returns:
         A tuple with 2 items: the first is a dataframe with the merged categories,
         the second is a list that contains a mapping of old ids to new ids.
         The list has as many items as coco datasets merged. For example, if you
         access the item at index 0, you get the mapping for the first dataset.
     """
-    dataframes = []
-    for i, ds in enumerate(coco_helpers):
-        category_df = ds.cats.copy().reset_index()
-        category_df['_dataset'] = i
-        dataframes.append(category_df)
-
-    concat_df = pd.concat(dataframes, ignore_index=True)
-    old_cats = concat_df.copy()
-    old_cats['new_id'] = -1
-
+    concat_df = pd.concat([ds.cats.reset_index() for ds in coco_helpers], ignore_index=True)
+    old_ids = concat_df['category_id'].to_numpy()
     concat_df['category_id'] = concat_df.index
 
-    for _, cat in concat_df.iterrows():
-        if 'supercategory' in old_cats.columns:
-            mask = (old_cats['name'] == cat['name']) & (old_cats['supercategory'] == cat['supercategory'])
-        else:
-            mask = (old_cats['name'] == cat['name'])
-        old_cats.loc[mask, 'new_id'] = cat['category_id']
+    keys = ['name', 'supercategory'] if 'supercategory' in concat_df.columns else ['name']
+    groups = concat_df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    last_ids = np.full(groups.max() + 1 if len(groups) > 0 else 0, -1)
+    np.maximum.at(last_ids, groups, concat_df['category_id'].to_numpy())
+    new_ids = last_ids[groups]
 
-    cat_id_mapping = old_cats[['_dataset', 'category_id', 'new_id']] \
-        .groupby('_dataset') \
-        .apply(_create_cat_mapping).to_dict()
-
-    concat_df = concat_df.drop(columns=['_dataset'])
+    cat_id_mapping = _split_mapping(old_ids, new_ids, [len(ds.cats) for ds in coco_helpers])
     return concat_df.set_index('category_id'), cat_id_mapping
 
 
 def _merge_images(
         *coco_helpers: COCOHelper
-) -> Tuple[pd.DataFrame, List[dict]]:
+) -> Tuple[pd.DataFrame, List[IdMapping]]:
     """Merge coco helpers images fields."""
-    dataframes = []
-    for i, ds in enumerate(coco_helpers):
-        images_df = ds.imgs.copy().reset_index()
-        images_df['_dataset'] = i
-        dataframes.append(images_df)
-
-    concat_df = pd.concat(dataframes, ignore_index=True)
-    concat_df['_old_id'] = concat_df['image_id']
+    concat_df = pd.concat([ds.imgs.reset_index() for ds in coco_helpers], ignore_index=True)
+    old_ids = concat_df['image_id'].to_numpy()
     concat_df['image_id'] = concat_df.index
 
-    image_id_mapping = concat_df[['_dataset', '_old_id', 'image_id']].groupby('_dataset') \
-        .apply(_create_image_mapping).to_dict()
-
-    concat_df = concat_df.drop(columns=['_dataset', '_old_id'])
-
+    image_id_mapping = _split_mapping(old_ids, concat_df['image_id'].to_numpy(), [len(ds.imgs) for ds in coco_helpers])
     return concat_df.set_index('image_id'), image_id_mapping
 
 
 def _merge_annotations(
         *coco_helpers: COCOHelper,
-        cat_id_mapping: List[dict],
-        image_id_mapping: List[dict]
+        cat_id_mapping: List[IdMapping],
+        image_id_mapping: List[IdMapping]
 ) -> pd.DataFrame:
     """Merge coco helpers annotations fields."""
     dataframes = []
     for i, ds in enumerate(coco_helpers):
-        image_mapping = image_id_mapping[i]
-        cat_mapping = cat_id_mapping[i]
-        anns_df = ds.anns.copy().reset_index()
-        anns_df['category_id'] = anns_df['category_id'].map(cat_mapping).fillna(anns_df['category_id'])
-        anns_df['image_id'] = anns_df['image_id'].map(image_mapping).fillna(anns_df['image_id'])
+        anns_df = ds.anns.reset_index()
+        anns_df['category_id'] = remap_ids(anns_df['category_id'], *cat_id_mapping[i])
+        anns_df['image_id'] = remap_ids(anns_df['image_id'], *image_id_mapping[i])
         dataframes.append(anns_df)
 
     concat_df = pd.concat(dataframes, ignore_index=True)
@@ -154,15 +323,11 @@ def _merge_annotations(
     return concat_df.set_index('annotation_id')
 
 
-def _create_image_mapping(x):
-    """
-    TODO
-    """
-    return pd.Series(x['image_id'].values, index=x['_old_id']).to_dict()
-
-
-def _create_cat_mapping(x):
-    """
-    TODO
-    """
-    return pd.Series(x['new_id'].values, index=x['category_id']).to_dict()
+def _split_mapping(
+        old_ids: np.ndarray,
+        new_ids: np.ndarray,
+        sizes: List[int]
+) -> List[IdMapping]:
+    """Split the id mapping of the concatenated tables in the mappings of each dataset."""
+    bounds = np.cumsum([0] + sizes)
+    return [(old_ids[start:end], new_ids[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,87 @@
+"""
+Bridge between COCOHelper and `pycocotools.COCO`.
+"""
+from typing import TYPE_CHECKING
+from collections import defaultdict
+from pycocotools.coco import COCO
+import numpy as np
+
+
+if TYPE_CHECKING:
+    from cocohelper import COCOHelper
+
+
+def build_coco(coco_helper: "COCOHelper") -> COCO:
+    """
+    Build a `pycocotools.COCO` object from the tables of a COCOHelper.
+
+    The result is the same of loading the COCO json dataset of the helper
+    with pycocotools, but the lookup structures (`anns`, `imgs`, `cats`,
+    `imgToAnns` and `catToImgs`) are filled directly from the tables and
+    from the helper index, instead of calling `COCO.createIndex()`: the
+    records of each table are built once, and shared between
+    `COCO.dataset` and the lookup structures.
+
+    Args:
+        coco_helper: the COCOHelper object representing a COCO dataset.
+
+    Returns:
+        A `pycocotools.COCO` object.
+    """
+    dataset = coco_helper.to_json_dataset()
+    ann_records, img_records, cat_records = dataset['annotations'], dataset['images'], dataset['categories']
+
+    coco = COCO(None)
+    coco.dataset = dataset
+    coco.anns = {ann['id']: ann for ann in ann_records}
+    coco.imgs = {img['id']: img for img in img_records}
+    coco.cats = {cat['id']: cat for cat in cat_records}
+
+    img_to_anns = defaultdict(list)
+    for img_id, positions in coco_helper.index.iter_img_ann_positions():
+        img_to_anns[img_id] = [ann_records[pos] for pos in positions.tolist()]
+    coco.imgToAnns = img_to_anns
+
+    cat_to_imgs = defaultdict(list)
+    anns = coco_helper.anns
+    if 'category_id' in anns.columns and 'image_id' in anns.columns:
+        # the image ids of the annotations of each category, in table order:
+        ann_cat_ids = anns['category_id'].to_numpy()
+        order = np.argsort(ann_cat_ids, kind='stable')
+        cat_ids, starts = np.unique(ann_cat_ids[order], return_index=True)
+        img_ids = anns['image_id'].to_numpy()[order].tolist()
+        for cat_id, start, end in zip(cat_ids.tolist(), starts.tolist(), starts[1:].tolist() + [len(order)]):
+            cat_to_imgs[cat_id] = img_ids[start:end]
+    coco.catToImgs = cat_to_imgs
+    return coco
+
+
+def copy_coco(coco: COCO) -> COCO:
+    """
+    Copy a `pycocotools.COCO` object, with new shallow copies of its
+    annotation dicts.
+
+    `COCOeval` writes to the annotation dicts of the ground truth (e.g. it
+    replaces the segmentations with their RLE, and adds the `ignore` keys):
+    the copy can be evaluated without altering the original object. The
+    other records (images and categories) are shared with the original.
+
+    Args:
+        coco: the COCO object to copy, as built by `build_coco`.
+
+    Returns:
+        A new `pycocotools.COCO` object.
+    """
+    # the same annotation dict is shared by `dataset`, `anns` and `imgToAnns`: copy it once.
+    copies = {id(ann): dict(ann) for ann in coco.dataset['annotations']}
+
+    coco_copy = COCO(None)
+    coco_copy.dataset = dict(coco.dataset)
+    coco_copy.dataset['annotations'] = [copies[id(ann)] for ann in coco.dataset['annotations']]
+    coco_copy.anns = {ann_id: copies[id(ann)] for ann_id, ann in coco.anns.items()}
+    coco_copy.imgs = dict(coco.imgs)
+    coco_copy.cats = dict(coco.cats)
+    coco_copy.imgToAnns = defaultdict(list, {img_id: [copies[id(ann)] for ann in anns]
+                                             for img_id, anns in coco.imgToAnns.items()})
+    coco_copy.catToImgs = defaultdict(list, {cat_id: list(img_ids) for cat_id, img_ids in coco.catToImgs.items()})
+    return coco_copy
@@ -1,11 +1,11 @@
 """
 Split the COCO dataset according to a K-fold rule.
 """
-from typing import List
-import random
+from typing import List, Optional, Tuple
+import numpy as np
 from cocohelper.splitters.proportional import ProportionalDataSplitter
 from cocohelper.splitters.stratified import StratifiedDataSplitter
-from cocohelper.splitters.splitter import Splitter
+from cocohelper.splitters.splitter import Splitter, materialize_split, splitter_rng
 from cocohelper import COCOHelper
 
 
@@ -14,7 +14,8 @@ class KFoldSplitter(Splitter):
     def __init__(
             self,
             n_fold: int,
-            stratified: bool = False
+            stratified: bool = False,
+            seed: Optional[int] = None
     ):
         """
         Split a COCO dataset into n datasets.
@@ -23,19 +24,40 @@ class KFoldSplitter(Splitter):
             n_fold: Defines the number of folds to be used for k-fold
                 cross-validation.
             stratified: If True the dataset is stratified.
+            seed: seed of the random number generator, to get reproducible
+                folds. If None, the module-level generator of `random` is
+                used (so the folds can be reproduced with `random.seed`).
         """
         if n_fold <= 1:
             raise ValueError("The number of folds must be greater than 1.")
 
         self.n_fold = n_fold
         self.stratified = stratified
+        self.seed = seed
         self._splitter: Splitter
 
         proportions = tuple([1] * n_fold)
         if stratified:
-            self._splitter = StratifiedDataSplitter(*proportions)
+            self._splitter = StratifiedDataSplitter(*proportions, seed=seed)
         else:
-            self._splitter = ProportionalDataSplitter(*proportions)
+            self._splitter = ProportionalDataSplitter(*proportions, seed=seed)
+
+    def plan(
+            self,
+            coco: COCOHelper
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the image ids of the train and validation sets of each fold,
+        without building the datasets.
+
+        Args:
+            coco: a COCOHelper containing the source dataset to be split.
+
+        Returns:
+            A list with a tuple of train and validation image ids per fold.
+        """
+        img_ids = coco.imgs.index
+        return [(img_ids[~img_ids.isin(val_ids)].to_numpy(), val_ids) for val_ids in self.split_ids(coco)]
 
     def iter(
             self,
@@ -44,20 +66,20 @@ class KFoldSplitter(Splitter):
         """
         Used to iterate over the dataset splits.
 
+        The folds are planned upfront as image ids, while the train and
+        validation datasets are built lazily, one fold at a time.
+
         Args:
             coco: a COCOHelper to be iterated over.
 
         Returns:
             A COCOHelper with filtered image ids.
         """
-        splits = self.apply(coco)
-        random.shuffle(splits)
+        plan = self.plan(coco)
+        splitter_rng(self.seed).shuffle(plan)
 
-        for split in splits:
-            split_imgs = split.imgs.index
-            train_imgs = coco.imgs[~coco.imgs.index.isin(split_imgs)]
-            train_imgs_ids = list(train_imgs.index)
-            yield coco.filter_imgs(img_ids=train_imgs_ids), split
+        for train_ids, val_ids in plan:
+            yield materialize_split(coco, train_ids), materialize_split(coco, val_ids)
 
     def apply(
             self,
@@ -73,3 +95,18 @@ class KFoldSplitter(Splitter):
             A list containing the splits of the source COCO dataset.
         """
         return self._splitter.apply(coco)
+
+    def split_ids(
+            self,
+            coco: COCOHelper
+    ) -> List[np.ndarray]:
+        """
+        Get the image ids of each fold of the given COCOHelper.
+
+        Args:
+            coco: a COCOHelper containing the source dataset to be split.
+
+        Returns:
+            A list with an array of image ids for each fold.
+        """
+        return self._splitter.split_ids(coco)
@@ -1,9 +1,9 @@
 """
 Split the COCO dataset according to a proportional rule.
 """
-from typing import List
-import random
-from cocohelper.splitters.splitter import Splitter
+from typing import List, Optional
+import numpy as np
+from cocohelper.splitters.splitter import Splitter, materialize_split, splitter_rng
 from cocohelper import COCOHelper
 
 
@@ -11,7 +11,8 @@ class ProportionalDataSplitter(Splitter):
 
     def __init__(
             self,
-            *proportions: float
+            *proportions: float,
+            seed: Optional[int] = None
     ):
         """
         Split a COCO dataset into N datasets.
@@ -21,12 +22,16 @@ class ProportionalDataSplitter(Splitter):
 
         Args:
             *proportions: Describe the split proportions for each split.
+            seed: seed of the random number generator, to get reproducible
+                splits. If None, the module-level generator of `random` is
+                used (so the splits can be reproduced with `random.seed`).
         """
         if len(proportions) <= 1:
             raise ValueError("A ProportionalDataSplitter requires a number of proportion values > 1.")
 
         prop_tot = sum(proportions)
         self.proportions = [float(v) / prop_tot for v in proportions]
+        self.seed = seed
 
     def apply(
             self,
@@ -41,14 +46,22 @@ class ProportionalDataSplitter(Splitter):
         Returns:
             A list containing the splits of the source COCO dataset.
         """
-        ids = self._get_ids(coco)
+        return [materialize_split(coco, ids) for ids in self.split_ids(coco)]
 
-        splits = []
+    def split_ids(
+            self,
+            coco: COCOHelper
+    ) -> List[np.ndarray]:
+        """
+        Get the image ids of each split of the given COCOHelper.
 
-        for _ids in ids:
-            splits.append(coco.filter_imgs(img_ids=_ids))
+        Args:
+            coco: a COCOHelper containing the source dataset to be split.
 
-        return splits
+        Returns:
+            A list with an array of image ids for each split.
+        """
+        return [np.asarray(ids, dtype=coco.imgs.index.dtype) for ids in self._get_ids(coco)]
 
     def _get_ids(
             self,
@@ -72,7 +85,7 @@ class ProportionalDataSplitter(Splitter):
             for img in images:
                 list_of_image_ids.append(img)
         list_of_image_ids = list(set(list_of_image_ids))
-        random.shuffle(list_of_image_ids)
+        splitter_rng(self.seed).shuffle(list_of_image_ids)
 
         n_images = len(list_of_image_ids)
         n_samples = self._get_n_samples(n_images)
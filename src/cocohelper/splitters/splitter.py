@@ -2,7 +2,9 @@
 Generic split of the COCO dataset according to a given strategy.
 """
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Iterable, Optional
+import numpy as np
+import random
 from cocohelper import COCOHelper
 
 
@@ -22,3 +24,59 @@ class Splitter(ABC):
         Returns:
             A list of COCOHelper datasets, subsets of the original set of data.
        """
+
+    def split_ids(
+            self,
+            coco: COCOHelper
+    ) -> List[np.ndarray]:
+        """
+        Split a COCODataset, getting the image ids of each subset instead of
+        the subsets themselves.
+
+        Args:
+            coco: The dataset on which we want to apply the split.
+
+        Returns:
+            A list with an array of image ids for each subset.
+        """
+        return [split.imgs.index.to_numpy() for split in self.apply(coco)]
+
+
+def splitter_rng(
+        seed: Optional[int]
+) -> random.Random:
+    """
+    Get the random number generator of a splitter.
+
+    Without a seed, the module-level generator of `random` is used, so that
+    `random.seed` makes the splits reproducible.
+
+    Args:
+        seed: the seed of the splitter, or None.
+
+    Returns:
+        A new generator with the given seed, or the module-level generator.
+    """
+    return random.Random(seed) if seed is not None else random._inst
+
+
+def materialize_split(
+        coco: COCOHelper,
+        img_ids: Iterable
+) -> COCOHelper:
+    """
+    Get the subset of a dataset containing the given images.
+
+    The images are selected directly on the images table, without computing
+    any join: the subset shares the categories and licenses tables with the
+    source dataset, and keeps the annotations of the selected images.
+
+    Args:
+        coco: the source dataset.
+        img_ids: the ids of the images of the subset.
+
+    Returns:
+        A COCOHelper with the selected images and their annotations.
+    """
+    imgs = coco.imgs
+    return coco.copy(img_df=imgs[imgs.index.isin(img_ids)])
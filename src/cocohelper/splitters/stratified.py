@@ -1,15 +1,18 @@
 """
 Split the COCO dataset according to stratified dataset splitting rule.
 """
-from typing import List
+from typing import List, Tuple
+from scipy import sparse
+import pandas as pd
+import numpy as np
 import random
 from cocohelper.splitters.proportional import ProportionalDataSplitter
+from cocohelper.splitters.splitter import splitter_rng
 from cocohelper import COCOHelper
 
-# TODO: clean code in this file:
-#  - Functions are too long.
-#  - Function nesting is too high (StratifiedDataSplitter has 5 nested sections)
 
+# Label assigned to the images without annotations.
+UNLABELLED = -1
 
 
 class StratifiedDataSplitter(ProportionalDataSplitter):
@@ -21,109 +24,160 @@ class StratifiedDataSplitter(ProportionalDataSplitter):
         """
         Get the ids needed for the stratified dataset splitting.
 
+        Images are assigned with iterative stratification: the label with the
+        fewest remaining images is selected, and each of its images is
+        assigned to the subset that still desires the largest number of
+        samples of that label (ties are broken by the subset size, then at
+        random). The desired number of samples of the subset is then
+        decreased for each annotation of the image.
+
+        The image×label counts are computed once as a sparse matrix, so the
+        whole assignment takes near-linear time in the number of annotations.
+
         Args:
             ch: a COCOHelper with the source COCO dataset.
 
         Returns:
             A list of ids for each subset.
         """
-        n_subsets = len(self.proportions)
-        subset_ratios = self.proportions
-
-        # normalise proportions in 0-1:
-        if len(subset_ratios) != n_subsets:
-            raise ValueError("The number of values for the ratios must be equal to the number of subsets 'n_subsets'")
-
-        # initialise dictionary to track subset content
-        dataset: List[dict] = list()
-        for sset in range(n_subsets):
-            dataset.append({
-                "ids": [],
-                "desired_size": -1,
-                "desired_size_for_label": dict()
-            })
-
-        # ----
-        # 0) get image ids grouped by label
-        imgs_anns = ch.joins.imgs_anns.fillna(-1)
-        ids_by_label = {k: list(set(v)) for k, v in imgs_anns.reset_index().groupby('category_id')['image_id']}
-
-        # ----
+        rng = splitter_rng(self.seed)
+        img_ids, counts, presence = self._label_matrices(ch)
+
         # 1) Compute the desired number of examples in each subset:
-        n_samples = len(ch.imgs)
-        for sset, r in enumerate(subset_ratios):
-            dataset[sset]["desired_size"] = r * n_samples  # ok if it is float...
+        subset_sizes = np.array(self.proportions) * len(img_ids)
 
-        # ----
         # 2) Compute the desired number of samples of each label at each subset:
-        label_ratios = self._compute_label_ratios(ids_by_label)
-        for sset in range(n_subsets):
-            for lbl in label_ratios.keys():
-                dataset[sset]["desired_size_for_label"][lbl] = dataset[sset]["desired_size"] * label_ratios[lbl]
+        label_ratios = self._compute_label_ratios(np.asarray(presence.sum(axis=0)).ravel())
+        desired = subset_sizes[:, np.newaxis] * label_ratios[np.newaxis, :]
 
-        # ----
         # 3) Iterative assignment:
-        while n_samples > 0:
-
-            # select the label with the fewest remaining samples:
-            n_min = min([len(v) for v in ids_by_label.values() if len(v) >= 1])
-            min_labels = [lbl for lbl in ids_by_label.keys() if len(ids_by_label[lbl]) == n_min]
-            selected_label = random.choice(min_labels)
-
-            # for each example of this label: assign to the best subset:
-            for img_id in ids_by_label[selected_label]:
-
-                # find the subset with the largest number of desired examples for this label
-                selected_subset = 0  # initialise with first subset (e.g. train)
-                n_max = dataset[selected_subset]["desired_size_for_label"][selected_label]
-                for sset in range(1, n_subsets):  # iterate over the remaining subsets
-
-                    if dataset[sset]["desired_size_for_label"][selected_label] > n_max:
-                        selected_subset = sset
-
-                    # breaking ties:
-                    elif dataset[sset]["desired_size_for_label"][selected_label] == n_max:
-                        if dataset[sset]["desired_size"] > dataset[selected_subset]["desired_size"]:
-                            selected_subset = sset
-                        elif dataset[sset]["desired_size"] == dataset[selected_subset]["desired_size"]:
-                            selected_subset = random.choice([selected_subset, sset])
+        order, subsets = _iterative_stratification(counts, presence, desired, subset_sizes, rng)
+        return [img_ids[order[subsets == sset]].tolist() for sset in range(len(self.proportions))]
 
-                # assign the element to the selected subset:
-                dataset[selected_subset]["ids"].append(img_id)
-
-                # remove this image from the dataset (i.e. remove it from the remaining lists)
-                for lbl in ids_by_label.keys():
-                    ids_by_label[lbl] = list(filter(lambda _id: _id != img_id, ids_by_label[lbl]))
+    @staticmethod
+    def _label_matrices(
+            ch: COCOHelper
+    ) -> Tuple[np.ndarray, sparse.csr_matrix, sparse.csr_matrix]:
+        """
+        Compute the image×label matrices of a dataset.
 
-                # decrease the number of desired samples for each label of this sample (inside selected_subset)
-                sample_labels = [lbl for lbl in ch.filtered_anns(img_ids=img_id)['category_id'].tolist()]
-                for lbl in sample_labels:
-                    dataset[selected_subset]["desired_size_for_label"][lbl] -= 1
+        Images without annotations get the `UNLABELLED` label, with no
+        annotations counted for it.
 
-                # decrease counter
-                n_samples -= 1
+        Args:
+            ch: a COCOHelper with the source COCO dataset.
 
-        return [dataset[sset]["ids"] for sset in range(n_subsets)]
+        Returns:
+            A tuple with the image ids (the rows of the matrices), the number
+            of annotations of each label in each image, and a binary matrix
+            telling which labels are in each image.
+        """
+        img_ids = pd.unique(ch.imgs.index.to_numpy())
+        if 'image_id' in ch.anns.columns and 'category_id' in ch.anns.columns:
+            img_pos = pd.Index(img_ids).get_indexer(ch.anns['image_id'])
+            cat_ids = ch.anns['category_id'].to_numpy()
+            valid = (img_pos >= 0) & pd.notna(cat_ids)
+            label_pos, _ = pd.factorize(cat_ids[valid], sort=True)
+            img_pos = img_pos[valid]
+        else:
+            label_pos = img_pos = np.empty(0, dtype=np.int64)
+        n_labels = int(label_pos.max()) + 1 if len(label_pos) > 0 else 0
+
+        # duplicate (image, label) entries are summed up:
+        counts = sparse.csr_matrix((np.ones(len(img_pos)), (img_pos, label_pos)), shape=(len(img_ids), n_labels))
+        presence = (counts > 0).astype(np.int64)
+        unlabelled = np.diff(counts.indptr) == 0
+        if unlabelled.any():
+            unlabelled_column = sparse.csr_matrix(unlabelled.astype(np.int64)[:, np.newaxis])
+            presence = sparse.hstack([presence, unlabelled_column], format='csr')
+            counts = sparse.hstack([counts, sparse.csr_matrix((len(img_ids), 1))], format='csr')
+        return img_ids, counts.tocsr(), presence.tocsr()
 
     @staticmethod
     def _compute_label_ratios(
-            images_by_label: dict
-    ) -> dict:
+            images_by_label: np.ndarray
+    ) -> np.ndarray:
         """
         Computes the ratio of labels within the COCO dataset.
 
         Args:
-            images_by_label: a dictionary grouping images by their labels.
+            images_by_label: the number of images of each label.
 
         Returns:
-            A dictionary with the ratios of labels in the COCO dataset.
+            An array with the ratios of labels in the COCO dataset.
         """
-        ratios = dict()
-        for k, v in zip(images_by_label.keys(), images_by_label.values()):
-            ratios[k] = float(len(v))
-        tot_number = sum(list(ratios.values()))
+        ratios = np.asarray(images_by_label, dtype=float)
+        tot_number = ratios.sum()
         if tot_number <= 0:
             raise ValueError("The sum of ratio values must be greater than zero.")
-        for k, v in zip(ratios.keys(), ratios.values()):
-            ratios[k] = float(v) / tot_number
-        return ratios
+        return ratios / tot_number
+
+
+def _select_subset(
+        desired_for_label: np.ndarray,
+        subset_sizes: np.ndarray,
+        rng: random.Random
+) -> int:
+    """
+    Select the subset with the largest number of desired samples of a label.
+
+    Ties are broken by the desired size of the subsets, then at random.
+    """
+    candidates = np.flatnonzero(desired_for_label == desired_for_label.max())
+    if len(candidates) > 1:
+        sizes = subset_sizes[candidates]
+        candidates = candidates[sizes == sizes.max()]
+    if len(candidates) > 1:
+        return rng.choice(candidates.tolist())
+    return int(candidates[0])
+
+
+def _iterative_stratification(
+        counts: sparse.csr_matrix,
+        presence: sparse.csr_matrix,
+        desired: np.ndarray,
+        subset_sizes: np.ndarray,
+        rng: random.Random
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assign images to subsets with iterative stratification.
+
+    Args:
+        counts: the number of annotations of each label (columns) in each
+            image (rows).
+        presence: a binary matrix telling which labels are in each image.
+        desired: the desired number of samples of each label (columns) in
+            each subset (rows). It is updated in place.
+        subset_sizes: the desired number of images in each subset.
+        rng: the random number generator used to break ties.
+
+    Returns:
+        A tuple with the positions of the images, in assignment order, and
+        the subset each of them is assigned to.
+    """
+    n_imgs = presence.shape[0]
+    imgs_by_label = presence.tocsc()
+    remaining = np.asarray(presence.sum(axis=0)).ravel()
+    subsets = np.full(n_imgs, -1, dtype=np.int64)
+    order = np.empty(n_imgs, dtype=np.int64)
+    n_assigned = 0
+
+    while n_assigned < n_imgs:
+        # select the label with the fewest remaining samples:
+        n_min = remaining[remaining > 0].min()
+        label = rng.choice(np.flatnonzero(remaining == n_min).tolist())
+
+        label_imgs = imgs_by_label.indices[imgs_by_label.indptr[label]:imgs_by_label.indptr[label + 1]]
+        for img in label_imgs[subsets[label_imgs] < 0].tolist():
+            subset = _select_subset(desired[:, label], subset_sizes, rng)
+            subsets[img] = subset
+            order[n_assigned] = img
+            n_assigned += 1
+
+            # remove this image from the remaining ones of its labels:
+            remaining[presence.indices[presence.indptr[img]:presence.indptr[img + 1]]] -= 1
+            # decrease the number of desired samples for each annotation of this image (inside subset):
+            start, end = counts.indptr[img], counts.indptr[img + 1]
+            desired[subset, counts.indices[start:end]] -= counts.data[start:end]
+
+    return order, subsets[order]
@@ -34,16 +34,16 @@ class Transform(ABC):
         images_dir = join(str(out_dir), COCOHelperPaths.img_dir)
 
         json_dataset = coco.to_json_dataset()
-        del json_dataset['paths']
+        json_dataset.pop('paths', None)
         images = []
         annotations = []
-        for image in json_dataset['images']:
-            # transforms example
-            image_data, anns = coco.get_img_sample(img_id=image['id'])
-            tr_image, tr_anns = self.apply(image_data['image'], anns)
+        # the next images are decoded in the background while the current one is transformed and saved:
+        img_arrays = coco.iter_imgs([image['id'] for image in json_dataset['images']])
+        for image, (img_id, img_array) in zip(json_dataset['images'], img_arrays):
+            tr_image, tr_anns = self.apply(img_array, coco.index.img_anns_records(img_id))
 
             # save image
-            image_fname = images_dir / image['file_name']
+            image_fname = Path(images_dir) / image['file_name']
             image_fname.parent.mkdir(parents=True, exist_ok=True)
             Image.fromarray(tr_image).save(image_fname)
 
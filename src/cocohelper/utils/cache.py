@@ -0,0 +1,145 @@
+"""
+A size-bounded LRU cache.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import dataclasses
+import threading
+
+
+__all__ = ["LRUCache", "CacheStats"]
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters describing the usage of a cache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that found the requested item in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class LRUCache:
+
+    def __init__(
+            self,
+            max_bytes: Optional[int] = None,
+            sizeof: Callable[[Any], int] = lambda _: 0
+    ):
+        """
+        Least-recently-used cache with a memory budget expressed in bytes.
+
+        When storing a new item makes the cache exceed its budget, the least
+        recently used items are evicted until the budget is respected again.
+        Items larger than the whole budget are never stored.
+
+        The cache is thread-safe.
+
+        Args:
+            max_bytes: memory budget of the cache, in bytes. If None, the cache
+                is unbounded.
+            sizeof: a function returning the size, in bytes, of a cached value.
+        """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("The memory budget of the cache must be >= 0.")
+
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._items: OrderedDict = OrderedDict()
+        self._nbytes = 0
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(
+            self,
+            key: Hashable,
+            default: Any = None
+    ) -> Any:
+        """
+        Get an item from the cache, marking it as the most recently used.
+
+        Args:
+            key: the key of the item.
+            default: the value returned if the key is not in the cache.
+
+        Returns:
+            The cached value, or `default` if the key is not in the cache.
+        """
+        with self._lock:
+            if key not in self._items:
+                self._stats.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self._stats.hits += 1
+            return self._items[key][0]
+
+    def put(
+            self,
+            key: Hashable,
+            value: Any
+    ) -> bool:
+        """
+        Store an item in the cache, evicting the least recently used items if needed.
+
+        Args:
+            key: the key of the item.
+            value: the value to store.
+
+        Returns:
+            True if the value has been stored, False if it is larger than the
+            cache budget.
+        """
+        nbytes = int(self._sizeof(value))
+        with self._lock:
+            if key in self._items:
+                self._nbytes -= self._items.pop(key)[1]
+            if self._max_bytes is not None and nbytes > self._max_bytes:
+                return False
+            self._items[key] = (value, nbytes)
+            self._nbytes += nbytes
+            while self._max_bytes is not None and self._nbytes > self._max_bytes:
+                _, (_, evicted_nbytes) = self._items.popitem(last=False)
+                self._nbytes -= evicted_nbytes
+                self._stats.evictions += 1
+            return True
+
+    def clear(self) -> None:
+        """Remove all the items from the cache (statistics are preserved)."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_lock']  # locks can't be pickled (nor deep-copied)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        """Memory budget of the cache, in bytes (None if unbounded)."""
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """Memory currently used by the cached items, in bytes."""
+        return self._nbytes
+
+    @property
+    def stats(self) -> CacheStats:
+        """A copy of the cache usage counters."""
+        return dataclasses.replace(self._stats)
@@ -0,0 +1,242 @@
+"""
+Utilities for storing DataFrames in a columnar on-disk format.
+"""
+from typing import Any, Dict, Optional, Tuple, Union
+from pandas import DataFrame
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import pickle
+import gc
+import json
+import os
+
+
+__all__ = ["save_tables", "load_tables", "file_fingerprint", "COLUMNAR_FORMAT_VERSION"]
+
+
+# Version of the on-disk layout: caches written with a different version are ignored.
+COLUMNAR_FORMAT_VERSION = 1
+
+_META_FNAME = 'meta.json'
+_INDEX_COLUMN = '__index__'
+
+
+def file_fingerprint(file: Union[str, Path]) -> Dict[str, int]:
+    """
+    Get a cheap fingerprint of a file, used to detect when it changes.
+
+    Args:
+        file: path to the file.
+
+    Returns:
+        A dict with the size and the modification time (in ns) of the file.
+    """
+    stat = os.stat(file)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _is_numeric(array: np.ndarray) -> bool:
+    """Check if an array can be stored (and memory-mapped) as a plain .npy file."""
+    return array.dtype.kind in 'biufcmM'
+
+
+def _leaves_type(values: list) -> Optional[type]:
+    """Get the type of the numbers in a list, or None if it contains other values or mixed types."""
+    types = set(map(type, values))
+    if len(types) == 1 and types <= {int, float}:
+        return types.pop()
+    return None
+
+
+def _encode_nested_lists(values: np.ndarray) -> Optional[Dict[str, Any]]:
+    """
+    Encode a column of lists of numbers (e.g. `bbox`) or of lists of lists of
+    numbers (e.g. polygon `segmentation`) as flat arrays.
+
+    The numbers are stored in a single flat array, with offsets delimiting
+    each list and each row. Rows that can't be encoded this way (e.g. RLE
+    dicts, None, numbers of mixed types) are kept as they are in
+    `fallback`, to be pickled.
+
+    Returns:
+        A dict with the encoded arrays, or None if no row can be encoded.
+    """
+    kinds = [0] * len(values)  # 0: fallback, 1: list of numbers, 2: list of lists of numbers
+    leaves_types = [None] * len(values)
+    for i, value in enumerate(values.tolist()):
+        if type(value) is not list:
+            continue
+        if len(value) > 0 and all(type(v) is list for v in value):
+            leaves_type = _leaves_type([x for v in value for x in v])
+            depth = 2
+        else:
+            leaves_type = _leaves_type(value)
+            depth = 1
+        if leaves_type is not None or (depth == 1 and len(value) == 0):
+            kinds[i] = depth
+            leaves_types[i] = leaves_type
+    if not any(kinds):
+        return None
+
+    # all the numbers of a column share the same type: rows with different number types are not encoded.
+    dtype = float if float in leaves_types else int
+    flat, part_lengths, cell_lengths, fallback = [], [], [0] * len(values), dict()
+    for i, (kind, leaves_type, value) in enumerate(zip(kinds, leaves_types, values.tolist())):
+        if kind != 0 and leaves_type not in (dtype, None):
+            kinds[i] = kind = 0
+        if kind == 0:
+            fallback[i] = value
+            continue
+        parts = [value] if kind == 1 else value
+        for part in parts:
+            flat.extend(part)
+            part_lengths.append(len(part))
+        cell_lengths[i] = len(parts)
+    return {
+        'kinds': np.array(kinds, dtype=np.int8),
+        'cell_offsets': np.concatenate([[0], np.cumsum(cell_lengths, dtype=np.int64)]),
+        'part_offsets': np.concatenate([[0], np.cumsum(part_lengths, dtype=np.int64)]),
+        'values': np.array(flat, dtype=np.float64 if dtype is float else np.int64),
+        'fallback': fallback,
+    }
+
+
+def _decode_nested_lists(encoded: Dict[str, Any]) -> np.ndarray:
+    """Decode a column encoded with `_encode_nested_lists`."""
+    flat = encoded['values'].tolist()
+    part_offsets = encoded['part_offsets'].tolist()
+    cell_offsets = encoded['cell_offsets'].tolist()
+    parts = [flat[start:end] for start, end in zip(part_offsets[:-1], part_offsets[1:])]
+    cells = [parts[start] if kind == 1 else parts[start:end] if kind == 2 else None
+             for kind, start, end in zip(encoded['kinds'].tolist(), cell_offsets[:-1], cell_offsets[1:])]
+    for i, value in encoded['fallback'].items():
+        cells[i] = value
+    out = np.empty(len(cells), dtype=object)
+    out[:] = cells
+    return out
+
+
+def _save_table(
+        table_dir: Path,
+        df: DataFrame
+) -> dict:
+    """
+    Store a DataFrame in a directory, one file per column.
+
+    Numeric columns are stored as .npy files, while object columns (strings,
+    lists, dicts, ...) are pickled together in a single file. Columns of
+    lists of numbers are flattened to numeric arrays before pickling, since
+    they are much faster to unpickle than the lists themselves.
+
+    Returns:
+        The metadata needed to load the table back.
+    """
+    os.makedirs(table_dir, exist_ok=True)
+    columns = [(_INDEX_COLUMN, df.index.to_numpy())] + [(col, df[col].to_numpy()) for col in df.columns]
+    columns_meta = []
+    objects = dict()
+    for i, (name, values) in enumerate(columns):
+        if _is_numeric(values):
+            fname = f"c{i}.npy"
+            np.save(table_dir / fname, values, allow_pickle=False)
+            columns_meta.append({'name': name, 'file': fname})
+        else:
+            encoded = _encode_nested_lists(values)
+            objects[i] = encoded if encoded is not None else values
+            columns_meta.append({'name': name, 'file': None, 'nested_lists': encoded is not None})
+    with open(table_dir / 'objects.pkl', 'wb') as f:
+        pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {'index_name': df.index.name, 'columns': columns_meta}
+
+
+def _load_table(
+        table_dir: Path,
+        meta: dict,
+        mmap: bool
+) -> DataFrame:
+    """Load a DataFrame stored with `_save_table`."""
+    with open(table_dir / 'objects.pkl', 'rb') as f:
+        objects = pickle.load(f)
+    values = []
+    for i, column_meta in enumerate(meta['columns']):
+        if column_meta.get('nested_lists', False):
+            values.append(_decode_nested_lists(objects[i]))
+        elif column_meta['file'] is None:
+            values.append(objects[i])
+        else:
+            # copy-on-write mapping: pages are read lazily and never written back to the file.
+            values.append(np.load(table_dir / column_meta['file'], mmap_mode='c' if mmap else None))
+    index = pd.Index(values[0], name=meta['index_name'], copy=False)
+    data = {column_meta['name']: column for column_meta, column in zip(meta['columns'][1:], values[1:])}
+    return DataFrame(data, index=index, copy=False)
+
+
+def save_tables(
+        cache_dir: Union[str, Path],
+        tables: Dict[str, DataFrame],
+        meta: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Store a set of DataFrames in a directory using a columnar format.
+
+    The metadata file is written last: if the process is interrupted while
+    writing, the directory is not recognized as a valid cache.
+
+    Args:
+        cache_dir: output directory.
+        tables: the DataFrames to store, by name.
+        meta: additional json-serializable metadata stored with the tables.
+    """
+    cache_dir = Path(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_file = cache_dir / _META_FNAME
+    if meta_file.exists():
+        os.remove(meta_file)
+
+    tables_meta = {name: _save_table(cache_dir / name, df) for name, df in tables.items()}
+    content = {'version': COLUMNAR_FORMAT_VERSION, 'tables': tables_meta, 'meta': meta if meta is not None else {}}
+    tmp_file = cache_dir / (_META_FNAME + '.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(content, f)
+    os.replace(tmp_file, meta_file)
+
+
+def load_tables(
+        cache_dir: Union[str, Path],
+        mmap: bool = True
+) -> Tuple[Dict[str, DataFrame], Dict[str, Any]]:
+    """
+    Load a set of DataFrames stored with `save_tables`.
+
+    Numeric columns are memory-mapped (copy-on-write) when `mmap=True`, so
+    they are read from disk only when accessed. Object columns are unpickled:
+    only load caches written by trusted sources.
+
+    Args:
+        cache_dir: directory containing the stored tables.
+        mmap: if True, memory-map the numeric columns instead of reading them.
+
+    Returns:
+        A tuple with the DataFrames by name and the additional metadata.
+
+    Raises:
+        FileNotFoundError if the directory does not contain stored tables.
+        ValueError if the tables are stored with an unsupported format version.
+    """
+    cache_dir = Path(cache_dir)
+    with open(cache_dir / _META_FNAME, 'r') as f:
+        content = json.load(f)
+    if content.get('version') != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {content.get('version')}.")
+
+    # Object columns create millions of small containers: pause the cyclic garbage collector meanwhile.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        tables = {name: _load_table(cache_dir / name, table_meta, mmap)
+                  for name, table_meta in content['tables'].items()}
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return tables, content['meta']
@@ -2,12 +2,19 @@
 Utilities* for `DataFrame` manipulation.
 """
 from pandas.core.util.hashing import hash_pandas_object
-from typing import List, Optional, Tuple, Dict
-from pandas import DataFrame
-import warnings
+from typing import Any, Iterator, List, Optional, Tuple, Dict, Union
+from pandas import DataFrame, Series
+import pandas as pd
+import numpy as np
+import hashlib
+import struct
 from cocohelper.utils.colmapper import ColMap
 
 
+# The old ids of a table and the corresponding new ids.
+IdMapping = Tuple[np.ndarray, np.ndarray]
+
+
 def serialize_row(row):
     for idx in row.index:
         row[idx] = '{}'.format(row[idx])
@@ -32,64 +39,212 @@ def df_to_records(
     data_frame = data_frame.reset_index(drop=data_frame.index.name is None)
     if id_col_mapper is not None:
         data_frame = data_frame.rename(columns=id_col_mapper.to_orig)
-    return data_frame.to_dict(orient='records')
+    # same as `data_frame.to_dict(orient='records')`, but converting the values column by column:
+    columns = data_frame.columns.tolist()
+    values = [_to_native_list(data_frame.iloc[:, i]) for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
 
 
-def drop_duplicate_rows(
+def _to_native_list(series: Series) -> list:
+    """Convert a Series to a list of Python objects, boxing the NumPy scalars as `DataFrame.to_dict` does."""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return series.tolist()
+    return [_box_native(value) if isinstance(value, np.generic) else value for value in series.tolist()]
+
+
+def _box_native(value: np.generic) -> Any:
+    """Convert a NumPy scalar to the Python object used by `DataFrame.to_dict`."""
+    if isinstance(value, np.datetime64):
+        return pd.Timestamp(value)
+    if isinstance(value, np.timedelta64):
+        return pd.Timedelta(value)
+    if isinstance(value, (np.bool_, np.integer, np.floating)):
+        return value.item()
+    return value
+
+
+def df_to_records_chunks(
+        data_frame: DataFrame,
+        id_col_mapper: Optional[ColMap] = None,
+        chunk_size: int = 10000
+) -> Iterator[List[dict]]:
+    """
+    Convert a DataFrame to records (as `df_to_records`), a chunk of rows at a time.
+
+    Args:
+        data_frame: input DataFrame.
+        id_col_mapper: the mapping of the column names to their original names.
+        chunk_size: the number of rows of each chunk.
+
+    Returns:
+        An iterator over the lists of records of each chunk.
+    """
+    for start in range(0, len(data_frame), chunk_size):
+        yield df_to_records(data_frame.iloc[start:start + chunk_size], id_col_mapper)
+
+
+# Odd 64-bit constant mixing the hash of each column with the hash of its name (golden ratio * 2^64).
+_FINGERPRINT_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_fingerprints(
         df: DataFrame,
         ignore_columns: Optional[List[str]] = None
-) -> Tuple[DataFrame, dict]:
+) -> np.ndarray:
     """
-    Drop duplicates rows of a DataFrame and return a map of merged elements.
+    Compute a 64-bit fingerprint of the values of each row of a DataFrame
+    (the index is not considered).
 
-    Duplicate are defined as rows with the same values except the index. Some
-    columns can be ignored at the end of identifying duplicates.
+    Rows with the same values get the same fingerprint, regardless of the
+    order of the columns, and missing values count as missing columns: the
+    fingerprints can be compared between DataFrames with different columns,
+    as if they were concatenated. Numeric columns are hashed as floats, so
+    that 1 and 1.0 are the same value (as in a concatenated DataFrame).
+    Lists, tuples, arrays and dicts (e.g. `bbox` and `segmentation`) are
+    hashed by their contents.
+    Different rows get the same fingerprint with probability ~2^-64.
 
     Args:
         df: input DataFrame.
-        ignore_columns: the columns to ignore for duplicates identification.
+        ignore_columns: the columns not considered in the fingerprints.
 
     Returns:
-        - The DataFrame without duplicates.
-        - A dict that maps indices of the dropped (merged) elements to the
-          indices of the corresponding kept elements.
+        An array with the fingerprint of each row.
     """
-    check_dup_cols = list(df.columns)
+    ignore_columns = set(ignore_columns) if ignore_columns is not None else set()
+    fingerprints = np.zeros(len(df), dtype=np.uint64)
+    for col in df.columns:
+        if col in ignore_columns:
+            continue
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype(float)
+        try:
+            hashes = hash_pandas_object(values, index=False).to_numpy()
+        except TypeError:
+            hashes = _object_hashes(values)
+        col_hash = hash_pandas_object(Series([str(col)]), index=False).to_numpy()[0]
+        # the sum of the column terms does not depend on the order of the columns:
+        fingerprints += np.where(values.notna().to_numpy(), (hashes ^ col_hash) * _FINGERPRINT_MIX, 0)
+    return fingerprints
 
-    if ignore_columns is not None:
-        if not isinstance(ignore_columns, list):
-            ignore_columns = list(ignore_columns)
-        check_dup_cols = list(set(check_dup_cols) - set(ignore_columns))
 
-    hashable_check_dup_cols = []
-    for col in check_dup_cols:
+def _has_containers(values: Series) -> bool:
+    """Check if a column has container values (lists, tuples, arrays, dicts)."""
+    return values.dtype == object and any(isinstance(value, _CONTAINERS) for value in values.to_numpy())
+
+
+def _object_hashes(values: Series) -> np.ndarray:
+    """
+    Hash a column with containers (lists, tuples, arrays, dicts): they are
+    hashed by their contents (see `_digest`), the other values as by
+    `hash_pandas_object`.
+    """
+    objects = values.to_numpy()
+    is_container = np.fromiter((isinstance(value, _CONTAINERS) for value in objects), dtype=bool, count=len(objects))
+    hashes = np.zeros(len(objects), dtype=np.uint64)
+    hashes[is_container] = [int.from_bytes(_digest(value), 'little') for value in objects[is_container]]
+    if not is_container.all():
+        others = values[~is_container]
         try:
-            hash_pandas_object(df[col])
-            hashable_check_dup_cols.append(col)
+            hashes[~is_container] = hash_pandas_object(others, index=False).to_numpy()
         except TypeError:
-            warnings.warn(f"`drop_duplicate_rows` is trying to use column {col} to check duplications, "
-                          f"but is not hashable and it will be skipped for this check.")
+            hashes[~is_container] = hash_pandas_object(others.astype(str), index=False).to_numpy()
+    return hashes
 
-    if len(hashable_check_dup_cols) < 1:
-        raise ValueError("There are no columns that can be used to check for duplicates.")
 
-    index_name = df.index.name if df.index.name is not None else 'index'
-    mapping = (df[hashable_check_dup_cols].reset_index()
-               .groupby(hashable_check_dup_cols)[index_name]
-               .agg(['first', tuple])
-               .set_index('first')['tuple']
-               .to_dict())
+_CONTAINERS = (list, tuple, dict, np.ndarray)
 
-    # Reverse the mapping:
-    mapping = {v: k for k, values in mapping.items() for v in values}
 
-    return df.drop_duplicates(subset=check_dup_cols), mapping
+def _digest(value: Any) -> bytes:
+    """
+    Compute a stable 8-bytes digest of a (nested) value.
+
+    Numbers are digested as floats, so that equal values get the same digest
+    regardless of their type. Lists of numbers with a regular shape (e.g.
+    boxes and single polygons) are digested at once, as an array of floats.
+    """
+    if isinstance(value, dict):
+        digest = hashlib.blake2b(b'd', digest_size=8)
+        for key in sorted(value, key=str):
+            digest.update(str(key).encode())
+            digest.update(_digest(value[key]))
+        return digest.digest()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            # ragged nested lists
+            array = None
+        if array is not None and array.dtype.kind in 'biuf':
+            array = array.astype(float)
+            return hashlib.blake2b(b'a' + str(array.shape).encode() + array.tobytes(), digest_size=8).digest()
+        digest = hashlib.blake2b(b'l', digest_size=8)
+        for item in value:
+            digest.update(_digest(item))
+        return digest.digest()
+    if isinstance(value, (bool, np.bool_)):
+        return b'b1' if value else b'b0'
+    if isinstance(value, (int, float, np.number)):
+        return struct.pack('<d', float(value))
+    if isinstance(value, bytes):
+        value = value.decode()
+    return hashlib.blake2b(b's' + str(value).encode(), digest_size=8).digest()
+
+
+def drop_duplicate_rows(
+        df: DataFrame,
+        ignore_columns: Optional[List[str]] = None
+) -> Tuple[DataFrame, IdMapping]:
+    """
+    Drop duplicates rows of a DataFrame and return a map of merged elements.
+
+    Duplicate are defined as rows with the same values except the index. Some
+    columns can be ignored at the end of identifying duplicates.
+
+    Duplicates are found in a single pass, comparing the 64-bit fingerprints
+    of the rows (see `row_fingerprints`): columns with lists or dicts, such
+    as `bbox` and `segmentation`, are compared too.
+
+    Args:
+        df: input DataFrame.
+        ignore_columns: the columns to ignore for duplicates identification.
+
+    Returns:
+        - The DataFrame without duplicates (the first row of each group of
+          duplicates is kept). If there are no duplicates, the input
+          DataFrame itself is returned.
+        - The mapping of the indices of all the rows to the indices of the
+          corresponding kept rows, as two arrays: the old indices and the new
+          ones.
+    """
+    if len(df) > 0 and len(set(df.columns) - set(ignore_columns or [])) == 0:
+        raise ValueError("There are no columns that can be used to check for duplicates.")
+
+    ignore_columns = list(ignore_columns or [])
+    container_columns = [col for col in df.columns if col not in ignore_columns and _has_containers(df[col])]
+    fingerprints = row_fingerprints(df, ignore_columns + container_columns)
+    # only rows with the same scalar values can be duplicates: the (slower) hashes of the container columns are
+    # added to their fingerprints only, giving the same fingerprints of `row_fingerprints(df, ignore_columns)`.
+    candidates = Series(fingerprints).duplicated(keep=False).to_numpy()
+    if len(container_columns) > 0 and candidates.any():
+        fingerprints[candidates] += row_fingerprints(df.iloc[candidates][container_columns])
+
+    codes, _ = pd.factorize(fingerprints)
+    # codes are assigned in order of appearance: the first row of each code is the kept one.
+    _, first_rows = np.unique(codes, return_index=True)
+    old_ids = df.index.to_numpy()
+    mapping = (old_ids, old_ids[first_rows[codes]])
+    if len(first_rows) == len(df):
+        # no duplicates: the DataFrame is returned as it is.
+        return df, mapping
+    return df.iloc[np.sort(first_rows)], mapping
 
 
 def fix_fk_after_drop_duplicate(
         connected_df: DataFrame,
         fk_column: str,
-        merge_index_mapping: Dict
+        merge_index_mapping: Union[IdMapping, Dict]
 ) -> DataFrame:
     """
     Fix the foreign key of a dataframe connected to a dataframe with dropped
@@ -104,13 +259,51 @@ def fix_fk_after_drop_duplicate(
             have been removed.
         fk_column: the column of connected_df that contains the foreign key that
             should be fixed.
-        merge_index_mapping: a dict that maps the dropped keys to the key of the
-            not-dropped duplicate row, e.g. if we merged rows with index (0, 1, 2)
+        merge_index_mapping: the mapping returned by `drop_duplicate_rows`, or
+            a dict that maps the dropped keys to the key of the not-dropped
+            duplicate row, e.g. if we merged rows with index (0, 1, 2)
             keeping only 0, and we merged rows with index (3, 4, 5) keeping only
             3, this map should be: {1: 0, 2: 0, 4: 3, 5: 3}.
 
     Returns:
         A copy of connected_df with fixed foreign key (values of fk_columns).
     """
-    connected_df[fk_column] = connected_df[fk_column].map(merge_index_mapping).fillna(connected_df[fk_column])
+    if isinstance(merge_index_mapping, dict):
+        merge_index_mapping = (np.array(list(merge_index_mapping.keys())),
+                               np.array(list(merge_index_mapping.values())))
+    connected_df[fk_column] = remap_ids(connected_df[fk_column], *merge_index_mapping)
     return connected_df
+
+
+def remap_ids(
+        ids: Series,
+        old_ids: np.ndarray,
+        new_ids: np.ndarray
+) -> Series:
+    """
+    Replace the ids found in `old_ids` with the corresponding `new_ids`.
+
+    This is the same as `ids.map(dict(zip(old_ids, new_ids))).fillna(ids)`,
+    but the ids are looked up with array indexing, without building a dict,
+    and integer ids stay integer even if some of them are not remapped.
+
+    Args:
+        ids: the ids to replace, e.g. a foreign key column.
+        old_ids: the ids to be replaced. If an id appears more than once, its
+            last occurrence is used.
+        new_ids: the new id for each of `old_ids`.
+
+    Returns:
+        A Series with the remapped ids, with the same index of `ids`. Ids not
+        found in `old_ids` are kept unchanged.
+    """
+    if len(old_ids) == 0:
+        return ids.copy()
+    old_index = pd.Index(old_ids)
+    unique = ~old_index.duplicated(keep='last')
+    positions = old_index[unique].get_indexer(ids)
+    remapped = np.asarray(new_ids)[unique][positions]
+    found = positions >= 0
+    if not found.all():
+        remapped = np.where(found, remapped, ids.to_numpy())
+    return Series(remapped, index=ids.index, name=ids.name)
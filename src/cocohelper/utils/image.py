@@ -0,0 +1,241 @@
+"""
+Image decoding, caching and background prefetching of images.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Hashable, Iterator, Optional, Sequence, Tuple, Union
+from PIL import Image
+import numpy as np
+import cv2
+from cocohelper.utils.cache import LRUCache, CacheStats
+
+
+__all__ = ["IMAGE_BACKENDS", "read_image", "downsample_image", "ImageCache", "ImagePrefetcher"]
+
+
+# Libraries that can decode the image files.
+IMAGE_BACKENDS = ('pil', 'cv2')
+
+
+def read_image(
+        path: Union[str, Path],
+        backend: str = 'pil',
+        max_size: Optional[int] = None
+) -> np.ndarray:
+    """
+    Decode an image file as a numpy array.
+
+    Both backends return the channels in RGB(A) order and keep single-channel
+    images as (H, W) arrays. OpenCV is usually faster to decode JPEG files;
+    palette images are converted to RGB by OpenCV, while PIL returns the
+    palette indices.
+
+    Args:
+        path: the path of the image file.
+        backend: the library decoding the image, one of `IMAGE_BACKENDS`.
+        max_size: if not None, the image is downsampled so that its longest
+            side is at most `max_size` pixels (see `downsample_image`).
+
+    Returns:
+        A numpy array with shape (H, W, C) or (H, W).
+
+    Raises:
+        ValueError if the backend is unknown or OpenCV cannot decode the file.
+        FileNotFoundError if the file does not exist.
+    """
+    if backend == 'pil':
+        with Image.open(path) as img:
+            image_array: np.ndarray = np.array(img)
+    elif backend == 'cv2':
+        # np.fromfile + imdecode (instead of imread) to support non-ASCII paths and raise on missing files.
+        image_array = cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image_array is None:
+            raise ValueError(f"Cannot decode the image file '{path}'.")
+        if image_array.ndim == 3 and image_array.shape[2] == 3:
+            image_array = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
+        elif image_array.ndim == 3 and image_array.shape[2] == 4:
+            image_array = cv2.cvtColor(image_array, cv2.COLOR_BGRA2RGBA)
+    else:
+        raise ValueError(f"Unknown image backend '{backend}', expected one of {IMAGE_BACKENDS}.")
+    return downsample_image(image_array, max_size) if max_size is not None else image_array
+
+
+def downsample_image(
+        image: np.ndarray,
+        max_size: int
+) -> np.ndarray:
+    """
+    Downsample an image so that its longest side is at most `max_size` pixels.
+
+    The aspect ratio is preserved, and smaller images are returned as they are.
+
+    Args:
+        image: the image array, with shape (H, W, C) or (H, W).
+        max_size: the maximum length of the sides of the image, in pixels.
+
+    Returns:
+        The downsampled image.
+    """
+    if max_size < 1:
+        raise ValueError("The maximum size of a downsampled image must be positive.")
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+class ImageCache:
+
+    def __init__(
+            self,
+            max_bytes: int
+    ):
+        """
+        In-memory LRU cache of decoded images, with a memory budget.
+
+        Images are cached by file path, decoding backend and maximum size, so
+        the downsampled versions of an image (see `read_image`) are cached
+        independently of its full-size version, and take a fraction of its
+        memory. A cache can be shared by several datasets.
+
+        The cached arrays are read-only, and `read` returns a copy of them:
+        the images can be modified in place (e.g. to draw annotations on
+        them) without altering the cache.
+
+        The cache is thread-safe.
+
+        Args:
+            max_bytes: memory budget of the cache, in bytes.
+        """
+        self._cache = LRUCache(max_bytes=max_bytes, sizeof=lambda image: image.nbytes)
+
+    def read(
+            self,
+            path: Union[str, Path],
+            backend: str = 'pil',
+            max_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Get an image from the cache, decoding and caching it on a miss.
+
+        Args:
+            path: the path of the image file.
+            backend: the library decoding the image, one of `IMAGE_BACKENDS`.
+            max_size: if not None, the maximum length of the image sides.
+
+        Returns:
+            A copy of the cached image.
+        """
+        key = (str(path), backend, max_size)
+        image = self._cache.get(key)
+        if image is None:
+            image = read_image(path, backend=backend, max_size=max_size)
+            image.flags.writeable = False
+            self._cache.put(key, image)
+        return image.copy()
+
+    def clear(self) -> None:
+        """Remove all the images from the cache (statistics are preserved)."""
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def max_bytes(self) -> int:
+        """Memory budget of the cache, in bytes."""
+        return self._cache.max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """Memory currently used by the cached images, in bytes."""
+        return self._cache.nbytes
+
+    @property
+    def stats(self) -> CacheStats:
+        """The hits, misses and evictions of the cache."""
+        return self._cache.stats
+
+
+class ImagePrefetcher:
+
+    def __init__(
+            self,
+            load: Callable[[Hashable], np.ndarray],
+            keys: Sequence[Hashable],
+            num_workers: int = 4,
+            queue_depth: int = 8
+    ):
+        """
+        Iterate over images loaded in the background by a pool of threads.
+
+        The images of the upcoming keys are loaded ahead of the consumer, at
+        most `queue_depth` at a time, and are delivered in the order of the
+        keys. Image decoding releases the GIL, so the threads decode in
+        parallel while the consumer processes the current image.
+
+        If loading an image fails, its exception is raised when the consumer
+        reaches that image. Stopping the iteration early (or closing the
+        iterator) cancels the pending loads.
+
+        Args:
+            load: the function loading the image of a key.
+            keys: the keys of the images, in iteration order.
+            num_workers: the number of loading threads.
+            queue_depth: the maximum number of images loaded ahead of the
+                consumer (including the ones being loaded).
+
+        Raises:
+            ValueError if num_workers or queue_depth are not positive.
+        """
+        if num_workers < 1 or queue_depth < 1:
+            raise ValueError("The number of workers and the queue depth of a prefetcher must be positive.")
+        self._load = load
+        self._keys = keys
+        self.num_workers = num_workers
+        self.queue_depth = queue_depth
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        """
+        Iterate over the keys and their images.
+
+        Yields:
+            A tuple with the key and its image, in the order of the keys.
+        """
+        keys = iter(self._keys)
+        pending: Deque[Tuple[Hashable, Future]] = deque()
+        executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='image-prefetch')
+        try:
+            self._fill(executor, keys, pending)
+            while pending:
+                key, future = pending.popleft()
+                image = future.result()
+                self._fill(executor, keys, pending)
+                yield key, image
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _fill(
+            self,
+            executor: ThreadPoolExecutor,
+            keys: Iterator[Hashable],
+            pending: Deque[Tuple[Hashable, Future]]
+    ):
+        """Submit the loads of the next keys until `queue_depth` images are pending."""
+        while len(pending) < self.queue_depth:
+            key: Optional[Hashable] = next(keys, _END)
+            if key is _END:
+                return
+            pending.append((key, executor.submit(self._load, key)))
+
+
+# Sentinel marking the end of the keys.
+_END = object()
@@ -0,0 +1,364 @@
+"""
+Utilities for streaming COCO json files.
+"""
+from typing import Any, Dict, Iterable, IO, Optional, Tuple, Union
+from json import JSONDecoder, JSONDecodeError
+from pathlib import Path
+from pandas import DataFrame
+import pandas as pd
+import tempfile
+import shutil
+import gzip
+import json
+
+
+__all__ = ["read_coco_tables", "JsonObjectWriter", "open_json_file", "COCO_TABLES"]
+
+
+# Top level keys of a COCO json file containing a list of records (a table).
+COCO_TABLES = ('images', 'annotations', 'categories', 'licenses')
+
+_WHITESPACES = ' \t\n\r'
+
+
+class _ColumnsBuilder:
+
+    def __init__(self, skip_columns: Iterable[str] = ()):
+        """
+        Accumulate records into columns, without keeping the records in memory.
+
+        Args:
+            skip_columns: keys of the records that are discarded.
+        """
+        self._skip_columns = set(skip_columns)
+        self._columns: Dict[str, list] = dict()
+        self._n_rows = 0
+
+    def add(self, record: dict) -> None:
+        """Append a record (as a new row) to the columns."""
+        n_values = 0
+        for key, value in record.items():
+            if key in self._skip_columns:
+                continue
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = [None] * self._n_rows
+            column.append(value)
+            n_values += 1
+        self._n_rows += 1
+        if n_values != len(self._columns):
+            # fill the columns missing in this record:
+            for column in self._columns.values():
+                if len(column) < self._n_rows:
+                    column.append(None)
+
+    def to_dataframe(self) -> DataFrame:
+        """Convert the columns to a DataFrame, releasing each column list once converted."""
+        data = dict()
+        for key in list(self._columns.keys()):
+            data[key] = pd.Series(self._columns.pop(key))
+        return DataFrame(data)
+
+
+class _JsonStreamReader:
+
+    def __init__(
+            self,
+            file: IO[str],
+            chunk_size: int = 2 ** 20
+    ):
+        """
+        Incrementally read json values from a text file.
+
+        Args:
+            file: a text file opened in read mode.
+            chunk_size: number of characters read from the file at each read.
+        """
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _read_more(self) -> bool:
+        """Read a new chunk from the file, dropping the consumed part of the buffer."""
+        if self._eof:
+            return False
+        chunk = self._file.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Get the next non-whitespace character without consuming it ('' at the end of the file)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACES:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """Consume the next non-whitespace character, that must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise JSONDecodeError(f"Expecting '{char}', found '{found}'", self._buffer, self._pos)
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode and consume the next json value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value ending with the buffer could be truncated (e.g. a number): read more to be sure.
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read_more()
+
+    def items(self) -> Iterable[Tuple[str, "_JsonStreamReader"]]:
+        """Iterate over the keys of a json object, leaving the reader positioned on each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect('}')
+            return
+
+    def array(self) -> Iterable[Any]:
+        """Iterate over the elements of a json array, decoding one element at a time."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def open_json_file(
+        file: Union[str, Path],
+        mode: str = 'r'
+) -> IO[str]:
+    """
+    Open a json file in text mode, transparently (de)compressing it if its name ends with `.gz`.
+
+    Args:
+        file: path to the json file.
+        mode: 'r' to read the file, 'w' to write it.
+
+    Returns:
+        The opened file.
+    """
+    if str(file).endswith('.gz'):
+        # level 6 (as the gzip command line tool) is much faster than the default 9, for a slightly larger file.
+        return gzip.open(file, mode + 't', compresslevel=6, encoding='utf-8')
+    return open(file, mode)
+
+
+def read_coco_tables(
+        file: IO[str],
+        skip_columns: Optional[Iterable[str]] = None,
+        chunk_size: int = 2 ** 20
+) -> Dict[str, Any]:
+    """
+    Stream a COCO json file, building the tables column by column.
+
+    The `images`, `annotations`, `categories` and `licenses` arrays are
+    parsed one record at a time and their values are appended to per-column
+    lists, so neither the whole json text nor the list of record dicts are
+    ever held in memory. The other keys (e.g. `info`) are decoded as usual.
+
+    Args:
+        file: a COCO json file, opened in text mode.
+        skip_columns: record keys that are discarded while parsing the tables
+            (e.g. `segmentation`, to save memory when masks are not needed).
+        chunk_size: number of characters read from the file at each read.
+
+    Returns:
+        A dict with the same keys of the json file, where the COCO tables are
+        DataFrames.
+    """
+    reader = _JsonStreamReader(file, chunk_size=chunk_size)
+    skip_columns = tuple(skip_columns) if skip_columns is not None else tuple()
+    data: Dict[str, Any] = dict()
+    for key, value_reader in reader.items():
+        if key in COCO_TABLES and value_reader.peek() == '[':
+            builder = _ColumnsBuilder(skip_columns)
+            for record in value_reader.array():
+                builder.add(record)
+            data[key] = builder.to_dataframe()
+        else:
+            data[key] = value_reader.value()
+    return data
+
+
+class JsonObjectWriter:
+
+    def __init__(
+            self,
+            file: IO[str],
+            indent: Optional[Union[int, str]] = None,
+            separators: Optional[Tuple[str, str]] = None,
+            spool_dir: Optional[Union[str, Path]] = None
+    ):
+        """
+        Incrementally write a json object to a text file.
+
+        Values can be written at once (`write`), or one element of an array
+        at a time (`write_array`), so that large arrays are never held in
+        memory. Elements of arrays that are produced interleaved (e.g. the
+        images and the annotations of a dataset) can be appended in any order
+        with `append`: they are spooled to temporary files, and written after
+        all the other keys when the writer is closed.
+
+        The output is the same of `json.dump` with the same `indent` and
+        `separators`, if the keys are written in the same order.
+
+        Args:
+            file: a text file opened in write mode.
+            indent: indentation, as in `json.dump`.
+            separators: item and key separators, as in `json.dump`.
+            spool_dir: directory of the temporary files used by `append`
+                (by default, the system temporary directory).
+        """
+        if separators is None:
+            separators = (', ', ': ') if indent is None else (',', ': ')
+        self._file = file
+        self._item_separator, self._key_separator = separators
+        self._encoder = json.JSONEncoder(indent=indent, separators=separators)
+        self._newline = '' if indent is None else '\n'
+        self._pad = indent if isinstance(indent, str) else ' ' * (indent or 0)
+        self._spool_dir = spool_dir
+        self._spools: Dict[str, Tuple[IO[str], int]] = dict()
+        self._n_keys = 0
+        self._closed = False
+        self._file.write('{')
+
+    def __enter__(self) -> "JsonObjectWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_spools()
+
+    def _encode(self, value: Any, depth: int) -> str:
+        """Encode a value nested at the given depth."""
+        text = self._encoder.encode(value)
+        if self._newline:
+            text = text.replace('\n', '\n' + self._pad * depth)
+        return text
+
+    def _element_prefix(self, index: int) -> str:
+        """Get the text preceding the element of an array of the object."""
+        return (self._item_separator if index > 0 else '') + self._newline + self._pad * 2
+
+    def _write_key(self, key: str) -> None:
+        """Write a key of the object, followed by the key separator."""
+        self._file.write((self._item_separator if self._n_keys > 0 else '') + self._newline + self._pad)
+        self._file.write(json.dumps(key) + self._key_separator)
+        self._n_keys += 1
+
+    def _write_array_end(self, n_elements: int) -> None:
+        """Close an array of the object."""
+        self._file.write((self._newline + self._pad if n_elements > 0 else '') + ']')
+
+    def write(self, key: str, value: Any) -> None:
+        """Write a key of the object with its value."""
+        self._write_key(key)
+        self._file.write(self._encode(value, 1))
+
+    def write_array(self, key: str, values: Iterable[Any]) -> None:
+        """Write a key of the object with an array, encoding one element at a time."""
+        self.write_array_chunks(key, ([value] for value in values))
+
+    def write_array_chunks(self, key: str, chunks: Iterable[list]) -> None:
+        """
+        Write a key of the object with an array, whose elements are given in
+        chunks (lists of elements).
+
+        Each chunk is encoded with a single call to the json encoder, which is
+        faster than encoding its elements one by one.
+        """
+        self._write_key(key)
+        self._file.write('[')
+        n_elements = 0
+        array_end = self._newline + self._pad + ']'
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            # the chunk is encoded as an array at depth 1: strip its brackets to get the elements.
+            text = self._encode(chunk, 1)
+            self._file.write((self._item_separator if n_elements > 0 else '') + text[1:-len(array_end)])
+            n_elements += len(chunk)
+        self._write_array_end(n_elements)
+
+    def declare_array(self, key: str) -> None:
+        """Declare an appended array, so that it is written when the writer is closed even if it stays empty."""
+        self._spools[key] = self._get_spool(key)
+
+    def append(self, key: str, value: Any) -> None:
+        """Append an element to an array of the object, written when the writer is closed."""
+        spool, n_elements = self._get_spool(key)
+        spool.write(self._element_prefix(n_elements) + self._encode(value, 2))
+        self._spools[key] = (spool, n_elements + 1)
+
+    def extend(self, key: str, values: list) -> None:
+        """Append a list of elements to an array of the object, encoding them with a single call to the encoder."""
+        spool, n_elements = self._get_spool(key)
+        if len(values) == 0:
+            self._spools[key] = (spool, n_elements)
+            return
+        # the list is encoded as an array at depth 1: strip its brackets to get the elements.
+        text = self._encode(values, 1)
+        spool.write((self._item_separator if n_elements > 0 else '') + text[1:-len(self._newline + self._pad + ']')])
+        self._spools[key] = (spool, n_elements + len(values))
+
+    def _get_spool(self, key: str) -> Tuple[IO[str], int]:
+        """Get the temporary file of an appended array, with its number of elements."""
+        spool, n_elements = self._spools.get(key, (None, 0))
+        if spool is None:
+            spool = tempfile.TemporaryFile('w+', encoding='utf-8', dir=self._spool_dir)
+        return spool, n_elements
+
+    def close(self) -> None:
+        """Write the appended arrays and terminate the object. The file is not closed."""
+        if self._closed:
+            return
+        for key, (spool, n_elements) in self._spools.items():
+            self._write_key(key)
+            self._file.write('[')
+            spool.seek(0)
+            shutil.copyfileobj(spool, self._file)
+            self._write_array_end(n_elements)
+        self._close_spools()
+        self._file.write((self._newline if self._n_keys > 0 else '') + '}')
+        self._closed = True
+
+    def _close_spools(self) -> None:
+        """Close and delete the temporary files."""
+        for spool, _ in self._spools.values():
+            spool.close()
+        self._spools.clear()
@@ -2,7 +2,7 @@
 Utilities* for converting segmentation annotations between different formats.
 """
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict, Union, Optional
+from typing import Any, List, Dict, Tuple, Union, Optional
 import numpy.typing as npt
 from pycocotools import mask as coco_mask
 from pathlib import Path
@@ -214,29 +214,106 @@ def get_segmentation_mode(
 
 def mask_to_rle(
         binary_mask: np.ndarray,
+        offset: Optional[Tuple[int, int]] = None,
+        size: Optional[Tuple[int, int]] = None,
         **kwargs
 ) -> Dict[str, list]:
     """
     Converts a binary mask to RLE encoding.
 
+    The mask can be a crop of a larger mask, that is zero outside the crop:
+    in this case, give the position of the crop with `offset` and the shape
+    of the larger mask with `size`. The larger mask is encoded without ever
+    being allocated.
+
     Args:
         binary_mask: a binary mask as a numpy array.
+        offset: the (row, column) position of `binary_mask` in the larger
+            mask, if it is a crop.
+        size: the (height, width) shape of the larger mask, if `binary_mask`
+            is a crop.
         **kwargs: extra parameters are ignored.
 
     Returns:
         The RLE encoding of the binary mask.
     """
-    counts = []
-    last_elem = 0
-    running_length = 0
-    for i, elem in enumerate(binary_mask.ravel(order='F')):
-        if not elem == last_elem:
-            counts.append(running_length)
-            running_length = 0
-            last_elem = elem
-        running_length += 1
-    counts.append(running_length)
-    return {'counts': counts, 'size': list(binary_mask.shape)}
+    if offset is not None and size is not None:
+        return {'counts': _crop_rle_counts(binary_mask, offset, size), 'size': list(size)}
+    return masks_to_rle(binary_mask[np.newaxis])[0]
+
+
+def _crop_rle_counts(
+        crop: np.ndarray,
+        offset: Tuple[int, int],
+        size: Tuple[int, int]
+) -> List[int]:
+    """Get the RLE counts of a 2D binary mask of shape `size`, which is zero outside `crop`."""
+    height, width = size
+    row, col = offset
+    # pad each column with zeros, so that every run of ones starts and ends inside its column:
+    padded = np.zeros((crop.shape[0] + 2, crop.shape[1]), dtype=np.int8)
+    padded[1:-1] = crop != 0
+    changes = np.diff(padded.ravel(order='F'))
+    padded_cols, padded_rows = np.divmod(np.flatnonzero(changes) + 1, padded.shape[0])
+    # positions in the larger mask, in column-major order:
+    positions = (col + padded_cols) * height + row + padded_rows - 1
+    starts, ends = positions[0::2], positions[1::2]
+    # runs ending on the last row and continuing on the first row of the next column are merged:
+    if len(starts) > 1:
+        continued = starts[1:] == ends[:-1]
+        starts = starts[np.concatenate([[True], ~continued])]
+        ends = ends[np.concatenate([~continued, [True]])]
+
+    edges = np.empty(2 * len(starts) + 2, dtype=np.int64)
+    edges[0], edges[-1] = 0, height * width
+    edges[1:-1:2], edges[2:-1:2] = starts, ends
+    counts = np.diff(edges).tolist()
+    # the counts end with the last run, without an empty run of zeros:
+    if len(counts) > 1 and counts[-1] == 0:
+        counts.pop()
+    return counts
+
+
+def masks_to_rle(
+        binary_masks: np.ndarray,
+        **kwargs
+) -> List[Dict[str, list]]:
+    """
+    Converts a stack of binary masks to RLE encodings.
+
+    The runs of all the masks are found at once with a vectorized comparison
+    of consecutive pixels (in column-major order), instead of iterating over
+    the pixels.
+
+    Args:
+        binary_masks: binary masks stacked along the first axis (e.g. an array
+            with shape `(n_masks, height, width)`).
+        **kwargs: extra parameters are ignored.
+
+    Returns:
+        The RLE encoding of each binary mask, as returned by `mask_to_rle`.
+    """
+    n_masks = binary_masks.shape[0]
+    size = list(binary_masks.shape[1:])
+    mask_size = int(np.prod(size))
+    if mask_size == 0:
+        return [{'counts': [0], 'size': list(size)} for _ in range(n_masks)]
+
+    # flatten each mask in column-major order, then concatenate them:
+    axes = (0,) + tuple(range(binary_masks.ndim - 1, 0, -1))
+    values = binary_masks.transpose(axes).ravel()
+
+    # the runs of each mask start at the beginning of the mask and where the value changes:
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    changes = changes[changes % mask_size != 0]
+    starts = np.arange(n_masks) * mask_size
+    # the first run counts the zeros: it is empty when the mask starts with another value.
+    empty_runs = starts[values[starts] != 0]
+    edges = np.sort(np.concatenate([starts, empty_runs, changes, [n_masks * mask_size]]))
+    counts = np.diff(edges).tolist()
+
+    mask_edges = np.append(np.searchsorted(edges, starts), len(counts)).tolist()
+    return [{'counts': counts[mask_edges[i]:mask_edges[i + 1]], 'size': list(size)} for i in range(n_masks)]
 
 
 def rle_to_mask(
@@ -263,6 +340,8 @@ def rle_to_mask(
 
 def mask_to_compressed_rle(
         mask: np.ndarray,
+        offset: Optional[Tuple[int, int]] = None,
+        size: Optional[Tuple[int, int]] = None,
         **kwargs
 ) -> str:
     """
@@ -270,18 +349,26 @@ def mask_to_compressed_rle(
 
     Args:
         mask: a binary mask to encode.
+        offset: the (row, column) position of `mask` in a larger mask, if it
+            is a crop (see `mask_to_rle`).
+        size: the (height, width) shape of the larger mask, if `mask` is a
+            crop.
         **kwargs: extra parameters are ignored.
     Returns:
         A string encoding the mask as compressed RLE.
     """
+    if offset is not None and size is not None:
+        # RLE encode the larger mask, without allocating it --
+        rle = mask_to_rle(mask, offset=offset, size=size)
+        encoded_mask = coco_mask.frPyObjects(rle, size[0], size[1])["counts"]
+    else:
+        # convert input mask to expected COCO API input --
+        mask_to_encode = mask.reshape((mask.shape[0], mask.shape[1], 1))
+        mask_to_encode = mask_to_encode.astype(np.uint8)
+        mask_to_encode = np.asfortranarray(mask_to_encode)
 
-    # convert input mask to expected COCO API input --
-    mask_to_encode = mask.reshape((mask.shape[0], mask.shape[1], 1))
-    mask_to_encode = mask_to_encode.astype(np.uint8)
-    mask_to_encode = np.asfortranarray(mask_to_encode)
-
-    # RLE encode mask --
-    encoded_mask = coco_mask.encode(mask_to_encode)[0]["counts"]
+        # RLE encode mask --
+        encoded_mask = coco_mask.encode(mask_to_encode)[0]["counts"]
 
     # compress and base64 encoding --
     binary_str = zlib.compress(encoded_mask, zlib.Z_BEST_COMPRESSION)
@@ -323,6 +410,7 @@ def compressed_rle_to_mask(
 def mask_to_polygon(
         mask: np.ndarray,
         simplify_tolerance: float = 1.0,
+        offset: Optional[Tuple[int, int]] = None,
         **kwargs
 ) -> List:
     """
@@ -339,6 +427,9 @@ def mask_to_polygon(
             10, class C to 255, and so on.
         simplify_tolerance: a tolerance value used to remove redundant
             vertexes for the polygons extracted from the mask.
+        offset: the (row, column) position of `mask` in a larger mask, if it
+            is a crop: the polygons are translated to the coordinates of the
+            larger mask.
         **kwargs: extra parameters are ignored.
 
     Returns:
@@ -361,6 +452,8 @@ def mask_to_polygon(
 
         # simplify contours
         contours = [cnt.reshape((-1, 2)) for cnt in contours]
+        if offset is not None:
+            contours = [cnt + (offset[1], offset[0]) for cnt in contours]
 
         for cnt in contours:
             sqz_cnt = cnt
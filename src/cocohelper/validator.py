@@ -1,8 +1,11 @@
 """
 Check COCO dataset validity based on data ids and directory tree.
 """
-from typing import Dict, List, Optional, Type, Union, Sequence, Any, Tuple
+from typing import Callable, Dict, List, Optional, Type, Union, Sequence, Any, Tuple
 from functools import partial
+from pandas import DataFrame
+import pandas as pd
+import numpy as np
 import logging
 import os
 from pathlib import Path
@@ -403,6 +406,145 @@ class COCOValidator:
         return False
 
 
+class COCODataFrameValidator(COCOValidator):
+
+    def __init__(
+            self,
+            imgs: Optional[DataFrame],
+            anns: Optional[DataFrame],
+            cats: Optional[DataFrame],
+            licenses: Optional[DataFrame],
+            dataset_dir: Union[str, Path]
+    ):
+        """
+        Validate COCO datasets working directly on the DataFrames of a
+        `COCOHelper`, without converting them back to json records.
+
+        The checks are the same of `COCOValidator.validate_dataset`, but they
+        are run with vectorized operations (`isin`, `duplicated`, ...) and never
+        raise on the first invalid row: the ids of the offending rows of each
+        check are collected in `offending_ids`.
+
+        The tables are expected to be indexed by their ids (e.g. `image_id`),
+        as the tables of a `COCOHelper`.
+
+        Args:
+            imgs: DataFrame of images.
+            anns: DataFrame of annotations.
+            cats: DataFrame of categories.
+            licenses: DataFrame of licenses, optional.
+            dataset_dir: root directory of the dataset.
+        """
+        super().__init__(json_data=dict(), dataset_dir=dataset_dir)
+        self.imgs = imgs
+        self.anns = anns
+        self.cats = cats
+        self.licenses = licenses
+        self.offending_ids: Dict[str, np.ndarray] = dict()
+
+    def validate_dataset(self) -> Tuple[bool, dict]:
+        """
+        Check if this is a valid COCO dataset.
+
+        The ids of the rows failing each check are stored in `offending_ids`
+        (e.g. the ids of the annotations with an invalid image id under the
+        key `annotations_have_valid_image_id`).
+
+        Returns:
+            True if this is a valida dataset, and a dict with the result of
+            each check.
+        """
+        fail_message = " | Test failed: this is not a valid COCO dataset:"
+        checks: List[Tuple[str, Callable[[], Union[bool, np.ndarray]], str]] = [
+            ("has_valid_dataset_tree", lambda: self._has_valid_dataset_tree(self.dataset_dir),
+             "Folders are not organised as expected by a COCO dataset."),
+            ("json_has_mandatory_keys", self._tables_exist,
+             "There are missing mandatory keys in the json file."),
+            ("categories_have_mandatory_keys", self._invalid_categories,
+             "There are missing mandatory keys in the COCO categories."),
+            ("images_have_mandatory_keys", self._invalid_images,
+             "There are missing mandatory keys in the COCO images."),
+            ("annotations_have_mandatory_keys", self._invalid_annotations,
+             "There are missing mandatory keys in the COCO annotations."),
+            ("category_ids_are_unique", lambda: _duplicated_ids(self.cats),
+             "There are duplicated category ids."),
+            ("licenses_ids_are_unique", lambda: _duplicated_ids(self.licenses),
+             "There are duplicated licenses ids."),
+            ("image_ids_are_unique", lambda: _duplicated_ids(self.imgs),
+             "There are duplicated image ids."),
+            ("annotation_ids_are_unique", lambda: _duplicated_ids(self.anns),
+             "There are duplicated annotation ids."),
+            ("annotations_have_valid_image_id", lambda: self._invalid_foreign_keys('image_id', self.imgs),
+             "There are annotations with invalid image id."),
+            ("annotations_have_valid_category_id", lambda: self._invalid_foreign_keys('category_id', self.cats),
+             "There are annotations with invalid category id."),
+        ]
+
+        logging.info("\n")
+        logging.info("Checking COCO dataset validity...")
+        error_dict = dict()
+        self.offending_ids = dict()
+        for key, check, message in checks:
+            result = check()
+            if isinstance(result, np.ndarray):
+                self.offending_ids[key] = result
+                result = len(result) == 0
+            error_dict[key] = result
+            if not result:
+                logging.error(f"{fail_message} {message}")
+
+        is_valid = all(error_dict.values())
+        if is_valid:
+            logging.info(" | Test passed.")
+        return is_valid, error_dict
+
+    def _tables_exist(self) -> bool:
+        """Check if the mandatory tables (images, annotations and categories) exist."""
+        return self.imgs is not None and self.anns is not None and self.cats is not None
+
+    def _invalid_categories(self) -> np.ndarray:
+        """Get the ids of the categories with missing mandatory keys or values of unexpected types."""
+        if self.cats is None:
+            return np.empty(0)
+        if 'supercategory' not in self.cats.columns:
+            logging.warning(" -- Warning for category data: missing recommended key supercategory.")
+        return _invalid_rows(self.cats, {'name': (str,), 'supercategory': (str,)}, optional=('supercategory',))
+
+    def _invalid_images(self) -> np.ndarray:
+        """Get the ids of the images with missing mandatory keys or values of unexpected types."""
+        if self.imgs is None:
+            return np.empty(0)
+        return _invalid_rows(self.imgs, {'width': (int,), 'height': (int,), 'file_name': (str,)})
+
+    def _invalid_annotations(self) -> np.ndarray:
+        """Get the ids of the annotations with missing mandatory keys or values of unexpected types."""
+        if self.anns is None:
+            return np.empty(0)
+        invalid = _invalid_rows(self.anns, {
+            'image_id': (int,),
+            'category_id': (int,),
+            'segmentation': (object,),
+            'area': (float, int),
+            'bbox': (list,),
+            'iscrowd': (int,),
+        })
+        if 'iscrowd' in self.anns.columns:
+            not_binary = self.anns.index[~self.anns['iscrowd'].isin([0, 1])].to_numpy()
+            invalid = np.union1d(invalid, not_binary)
+        return invalid
+
+    def _invalid_foreign_keys(
+            self,
+            fk_column: str,
+            table: Optional[DataFrame]
+    ) -> np.ndarray:
+        """Get the ids of the annotations whose foreign key `fk_column` does not exist in `table`."""
+        if self.anns is None or fk_column not in self.anns.columns:
+            return np.empty(0)
+        valid_ids = table.index if table is not None else pd.Index([])
+        return self.anns.index[~self.anns[fk_column].isin(valid_ids)].to_numpy()
+
+
 def _assert_dict_value_type(
         dictionary: Dict,
         key: Any,
@@ -431,3 +573,68 @@ def _assert_dict_value_type(
             break
     if not type_ok:
         raise TypeError(f"{msg_header} -- Type of '{key}' must be in {expected_types}.")
+
+
+def _duplicated_ids(table: Optional[DataFrame]) -> np.ndarray:
+    """Get the ids appearing more than once in the index of a table."""
+    if table is None:
+        return np.empty(0)
+    return np.unique(table.index[table.index.duplicated()].to_numpy())
+
+
+def _invalid_values_mask(
+        column: pd.Series,
+        expected_types: Tuple[Type, ...]
+) -> np.ndarray:
+    """
+    Get a mask of the values of a column that are missing or not of one of the expected types.
+
+    Columns with a numeric dtype are checked as a whole, while object columns
+    are checked value by value.
+    """
+    missing = column.isna().to_numpy()
+    kind = column.dtype.kind
+    if expected_types == (object,):
+        wrong_type = np.zeros(len(column), dtype=bool)
+    elif kind in 'iub':
+        wrong_type = np.full(len(column), not ({int, float} & set(expected_types)))
+    elif kind == 'f':
+        values = column.to_numpy()
+        if float in expected_types:
+            wrong_type = np.zeros(len(column), dtype=bool)
+        elif int in expected_types:
+            # ints are loaded as floats when some of them are missing:
+            wrong_type = ~missing & (np.nan_to_num(values) % 1 != 0)
+        else:
+            wrong_type = np.ones(len(column), dtype=bool)
+    else:
+        types = tuple(expected_types) + ((np.integer,) if int in expected_types else tuple())
+        types = types + ((np.floating,) if float in expected_types else tuple())
+        wrong_type = np.fromiter((not isinstance(v, types) for v in column), dtype=bool, count=len(column))
+    return missing | wrong_type
+
+
+def _invalid_rows(
+        table: DataFrame,
+        expected_types: Dict[str, Tuple[Type, ...]],
+        optional: Sequence[str] = tuple()
+) -> np.ndarray:
+    """
+    Get the ids of the rows of a table with missing values or values of unexpected types.
+
+    Args:
+        table: the table, indexed by id.
+        expected_types: the mandatory columns, with the expected types of their values.
+        optional: the columns that are checked only if they exist.
+
+    Returns:
+        The ids of the invalid rows (all the ids if the table has no index of
+        ids or a mandatory column is missing).
+    """
+    if table.index.name is None or any(col not in table.columns and col not in optional for col in expected_types):
+        return table.index.to_numpy()
+    invalid = np.zeros(len(table), dtype=bool)
+    for col, types in expected_types.items():
+        if col in table.columns:
+            invalid |= _invalid_values_mask(table[col], types)
+    return table.index[invalid].to_numpy()
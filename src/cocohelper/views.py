@@ -0,0 +1,332 @@
+"""
+Dataset views over a COCO dataset, to feed training loops (e.g. a PyTorch `DataLoader`).
+
+The views precompute the per-image data of the dataset in a few flat NumPy
+buffers (no Python object per image or per annotation), so that they can be
+shared by many worker processes: with the `fork` start method the workers
+share the buffer pages with the parent process, since reading them never
+touches any reference count.
+"""
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from pathlib import Path
+from PIL import Image
+from pycocotools import mask as coco_mask
+import pandas as pd
+import numpy as np
+
+try:
+    from torch.utils.data import Dataset as _MapDataset, IterableDataset as _IterableDataset, get_worker_info
+except ImportError:  # PyTorch is optional: the views are plain Python classes without it.
+    _MapDataset = _IterableDataset = object
+    get_worker_info = None
+
+
+if TYPE_CHECKING:
+    from cocohelper import COCOHelper
+
+
+Sample = Dict[str, Any]
+
+
+class COCODatasetView(_MapDataset):
+
+    def __init__(
+            self,
+            coco_helper: "COCOHelper",
+            img_ids: Optional[Sequence[int]] = None,
+            load_images: bool = True,
+            segmentation: bool = False,
+            transform: Optional[Callable[[Sample], Any]] = None
+    ):
+        """
+        Map-style view of a COCO dataset, with one sample per image.
+
+        The i-th sample is a dictionary with the fields of the image
+        (`image_id`, `file_name`, `height`, `width`), the image itself as a
+        (H, W, C) array (`image`, only if `load_images` is True) and the
+        arrays of its annotations:
+          - `ann_ids` (K,) int64;
+          - `boxes` (K, 4) float64, in [x, y, width, height] format;
+          - `category_ids` (K,) int64;
+          - `areas` (K,) float64, NaN where the area is missing;
+          - `iscrowd` (K,) uint8;
+          - `segmentations`: a list of K segmentations, each one a list of
+            polygons (float64 arrays of x, y coordinates) or a compressed RLE
+            dictionary (only if `segmentation` is True).
+
+        The annotations of each image are stored contiguously in flat
+        buffers, with the offsets of each image: the view keeps no reference
+        to the helper, so the helper can be released before starting the
+        workers. The arrays of a sample are copies, so they can be modified
+        in place without touching the shared buffers.
+
+        Args:
+            coco_helper: the COCOHelper object representing a COCO dataset.
+            img_ids: the ids of the images in the view, in order. If None,
+                all the images of the dataset, in table order.
+            load_images: whether to load the image files in the samples.
+            segmentation: whether to include the segmentations in the samples.
+            transform: an optional function applied to each sample.
+
+        Raises:
+            ValueError if the image ids are not unique or do not exist.
+        """
+        imgs, anns = coco_helper.imgs, coco_helper.anns
+        img_index = pd.Index(imgs.index)
+        if img_ids is None:
+            img_pos = np.arange(len(imgs))
+        else:
+            img_pos = img_index.get_indexer(pd.Index(img_ids)) if img_index.is_unique else np.array([-1])
+            if (img_pos < 0).any():
+                raise ValueError("The image ids of a dataset view must exist in the images table.")
+        if len(pd.unique(img_pos)) < len(img_pos):
+            raise ValueError("The image ids of a dataset view must be unique.")
+
+        self._img_dir = str(Path(coco_helper.root_path) / coco_helper.paths.img_dir)
+        self.load_images = load_images
+        self.transform = transform
+
+        self._img_ids = imgs.index.to_numpy()[img_pos].astype(np.int64)
+        self._heights = _int_column(imgs, 'height')[img_pos]
+        self._widths = _int_column(imgs, 'width')[img_pos]
+        file_names = imgs['file_name'].to_numpy()[img_pos] if 'file_name' in imgs.columns else []
+        self._names, self._name_offsets = _pack_bytes([str(name).encode() for name in file_names], len(img_pos))
+
+        # annotations of the view, grouped by image in view order:
+        ann_img_pos = pd.Index(self._img_ids).get_indexer(anns['image_id']) if 'image_id' in anns.columns \
+            else np.empty(0, dtype=np.int64)
+        ann_rows = np.flatnonzero(ann_img_pos >= 0)
+        ann_rows = ann_rows[np.argsort(ann_img_pos[ann_rows], kind='stable')]
+        self._ann_offsets = np.zeros(len(img_pos) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ann_img_pos[ann_rows], minlength=len(img_pos)), out=self._ann_offsets[1:])
+
+        anns = anns.iloc[ann_rows]
+        self._ann_ids = anns.index.to_numpy().astype(np.int64)
+        self._boxes = np.array(anns['bbox'].tolist(), dtype=np.float64).reshape(-1, 4) if 'bbox' in anns.columns \
+            else np.full((len(anns), 4), np.nan)
+        self._category_ids = _int_column(anns, 'category_id')
+        self._areas = anns['area'].to_numpy(dtype=np.float64, na_value=np.nan) if 'area' in anns.columns \
+            else np.full(len(anns), np.nan)
+        self._iscrowd = _int_column(anns, 'iscrowd').astype(np.uint8)
+
+        self._segmentation = segmentation and 'segmentation' in anns.columns
+        if self._segmentation:
+            heights = self._heights[np.repeat(np.arange(len(img_pos)), np.diff(self._ann_offsets))]
+            widths = self._widths[np.repeat(np.arange(len(img_pos)), np.diff(self._ann_offsets))]
+            self._pack_segmentations(anns['segmentation'].tolist(), heights, widths)
+
+    def _pack_segmentations(
+            self,
+            segmentations: List,
+            heights: np.ndarray,
+            widths: np.ndarray
+    ):
+        """
+        Store the segmentations of the annotations in flat buffers.
+
+        The polygons are stored as a flat array of coordinates with the
+        offsets of each polygon and the offsets of the polygons of each
+        annotation. The RLE segmentations are compressed and stored as a flat
+        byte buffer, with their offsets and sizes.
+
+        Args:
+            segmentations: the segmentations of the annotations, in view order.
+            heights: the height of the image of each annotation.
+            widths: the width of the image of each annotation.
+        """
+        polygons, n_polygons, rles = [], [], []
+        self._rle_sizes = np.zeros((len(segmentations), 2), dtype=np.int64)
+        for i, segm in enumerate(segmentations):
+            if isinstance(segm, dict):
+                if isinstance(segm['counts'], list):
+                    segm = coco_mask.frPyObjects(segm, int(heights[i]), int(widths[i]))
+                counts = segm['counts']
+                rles.append(counts.encode() if isinstance(counts, str) else counts)
+                self._rle_sizes[i] = segm['size']
+                n_polygons.append(0)
+            else:
+                segm = segm if isinstance(segm, list) else []
+                polygons.extend(segm)
+                rles.append(b'')
+                n_polygons.append(len(segm))
+
+        self._poly_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+        np.cumsum([len(poly) for poly in polygons], out=self._poly_offsets[1:])
+        self._poly_coords = np.fromiter((c for poly in polygons for c in poly), dtype=np.float64,
+                                        count=int(self._poly_offsets[-1]))
+        self._ann_poly_offsets = np.zeros(len(segmentations) + 1, dtype=np.int64)
+        np.cumsum(n_polygons, out=self._ann_poly_offsets[1:])
+        self._rles, self._rle_offsets = _pack_bytes(rles, len(segmentations))
+
+    def __len__(self) -> int:
+        return len(self._img_ids)
+
+    def __getitem__(self, idx: int) -> Any:
+        """
+        Get the sample of the idx-th image of the view.
+
+        Args:
+            idx: the position of the image in the view.
+
+        Returns:
+            The sample of the image, after the transform (if any).
+
+        Raises:
+            IndexError if the position is out of range.
+        """
+        n = len(self._img_ids)
+        if not -n <= idx < n:
+            raise IndexError(f"Index {idx} out of range for a dataset view of {n} images.")
+        idx = int(idx) % n
+
+        start, end = self._ann_offsets[idx], self._ann_offsets[idx + 1]
+        sample = {
+            'image_id': int(self._img_ids[idx]),
+            'file_name': self._file_name(idx),
+            'height': int(self._heights[idx]),
+            'width': int(self._widths[idx]),
+            'ann_ids': self._ann_ids[start:end].copy(),
+            'boxes': self._boxes[start:end].copy(),
+            'category_ids': self._category_ids[start:end].copy(),
+            'areas': self._areas[start:end].copy(),
+            'iscrowd': self._iscrowd[start:end].copy(),
+        }
+        if self._segmentation:
+            sample['segmentations'] = [self._segmentation_of(pos) for pos in range(start, end)]
+        if self.load_images:
+            sample['image'] = self._load_image(idx)
+        return self.transform(sample) if self.transform is not None else sample
+
+    def __iter__(self) -> Iterator[Any]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def img_ids(self) -> np.ndarray:
+        """The ids of the images in the view, in order."""
+        return self._img_ids
+
+    def img_path(self, idx: int) -> Path:
+        """
+        Get the path to the file of the idx-th image of the view.
+
+        Args:
+            idx: the position of the image in the view.
+
+        Returns:
+            The path of the image file.
+        """
+        return Path(self._img_dir) / self._file_name(idx)
+
+    def _file_name(self, idx: int) -> str:
+        return self._names[self._name_offsets[idx]:self._name_offsets[idx + 1]].tobytes().decode()
+
+    def _load_image(self, idx: int) -> np.ndarray:
+        with Image.open(self.img_path(idx)) as img:
+            image_array: np.ndarray = np.array(img)
+        return image_array
+
+    def _segmentation_of(self, pos: int) -> Union[List[np.ndarray], Dict[str, Any]]:
+        """Rebuild the segmentation of the annotation at position `pos` of the flat buffers."""
+        rle_start, rle_end = self._rle_offsets[pos], self._rle_offsets[pos + 1]
+        if rle_end > rle_start:
+            return {'size': self._rle_sizes[pos].tolist(), 'counts': self._rles[rle_start:rle_end].tobytes()}
+        poly_start, poly_end = self._ann_poly_offsets[pos], self._ann_poly_offsets[pos + 1]
+        return [self._poly_coords[self._poly_offsets[p]:self._poly_offsets[p + 1]].copy()
+                for p in range(poly_start, poly_end)]
+
+
+class COCOIterableView(_IterableDataset):
+
+    def __init__(
+            self,
+            view: COCODatasetView,
+            shuffle: bool = False,
+            seed: Optional[int] = None
+    ):
+        """
+        Iterable view of a COCO dataset, yielding the samples of a map-style
+        view.
+
+        When iterated inside the workers of a PyTorch `DataLoader`, each
+        worker yields a disjoint, interleaved share of the images, so every
+        sample is yielded exactly once per epoch.
+
+        Args:
+            view: the map-style view with the samples.
+            shuffle: whether to yield the images in random order. All the
+                workers draw the same permutation, so their shares stay
+                disjoint.
+            seed: the seed of the random permutation. The permutation also
+                depends on the epoch set with `set_epoch`. If None, a random
+                seed is drawn once here, in the parent process, and shared by
+                all the workers.
+        """
+        self.view = view
+        self.shuffle = shuffle
+        # the workers must draw the same permutation, so they can't seed from their own OS entropy:
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def set_epoch(self, epoch: int):
+        """
+        Set the epoch of the next iterations, to draw a new permutation of the
+        images at every epoch when shuffling.
+
+        The workers of a `DataLoader` iterate over copies of the view, so the
+        epoch must be set on the view before each epoch starts.
+
+        Args:
+            epoch: the epoch number.
+        """
+        self._epoch = epoch
+
+    def __iter__(self) -> Iterator[Any]:
+        order = np.arange(len(self.view))
+        if self.shuffle:
+            order = np.random.default_rng((self.seed, self._epoch)).permutation(order)
+
+        worker_id, num_workers = _worker_shard()
+        for idx in order[worker_id::num_workers]:
+            yield self.view[int(idx)]
+
+
+def _worker_shard() -> Tuple[int, int]:
+    """Get the id of the current `DataLoader` worker and the number of workers, (0, 1) outside of workers."""
+    info = get_worker_info() if get_worker_info is not None else None
+    if info is None:
+        return 0, 1
+    return info.id, info.num_workers
+
+
+def _int_column(
+        df: pd.DataFrame,
+        column: str
+) -> np.ndarray:
+    """Get a column as an int64 array, with 0 for missing values (or a missing column)."""
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    return df[column].fillna(0).to_numpy().astype(np.int64)
+
+
+def _pack_bytes(
+        values: List[bytes],
+        n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate byte strings in a flat uint8 buffer.
+
+    Args:
+        values: the byte strings. If empty, `n` empty strings are packed.
+        n: the number of byte strings.
+
+    Returns:
+        A tuple with the buffer and the n+1 offsets of the strings in it.
+    """
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    if len(values) > 0:
+        np.cumsum([len(value) for value in values], out=offsets[1:])
+    return np.frombuffer(b''.join(values), dtype=np.uint8), offsets
@@ -2,9 +2,10 @@
 Visualize COCO images and annotations.
 """
 from cocohelper import COCOHelper
+from cocohelper.utils.image import ImageCache
 import numpy as np
 import cv2
-from typing import Sequence, List, Optional
+from typing import Sequence, List, Optional, Union
 import matplotlib.pyplot as plt
 
 from cocohelper.utils.segmentation import convert_to_mode
@@ -14,31 +15,39 @@ class COCOVisualizer:
 
     def __init__(
             self,
-            helper: COCOHelper
+            helper: COCOHelper,
+            img_cache: Union[ImageCache, int, None] = None
     ):
         """
         This class contains methods to visualize COCO images and annotations.
 
         Args:
             helper: Coco dataset to visualize.
+            img_cache: An optional cache of the decoded images (an ImageCache
+                or its memory budget in bytes), to avoid reloading the images
+                visualized many times. If None, the images are loaded through
+                the cache of the helper, if any.
         """
-        self.helper = helper
+        self.helper = helper.with_img_cache(img_cache) if img_cache is not None else helper
 
     def load_image_array(
             self,
-            img_id: int
+            img_id: int,
+            max_size: Optional[int] = None
     ) -> np.ndarray:
         """
         Load image with a given image id and returns it as numpy array.
 
         Args:
             img_id: image id.
+            max_size: if not None, the image is downsampled so that its
+                longest side is at most `max_size` pixels.
 
         Returns:
             A numpy array with the image associated with the image id in the
             COCO dataset.
         """
-        return self.helper.get_img(img_id)
+        return self.helper.get_img(img_id, max_size=max_size)
 
     def visualize(
             self,
@@ -1,3 +1,8 @@
+import contextlib
+import io
+
+from pycocotools.cocoeval import COCOeval
+
 from cocohelper import COCOHelper, filters
 from cocohelper.filters import AND
 from cocohelper.filters.cocofilters import cocofilters
@@ -213,3 +218,47 @@ def do_anns_filter_test(ann_ids=None, img_ids=None, cat_ids=None, cat_nms=None,
     pycoco_anns = coco.loadAnns(annIds)
 
     assert df_to_records(helper.anns, ch._colmaps.ann) == pycoco_anns
+
+
+def test_to_coco_index():
+    from pycocotools.coco import COCO
+
+    reference = COCO()
+    reference.dataset = ch.to_json_dataset()
+    reference.createIndex()
+    coco_built = ch.to_coco(cached=False)
+
+    assert coco_built.dataset == reference.dataset
+    assert coco_built.anns == reference.anns
+    assert coco_built.imgs == reference.imgs
+    assert coco_built.cats == reference.cats
+    assert dict(coco_built.imgToAnns) == dict(reference.imgToAnns)
+    assert dict(coco_built.catToImgs) == dict(reference.catToImgs)
+
+
+def test_to_coco_cached():
+    coco_cached = ch.to_coco()
+    assert coco_cached.dataset == coco.dataset
+    # the records are reused, but every call gets its own annotation dicts:
+    img_id, ann_id = next(iter(coco.imgs)), next(iter(coco.anns))
+    assert coco_cached.imgs[img_id] is coco.imgs[img_id]
+    assert coco_cached.anns[ann_id] is not coco.anns[ann_id]
+    assert coco_cached.imgToAnns[coco.anns[ann_id]['image_id']][0] is coco_cached.anns[ann_id]
+    assert ch.to_coco(cached=False).imgs[img_id] is not coco.imgs[img_id]
+
+    # a new helper gets its own COCO object:
+    assert ch.copy().to_coco() is not coco
+
+
+def test_to_coco_cached_after_eval():
+    dataset = ch.to_json_dataset()
+    coco_rle = ch.to_coco(cached=False)
+    predictions = [{'image_id': ann['image_id'], 'category_id': ann['category_id'],
+                    'segmentation': coco_rle.annToRLE(ann), 'score': 1.} for ann in dataset['annotations']]
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco_gt = ch.to_coco()
+        coco_eval = COCOeval(coco_gt, coco_gt.loadRes(predictions), 'segm')
+        coco_eval.evaluate()
+
+    assert ch.to_coco().dataset == dataset
+    assert list(ch.to_coco().anns.values()) == dataset['annotations']
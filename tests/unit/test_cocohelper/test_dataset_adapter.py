@@ -1,12 +1,13 @@
 from pathlib import Path
 import cv2
+import numpy as np
 from sklearn.metrics import jaccard_score
 
 from cocohelper import COCOHelper
-from cocohelper.adapters import BinaryMaskDatasetAdapter
+from cocohelper.adapters import BinaryMaskDatasetAdapter, DatasetAdapter
 
 from cocohelper.importer import Importer
-from cocohelper.utils.segmentation import coco_to_binary_masks
+from cocohelper.utils.segmentation import coco_to_binary_masks, polygon_to_mask
 from shutil import rmtree
 
 import pytest
@@ -75,3 +76,93 @@ def test_binary_reader(ch, clean_saved_coco):
 
         jac = jaccard_score(out_mask_array.ravel(), mask_array.ravel(), average='micro')
         assert jac > 0.95
+
+
+def test_get_individual_instances():
+    mask = np.zeros((40, 30), dtype=np.uint8)
+    mask[2:10, 3:8] = 1
+    mask[20:25, 0:30] = 1
+    mask[30:40, 25:30] = 2
+    mask[31:35, 10:12] = 2
+    categories = {1: {"id": 0, "name": "a"}, 2: {"id": 1, "name": "b"}}
+    adapter = BinaryMaskDatasetAdapter(data_paths={}, image_loader=cv2.imread, mask_loader=cv2.imread,
+                                       categories=categories)
+
+    polygons, bboxes, cats = adapter.get_individual_instances(mask, mode='polygon', compression_factor=1.0)
+
+    assert cats == [0, 0, 1, 1]
+    assert bboxes == [[3, 2, 4, 7], [0, 20, 29, 4], [25, 30, 4, 9], [10, 31, 1, 3]]
+    for polygon, bbox in zip(polygons, bboxes):
+        instance = polygon_to_mask([polygon], width=30, height=40)
+        ys, xs = np.nonzero(instance)
+        assert [xs.min(), ys.min(), xs.max() - xs.min(), ys.max() - ys.min()] == bbox
+
+
+def test_parallel_import(tmp_path):
+    mask_dir = tmp_path / 'masks'
+    mask_dir.mkdir()
+    data_paths = {}
+    for i in range(6):
+        mask = np.zeros((32, 48), dtype=np.uint8)
+        mask[2:10, i:i + 8] = 1
+        mask[20:30, 30:40] = 2 if i % 2 else 0
+        mask_path = str(mask_dir / f'{i}.png')
+        cv2.imwrite(mask_path, mask)
+        data_paths[mask_path] = [mask_path]
+    categories = {1: {"id": 0, "name": "a"}, 2: {"id": 1, "name": "b"}}
+
+    def create(num_workers, stream=False):
+        adapter = BinaryMaskDatasetAdapter(data_paths=data_paths,
+                                           image_loader=lambda pth: cv2.imread(pth),
+                                           mask_loader=lambda pth: cv2.imread(pth)[..., 0],
+                                           categories=categories)
+        return Importer(adapter=adapter).create(out_coco_dir=tmp_path / f'out{num_workers}{stream}',
+                                                save_images=True, num_workers=num_workers, stream=stream)
+
+    ch_serial = create(num_workers=0)
+    ch_parallel = create(num_workers=2)
+    assert ch_parallel.imgs.equals(ch_serial.imgs)
+    assert ch_parallel.anns.equals(ch_serial.anns)
+    assert len(list((tmp_path / 'out2False' / 'images').glob('*.png'))) == 6
+
+    for num_workers in [0, 2]:
+        ch_streamed = create(num_workers=num_workers, stream=True)
+        assert (tmp_path / f'out{num_workers}True' / 'annotations' / 'coco.json').is_file()
+        assert ch_streamed.imgs.equals(ch_serial.imgs)
+        assert ch_streamed.anns.equals(ch_serial.anns)
+        assert ch_streamed.cats.equals(ch_serial.cats)
+
+
+class _UnannotatedAdapter(DatasetAdapter):
+
+    def __init__(self, n_images):
+        self.n_images = n_images
+
+    def get_categories(self):
+        return [{"id": 0, "name": "a"}]
+
+    def get_sample(self, idx):
+        if idx >= self.n_images:
+            return None
+        return {"id": idx, "file_name": f"{idx}.png", "height": 4, "width": 4}, []
+
+    def read_image(self, idx):
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize('n_images', [0, 2])
+def test_stream_import_without_annotations(tmp_path, n_images):
+    ch = Importer(adapter=_UnannotatedAdapter(n_images)).create(out_coco_dir=tmp_path / 'out')
+    ch_streamed = Importer(adapter=_UnannotatedAdapter(n_images)).create(out_coco_dir=tmp_path / 'out_stream',
+                                                                         stream=True)
+
+    assert len(ch_streamed.imgs) == len(ch.imgs) == n_images
+    assert len(ch_streamed.anns) == len(ch.anns) == 0
+    assert ch_streamed.imgs.index.tolist() == ch.imgs.index.tolist()
+    assert ch_streamed.paths == ch.paths
+    assert ch_streamed.root_path == tmp_path / 'out_stream'
+
+
+def test_stream_import_without_out_dir():
+    with pytest.raises(ValueError):
+        Importer(adapter=_UnannotatedAdapter(2)).create(out_coco_dir=None, stream=True)
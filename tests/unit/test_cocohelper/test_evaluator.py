@@ -0,0 +1,83 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+import pytest
+from pycocotools import mask as coco_mask
+from pycocotools.cocoeval import COCOeval
+
+from cocohelper import COCOHelper
+from cocohelper.evaluator import COCOEvaluator
+
+
+def load_gt(path: str) -> COCOHelper:
+    ch = COCOHelper.load_json(path)
+    # pycocotools takes the matches of the annotation with id 0 as misses: shift the ids to compare the results.
+    anns = ch.anns.copy()
+    anns.index = anns.index + 1
+    anns['iscrowd'] = (np.arange(len(anns)) % 7 == 3).astype(int)
+    return ch.copy(ann_df=anns)
+
+
+def make_predictions(ch: COCOHelper, iou_type: str, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    cat_ids = ch.cats.index.tolist()
+    predictions = []
+    for img_id, cat_id, bbox, segm in zip(ch.anns['image_id'], ch.anns['category_id'], ch.anns['bbox'],
+                                          ch.anns['segmentation']):
+        height, width = ch.imgs.loc[img_id, ['height', 'width']].astype(int)
+        for _ in range(rng.integers(0, 4)):
+            shift = rng.normal(0, 0.1, 2) * bbox[2:]
+            prediction = {
+                'image_id': int(img_id),
+                'category_id': int(cat_id if rng.random() < 0.8 else rng.choice(cat_ids)),
+                # rounded scores, to have ties:
+                'score': float(np.round(rng.random(), 1)),
+            }
+            if iou_type == 'bbox':
+                prediction['bbox'] = [bbox[0] + shift[0], bbox[1] + shift[1], bbox[2], bbox[3]]
+            else:
+                polygons = [(np.array(poly) + np.tile(shift, len(poly) // 2)).tolist() for poly in segm]
+                prediction['segmentation'] = coco_mask.merge(coco_mask.frPyObjects(polygons, height, width))
+            predictions.append(prediction)
+    return predictions
+
+
+@pytest.mark.parametrize('path', ['tests/data/coco_dataset/annotations/coco.json',
+                                  'tests/data/coco_merge2/annotations/coco.json'])
+@pytest.mark.parametrize('iou_type', ['bbox', 'segm'])
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_evaluate_as_pycocotools(path, iou_type, num_workers):
+    ch = load_gt(path)
+    predictions = make_predictions(ch, iou_type)
+
+    evaluation = COCOEvaluator(ch, iou_type=iou_type, num_workers=num_workers).evaluate(predictions)
+
+    coco_gt = ch.to_coco()
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco_eval = COCOeval(coco_gt, coco_gt.loadRes(copy.deepcopy(predictions)), iou_type)
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+    assert np.array_equal(evaluation.precision, coco_eval.eval['precision'])
+    assert np.array_equal(evaluation.recall, coco_eval.eval['recall'])
+    assert np.array_equal(evaluation.scores, coco_eval.eval['scores'])
+    assert np.array_equal(evaluation.stats, coco_eval.stats)
+    assert list(evaluation.summary().values()) == coco_eval.stats.tolist()
+
+
+def test_evaluate_perfect_predictions():
+    ch = COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+    predictions = ch.anns[['image_id', 'category_id', 'bbox']].assign(score=1.)
+
+    summary = COCOEvaluator(ch).evaluate(predictions).summary()
+    assert summary['AP'] == summary['AP50'] == summary['AR100'] == 1.
+
+
+def test_evaluate_unknown_image():
+    ch = COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+    predictions = [{'image_id': ch.imgs.index.max() + 1, 'category_id': 0, 'bbox': [0, 0, 1, 1], 'score': 1.}]
+
+    with pytest.raises(ValueError):
+        COCOEvaluator(ch).evaluate(predictions)
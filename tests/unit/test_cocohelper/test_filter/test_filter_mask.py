@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from pandas import DataFrame
+
+from cocohelper.filters import AndFilter, OrFilter, NotFilter, ValueFilter, RangeFilter
+from cocohelper.filters.strategies import ALL_VALUES, NOT_IN_RANGE
+
+
+class TestFilterMask:
+
+    @pytest.fixture
+    def df(self) -> DataFrame:
+        columns = ['index', "A", "B"]
+        data = [[2, 2, 0],
+                [0, 0, 0],
+                [0, 0, 2],
+                [1, 1, 0],
+                [1, 1, 1],
+                [2, 2, 1],
+                [2, 2, 2],
+                [3, 3, 3]]
+
+        yield DataFrame(data=data, columns=columns).set_index('index')
+
+    def test_value_filter_mask(self, df):
+        assert ValueFilter([1, 2], 'B').mask(df).tolist() == [False, False, True, False, True, True, True, False]
+        assert ValueFilter([1], 'index').mask(df).tolist() == [False, False, False, True, True, False, False, False]
+        assert ValueFilter([1, 2], 'B', ALL_VALUES).mask(df).tolist() == [True, False, False, False, False,
+                                                                          True, True, False]
+
+    def test_range_filter_mask(self, df):
+        assert RangeFilter((1, 2), 'B').mask(df).tolist() == [False, False, True, False, True, True, True, False]
+        assert RangeFilter((1, 2), 'B', NOT_IN_RANGE).mask(df).tolist() == [True, True, False, True, False,
+                                                                             False, False, True]
+
+    def test_and_filter_multi_rows(self, df):
+        # index 2 has a row with A == 2 and a row with B == 1: all its rows are kept.
+        fltr = AndFilter(ValueFilter([2], 'A'), ValueFilter([1], 'B'))
+        assert fltr.mask(df).tolist() == [True, False, False, False, False, True, True, False]
+        assert fltr.apply(df).equals(df.iloc[[0, 5, 6]])
+
+    def test_or_filter_multi_rows(self, df):
+        fltr = OrFilter(ValueFilter([3], 'A'), ValueFilter([2], 'B'))
+        assert fltr.apply(df).equals(df.iloc[[0, 1, 2, 5, 6, 7]])
+
+    def test_not_filter_multi_rows(self, df):
+        fltr = NotFilter(ValueFilter([2], 'B'))
+        assert fltr.apply(df).equals(df.iloc[[3, 4, 7]])
+
+    def test_empty_compositions(self, df):
+        assert AndFilter().apply(df).equals(df)
+        assert OrFilter().apply(df).equals(df)
+        assert not NotFilter(AndFilter()).mask(df).any()
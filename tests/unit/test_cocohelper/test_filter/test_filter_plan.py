@@ -0,0 +1,52 @@
+import pytest
+from cocohelper import COCOHelper
+from cocohelper.dataframe import COCODataFrame
+from cocohelper.filters import ValueFilter, RangeFilter, AndFilter, OrFilter, NotFilter, Filter
+from cocohelper.filters.strategies import ALL_VALUES, NOT_IN_RANGE
+from cocohelper.filters.plan import FilterPlan
+
+
+class _CustomFilter(Filter):
+
+    def apply(self, df):
+        return df[df['area'] > 1000]
+
+
+class TestFilterPlan:
+
+    @pytest.fixture
+    def ch(self) -> COCOHelper:
+        return COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+
+    @pytest.fixture(params=[
+        ValueFilter([1, 2], 'image_id'),
+        ValueFilter(['balloon'], 'category_name'),
+        NotFilter(ValueFilter(['super_balloon'], 'name')),
+        AndFilter(RangeFilter((0, 5000), 'area'), RangeFilter((1400, 2000), 'width')),
+        OrFilter(ValueFilter([0], 'category_id', ALL_VALUES), RangeFilter((0, 5000), 'area', NOT_IN_RANGE)),
+        AndFilter(ValueFilter([1, 3, 5, 7], 'annotation_id'), NotFilter(ValueFilter([1], 'image_id'))),
+    ])
+    def cfilter(self, request) -> Filter:
+        return request.param
+
+    def test_plan_matches_join(self, ch, cfilter):
+        joined_anns = COCODataFrame(cfilter.apply(ch.joins.anns_cats_imgs), 'annotation')
+        expected = (ch.joins.extract_cats(joined_anns), ch.joins.extract_imgs(joined_anns),
+                    ch.joins.extract_anns(joined_anns))
+
+        filtered = FilterPlan(ch).execute(cfilter)
+
+        assert filtered is not None
+        for df, expected_df in zip(filtered, expected):
+            assert df.sort_index().equals(expected_df.sort_index())
+
+    def test_filter_does_not_join(self, ch, cfilter):
+        ch.filter(cfilter)
+        assert ch.joins.cache_stats.misses == 0
+
+    def test_custom_filter_fallback(self, ch):
+        assert FilterPlan(ch).compile(AndFilter(_CustomFilter(), ValueFilter([1], 'image_id'))) is None
+
+        chf = ch.filter(_CustomFilter())
+        assert (chf.anns['area'] > 1000).all()
+        assert set(chf.imgs.index) == set(chf.anns['image_id'])
@@ -44,3 +44,14 @@ class TestFilterStrategyUtils:
     def test_filter_rows_out_range(self, df):
         filtered_df = filter_rows_out_range((1, 2), 'B', df, inclusive="none")
         assert (filtered_df == df.iloc[[0, 2, 4, 7]]).all().all()
+
+    def test_filter_multi_rows_unsorted_index(self, df):
+        shuffled_df = df.iloc[[6, 0, 3, 1, 7, 4, 2, 5]]
+        assert filter_multi_rows_having_any([2], 'B', shuffled_df).equals(shuffled_df.iloc[[0, 1, 3, 5, 7]])
+        assert filter_multi_rows_having_all([0, 1], 'B', shuffled_df).equals(shuffled_df.iloc[[0, 2, 5, 6, 7]])
+
+    def test_filter_multi_rows_having_all_edge_cases(self, df):
+        assert filter_multi_rows_having_all([1, 1, 2], 'B', df).equals(df.loc[[2]])
+        assert filter_multi_rows_having_all(3, 'B', df).equals(df.loc[[3]])
+        assert filter_multi_rows_having_all([], 'B', df).equals(df)
+        assert len(filter_multi_rows_having_all([0, float('nan')], 'B', df)) == 0
@@ -0,0 +1,31 @@
+import pytest
+from cocohelper import COCOHelper
+
+
+@pytest.fixture
+def ch():
+    return COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+
+
+def test_copy_shares_unchanged_tables(ch):
+    ch_copy = ch.copy()
+    assert ch_copy.imgs is ch.imgs
+    assert ch_copy.anns is ch.anns
+    assert ch_copy.cats is ch.cats
+    assert ch_copy.licenses is ch.licenses
+
+    ch_filtered = ch.copy(img_df=ch.imgs.iloc[:3])
+    assert ch_filtered.cats is ch.cats
+    assert len(ch_filtered.imgs) == 3
+    assert ch_filtered.anns['image_id'].isin(ch_filtered.imgs.index).all()
+    assert len(ch.imgs) > 3
+
+
+def test_copy_does_not_share_state(ch):
+    ch_copy = ch.copy()
+    ch_copy.to_json_dataset()['info']['version'] = 'modified'
+    ch_copy.root_path = 'another/path'
+    assert ch.info['version'] != 'modified'
+    assert str(ch.root_path) != 'another/path'
+    assert ch_copy.joins is not ch.joins
+    assert ch_copy.index is not ch.index
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from cocohelper import COCOHelper
+
+
+@pytest.fixture
+def ch():
+    return COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+
+
+def test_index_is_cached(ch):
+    assert ch.index is ch.index
+
+
+def test_index_invalidated_by_copy(ch):
+    index = ch.index
+    ch_filtered = ch.filter_imgs(img_ids=[1, 2, 3])
+    assert ch_filtered.index is not index
+    assert len(ch_filtered.index.img_ann_positions(4)) == 0
+
+
+def test_index_img_ann_positions(ch):
+    for img_id in ch.imgs.index:
+        positions = ch.index.img_ann_positions(img_id)
+        expected = np.flatnonzero(ch.anns['image_id'].to_numpy() == img_id)
+        assert np.array_equal(np.sort(positions), expected)
+
+
+def test_index_img_anns_records(ch):
+    for img_id in ch.imgs.index:
+        records = ch.index.img_anns_records(img_id)
+        expected = ch.joins.anns_cats.loc[ch.filtered_anns(img_ids=img_id).index].to_dict(orient='records')
+        assert records == expected
+
+
+def test_index_img_path(ch):
+    img_id = ch.imgs.index[0]
+    assert ch.index.img_path(img_id) == ch.root_path / ch.paths.img_dir / ch.imgs.loc[img_id, 'file_name']
+    with pytest.raises(KeyError):
+        ch.index.img_path(100)
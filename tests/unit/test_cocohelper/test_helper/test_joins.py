@@ -5,6 +5,7 @@ from cocohelper import COCOHelper
 # TODO: Create new tests (not dependant from pycocotools' COCO class)
 from cocohelper.errors.validation_error import COCOValidationError
 from cocohelper.validator import COCOValidator
+from cocohelper.joins import COCOJoins
 
 
 # TODO: improve test suite, use AAA approach (Arrange, Act, Assert), use pytest test Classes and fixtures.
@@ -38,3 +39,29 @@ def test_licenses_is_defined():
 
     assert (ch_no_licenses.licenses is not None)
     assert (len(ch_no_licenses.licenses) == 0)
+
+
+def test_joins_are_cached():
+    ch_loaded = COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+    assert ch_loaded.joins is ch_loaded.joins
+
+    first = ch_loaded.joins.anns_cats_imgs
+    assert ch_loaded.joins.anns_cats_imgs is first
+    stats = ch_loaded.joins.cache_stats
+    assert stats.hits >= 1
+    assert stats.misses >= 2  # anns_cats_imgs and anns_cats
+
+
+def test_joins_cache_invalidated_by_copy():
+    ch_loaded = COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+    joined = ch_loaded.joins.anns_cats
+    ch_filtered = ch_loaded.filter_imgs(img_ids=[1, 2, 3])
+    assert ch_filtered.joins.anns_cats is not joined
+    assert len(ch_filtered.joins.anns_cats) == len(ch_filtered.anns)
+
+
+def test_joins_cache_budget():
+    ch_loaded = COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+    joins = COCOJoins(ch_loaded, max_cache_bytes=0)
+    assert joins.anns_cats is not joins.anns_cats
+    assert joins.cache_stats.hits == 0
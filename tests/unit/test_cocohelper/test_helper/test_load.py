@@ -1,6 +1,7 @@
 import json
 import os
 from os.path import join, dirname
+from pathlib import Path
 
 import pytest
 
@@ -46,3 +47,66 @@ class TestFilteredImgsGetter:
     def test_load_from_json_dict(self, dict_data, coco_dir, ann_dir_name):
         coco = COCOHelper.load_data(dict_data, coco_dir=dirname(coco_dir), ann_dir=ann_dir_name)
         assert coco is not None
+
+    def test_load_from_json_file_path_streaming(self, json_file_path):
+        coco = COCOHelper.load_json(json_file_path)
+        coco_streamed = COCOHelper.load_json(json_file_path, stream=True)
+        assert coco.anns.equals(coco_streamed.anns)
+        assert coco.imgs.equals(coco_streamed.imgs)
+        assert coco.cats.equals(coco_streamed.cats)
+        assert coco.licenses.equals(coco_streamed.licenses)
+        assert coco.info == coco_streamed.info
+
+    def test_load_streaming_skip_columns(self, json_file_path):
+        coco = COCOHelper.load_json(json_file_path, stream=True, skip_columns=['segmentation'])
+        assert 'segmentation' not in coco.anns.columns
+        assert 'bbox' in coco.anns.columns
+
+    def test_save_load_cache(self, json_file_path, tmp_path):
+        coco = COCOHelper.load_json(json_file_path)
+        cache_dir = coco.save_cache(tmp_path / 'cache')
+        coco_cached = COCOHelper.load_cache(cache_dir)
+        assert coco_cached.to_json_dataset() == coco.to_json_dataset()
+        assert coco_cached.paths == coco.paths
+        assert str(coco_cached.root_path) == str(coco.root_path)
+
+    def test_load_json_use_cache(self, json_file_path, tmp_path):
+        json_file = tmp_path / 'annotations' / 'coco.json'
+        json_file.parent.mkdir()
+        json_file.write_text(Path(json_file_path).read_text())
+        coco = COCOHelper.load_json(str(json_file), use_cache=True)
+        assert (tmp_path / 'annotations' / 'coco.json.cache').is_dir()
+
+        coco_cached = COCOHelper.load_json(str(json_file), use_cache=True)
+        assert coco_cached.to_json_dataset() == coco.to_json_dataset()
+        assert coco_cached.paths == coco.paths
+
+        # a modified json file invalidates the cache:
+        data = json.loads(json_file.read_text())
+        data['images'] = data['images'][:1]
+        json_file.write_text(json.dumps(data))
+        coco_updated = COCOHelper.load_json(str(json_file), use_cache=True)
+        assert len(coco_updated.imgs) == 1
+
+    def test_load_json_ignores_saved_cache(self, json_file_path, tmp_path):
+        json_file = tmp_path / 'annotations' / 'coco.json'
+        json_file.parent.mkdir()
+        json_file.write_text(Path(json_file_path).read_text())
+        coco = COCOHelper.load_json(str(json_file), use_cache=True)
+
+        # the cache of a filtered dataset is written where load_json looks for it, but is not bound to the json file:
+        coco.filter_imgs(img_ids=[1, 2]).save_cache()
+        coco_reloaded = COCOHelper.load_json(str(json_file), use_cache=True)
+        assert coco_reloaded.to_json_dataset() == coco.to_json_dataset()
+
+    @pytest.mark.parametrize('content', [b'', b'corrupted'])
+    def test_load_json_corrupted_cache(self, json_file_path, tmp_path, content):
+        json_file = tmp_path / 'annotations' / 'coco.json'
+        json_file.parent.mkdir()
+        json_file.write_text(Path(json_file_path).read_text())
+        coco = COCOHelper.load_json(str(json_file), use_cache=True)
+
+        for objects_file in (tmp_path / 'annotations' / 'coco.json.cache').rglob('objects.pkl'):
+            objects_file.write_bytes(content)
+        coco_reloaded = COCOHelper.load_json(str(json_file), use_cache=True)
+        assert coco_reloaded.to_json_dataset() == coco.to_json_dataset()
@@ -1,3 +1,5 @@
+import gzip
+import json
 import pytest
 from shutil import rmtree
 from cocohelper import COCOHelper
@@ -30,3 +32,25 @@ def test_save(ch):
 
     ch_saved = COCOHelper.load_json('tests/data/coco_dataset_saved/annotations/coco.json')
     assert COCOValidator(ch_saved.to_json_dataset(), 'tests/data/coco_dataset_saved/annotations').validate_dataset()
+
+
+def test_write_annotations_file(ch, tmp_path):
+    ann_file = tmp_path / 'annotations' / 'coco.json'
+    ch.write_annotations_file(ann_file, chunk_size=3)
+    assert ann_file.read_text() == json.dumps(ch.to_json_dataset(), indent=4)
+
+
+@pytest.mark.parametrize('fname', ['coco.json', 'coco.json.gz'])
+def test_write_annotations_file_compact(ch, tmp_path, fname):
+    ann_file = tmp_path / 'annotations' / fname
+    ch.write_annotations_file(ann_file, compact=True)
+
+    if fname.endswith('.gz'):
+        with gzip.open(ann_file, 'rt') as f:
+            content = f.read()
+    else:
+        content = ann_file.read_text()
+    assert content == json.dumps(ch.to_json_dataset(), separators=(',', ':'))
+    for stream in [False, True]:
+        ch_saved = COCOHelper.load_json(str(ann_file), stream=stream)
+        assert ch_saved.to_json_dataset() == ch.to_json_dataset()
@@ -1,6 +1,9 @@
+import numpy as np
+import pandas as pd
 import pytest
 from cocohelper import COCOHelper
 from cocohelper.errors.validation_error import COCOValidationError
+from cocohelper.validator import COCODataFrameValidator
 
 
 @pytest.fixture
@@ -45,3 +48,34 @@ def test_validations(ch, ch_invalid):
     assert not is_data_valid
     assert len(error_dict) == 11
     assert sum(error_dict.values()) == 10
+
+
+def test_validation_offending_ids(ch_invalid):
+    validator = ch_invalid.validator
+    is_data_valid, error_dict = validator.validate_dataset()
+
+    assert not error_dict['annotations_have_valid_image_id']
+    invalid_ann_ids = validator.offending_ids['annotations_have_valid_image_id']
+    anns = ch_invalid.anns.loc[invalid_ann_ids]
+    assert len(invalid_ann_ids) > 0
+    assert not anns['image_id'].isin(ch_invalid.imgs.index).any()
+    assert ch_invalid.anns.drop(index=invalid_ann_ids)['image_id'].isin(ch_invalid.imgs.index).all()
+
+
+def test_validation_reports_invalid_rows(ch):
+    imgs = pd.concat([ch.imgs, ch.imgs.iloc[:1]])
+    imgs.iloc[1, imgs.columns.get_loc('width')] = np.nan
+    anns = ch.anns.copy()
+    anns.loc[anns.index[0], 'iscrowd'] = 2
+    anns.loc[anns.index[1], 'bbox'] = None
+    validator = COCODataFrameValidator(imgs, anns, ch.cats, ch.licenses, dataset_dir=ch.root_path)
+
+    is_data_valid, error_dict = validator.validate_dataset()
+
+    assert not is_data_valid
+    assert [k for k, v in error_dict.items() if not v] == ['images_have_mandatory_keys',
+                                                           'annotations_have_mandatory_keys',
+                                                           'image_ids_are_unique']
+    assert list(validator.offending_ids['images_have_mandatory_keys']) == [imgs.index[1]]
+    assert list(validator.offending_ids['annotations_have_mandatory_keys']) == sorted(anns.index[:2])
+    assert list(validator.offending_ids['image_ids_are_unique']) == [imgs.index[0]]
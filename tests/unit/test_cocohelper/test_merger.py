@@ -1,8 +1,10 @@
+import json
 from typing import List
 import pandas as pd
 import pytest
 
 from cocohelper import COCOHelper
+from cocohelper.merge import merge_coco, merge_coco_files
 
 
 # TODO: improve test suite, use AAA approach (Arrange, Act, Assert), use pytest test Classes and fixtures.
@@ -130,3 +132,50 @@ def __df2records(df: pd.DataFrame):
 def __records_footprint(records: List[dict]) -> List[str]:
     return [str(d.values()) for d in records]
 
+
+
+# TEST STREAMING MERGE
+
+@pytest.mark.parametrize('drop_duplicates', [True, False])
+def test_merge_coco_files(ch1, ch2, tmp_path, drop_duplicates):
+    out_file = merge_coco_files(['tests/data/coco_merge1/annotations/coco.json', ch2, ch1],
+                                tmp_path / 'annotations' / 'coco.json', drop_duplicates=drop_duplicates)
+    ch_streamed = COCOHelper.load_json(str(out_file))
+    ch_merged = merge_coco(ch1, ch2, ch1, drop_duplicates=drop_duplicates)
+
+    assert ch_streamed.imgs.equals(ch_merged.imgs)
+    assert ch_streamed.licenses.equals(ch_merged.licenses)
+    # categories with the same name and supercategory are always merged (and renumbered):
+    assert ch_streamed.cats.values.tolist() == ch_merged.cats.drop_duplicates().values.tolist()
+    assert __anns_with_cat_names(ch_streamed).equals(__anns_with_cat_names(ch_merged))
+    assert len(ch_streamed.info['merged_infos']) == 3
+
+
+def test_merge_coco_files_without_annotations(ch1, ch2, tmp_path):
+    sources = [ch1.copy(ann_df=ch1.anns.iloc[:0]), ch2.copy(img_df=ch2.imgs.iloc[:0], ann_df=ch2.anns.iloc[:0])]
+    out_file = merge_coco_files(sources, tmp_path / 'annotations' / 'coco.json')
+    with open(out_file) as f:
+        assert json.load(f)['annotations'] == []
+    assert COCOHelper.load_json(str(out_file)).imgs.equals(ch1.imgs)
+
+    out_file = merge_coco_files(sources[1:], tmp_path / 'annotations' / 'coco.json')
+    with open(out_file) as f:
+        json_data = json.load(f)
+    assert json_data['images'] == json_data['annotations'] == []
+
+
+def __anns_with_cat_names(ch: COCOHelper) -> pd.DataFrame:
+    cat_names = ch.cats.loc[ch.anns['category_id'], ['supercategory', 'name']]
+    return ch.anns.drop(columns='category_id').assign(supercategory=cat_names['supercategory'].to_numpy(),
+                                                      name=cat_names['name'].to_numpy())
+
+
+def test_drop_duplicates_single_pass(ch_merged_with_duplicates):
+    chained = ch_merged_with_duplicates.drop_duplicate_cats().drop_duplicate_imgs().drop_duplicate_anns() \
+        .drop_duplicate_licenses()
+    single_pass = ch_merged_with_duplicates.drop_duplicates()
+
+    assert single_pass.cats.equals(chained.cats)
+    assert single_pass.imgs.equals(chained.imgs)
+    assert single_pass.anns.equals(chained.anns)
+    assert single_pass.licenses.equals(chained.licenses)
@@ -3,6 +3,7 @@ from cocohelper.splitters.proportional import ProportionalDataSplitter
 from cocohelper.splitters.kfold import KFoldSplitter
 from cocohelper.splitters.stratified import StratifiedDataSplitter
 import pytest
+import random
 
 
 @pytest.fixture()
@@ -96,3 +97,49 @@ def test_kfold_iter(ch):
         assert len(val.imgs) == 2
         i += 1
     assert i == 7
+
+
+def test_stratified_split_assigns_all_images(ch):
+    splitter = StratifiedDataSplitter(1, 2, 1)
+    splits = splitter.apply(ch)
+
+    img_ids = [img_id for split in splits for img_id in split.imgs.index]
+    assert sorted(img_ids) == sorted(ch.imgs.index)
+
+
+def test_split_seed(ch):
+    for splitter_cls in (ProportionalDataSplitter, StratifiedDataSplitter):
+        splits1 = splitter_cls(1, 1, 1, seed=42).apply(ch)
+        splits2 = splitter_cls(1, 1, 1, seed=42).apply(ch)
+        for split1, split2 in zip(splits1, splits2):
+            assert list(split1.imgs.index) == list(split2.imgs.index)
+
+
+def test_split_global_seed(ch):
+    # without a seed, the splits are reproducible with the module-level generator of `random`:
+    for splitter in (ProportionalDataSplitter(1, 1, 1), StratifiedDataSplitter(1, 1, 1), KFoldSplitter(n_fold=3)):
+        random.seed(42)
+        ids1 = [list(split.imgs.index) for split in splitter.apply(ch)]
+        random.seed(42)
+        ids2 = [list(split.imgs.index) for split in splitter.apply(ch)]
+        assert ids1 == ids2
+
+
+def test_kfold_plan(ch):
+    splitter = KFoldSplitter(n_fold=7, seed=0)
+    plan = splitter.plan(ch)
+    assert len(plan) == 7
+
+    all_val_ids = []
+    for train_ids, val_ids in plan:
+        assert len(train_ids) == 12
+        assert len(val_ids) == 2
+        assert set(train_ids) | set(val_ids) == set(ch.imgs.index)
+        all_val_ids.extend(val_ids)
+    assert sorted(all_val_ids) == sorted(ch.imgs.index)
+
+    for (train_ids, val_ids), (train, val) in zip(sorted(plan, key=lambda f: min(f[1])),
+                                                  sorted(splitter.iter(ch), key=lambda f: min(f[1].imgs.index))):
+        assert set(train.imgs.index) == set(train_ids)
+        assert set(val.imgs.index) == set(val_ids)
+        assert val.cats is ch.cats
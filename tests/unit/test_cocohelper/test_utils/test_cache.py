@@ -0,0 +1,43 @@
+import copy
+import numpy as np
+import pytest
+from cocohelper.utils.cache import LRUCache
+
+
+@pytest.fixture
+def cache():
+    return LRUCache(max_bytes=300, sizeof=lambda arr: arr.nbytes)
+
+
+def test_get_put(cache):
+    arr = np.zeros(10, dtype=np.uint8)
+    assert cache.put('a', arr)
+    assert cache.get('a') is arr
+    assert cache.get('b') is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.nbytes == 10
+
+
+def test_lru_eviction(cache):
+    for key in 'abc':
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    cache.get('a')  # 'b' becomes the least recently used
+    cache.put('d', np.zeros(100, dtype=np.uint8))
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.stats.evictions == 1
+    assert cache.nbytes == 300
+
+
+def test_item_larger_than_budget(cache):
+    assert not cache.put('a', np.zeros(301, dtype=np.uint8))
+    assert len(cache) == 0
+
+
+def test_deepcopy(cache):
+    cache.put('a', np.zeros(10, dtype=np.uint8))
+    cache_copy = copy.deepcopy(cache)
+    assert 'a' in cache_copy
+    assert cache_copy.put('b', np.zeros(10, dtype=np.uint8))
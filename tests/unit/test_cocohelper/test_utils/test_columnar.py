@@ -0,0 +1,44 @@
+import json
+import numpy as np
+import pytest
+from pandas import DataFrame
+from cocohelper.utils.columnar import save_tables, load_tables
+
+
+@pytest.fixture
+def tables() -> dict:
+    anns = DataFrame.from_records([
+        {"id": 1, "image_id": 0, "bbox": [1, 2, 3, 4], "area": 1.5, "segmentation": [[1.0, 2.5, 3.0, 4.0]]},
+        {"id": 2, "image_id": 0, "bbox": [1, 2.5, 3, 4], "area": 2.0, "segmentation": {"size": [2, 2], "counts": "12"}},
+        {"id": 3, "image_id": 1, "bbox": [], "area": None, "segmentation": [[1.0, 2.0], []]},
+        {"id": 4, "image_id": 1, "bbox": None, "area": 3.0, "segmentation": [[1, 2, 3]]},
+    ]).set_index("id")
+    imgs = DataFrame.from_records([{"id": 0, "file_name": "a.jpg"}, {"id": 1, "file_name": "b.jpg"}]).set_index("id")
+    empty = DataFrame(columns=["id", "name", "url"]).set_index("id")
+    return {"annotations": anns, "images": imgs, "licenses": empty}
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load_tables(tmp_path, tables, mmap):
+    save_tables(tmp_path, tables, meta={"info": {"year": 2023}})
+    loaded, meta = load_tables(tmp_path, mmap=mmap)
+
+    assert meta == {"info": {"year": 2023}}
+    assert loaded.keys() == tables.keys()
+    for name, df in tables.items():
+        assert loaded[name].equals(df)
+        assert loaded[name].index.name == df.index.name
+        assert list(loaded[name].dtypes) == list(df.dtypes)
+        # number types are preserved, so the tables are serialized back to the same json:
+        assert json.dumps(loaded[name].to_dict("records")) == json.dumps(df.to_dict("records"))
+
+
+def test_load_tables_mmap(tmp_path, tables):
+    save_tables(tmp_path, tables)
+    loaded, _ = load_tables(tmp_path)
+    assert isinstance(loaded["annotations"]["image_id"].to_numpy().base, np.memmap)
+
+
+def test_load_tables_missing(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_tables(tmp_path)
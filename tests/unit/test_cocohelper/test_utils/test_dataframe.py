@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from cocohelper.utils.dataframe import remap_ids, row_fingerprints, drop_duplicate_rows, fix_fk_after_drop_duplicate
+
+
+def test_remap_ids():
+    ids = pd.Series([3, 1, 7, 3], index=[10, 11, 12, 13], name='category_id')
+
+    remapped = remap_ids(ids, old_ids=np.array([1, 3, 3]), new_ids=np.array([100, 200, 300]))
+
+    # ids not found are kept, the last occurrence of duplicate old ids is used:
+    assert remapped.tolist() == [300, 100, 7, 300]
+    assert remapped.index.tolist() == ids.index.tolist()
+    assert remapped.name == 'category_id'
+    assert remapped.dtype == np.int64
+    assert remap_ids(ids, np.empty(0), np.empty(0)).tolist() == ids.tolist()
+
+
+def test_row_fingerprints():
+    df1 = pd.DataFrame({'name': ['a', 'b', 'a'], 'width': [1, 2, 1]}, index=[0, 1, 2])
+    df2 = pd.DataFrame({'width': [1., 2.], 'name': ['a', 'c'], 'extra': [np.nan, 3]}, index=[5, 6])
+
+    fingerprints1 = row_fingerprints(df1)
+    fingerprints2 = row_fingerprints(df2)
+
+    # the index and the columns order are not considered, missing values are the same as missing columns:
+    assert fingerprints1[0] == fingerprints1[2] == fingerprints2[0]
+    assert len({fingerprints1[1], fingerprints2[1], fingerprints1[0]}) == 3
+    assert (row_fingerprints(df1, ignore_columns=['width']) == row_fingerprints(df1[['name']])).all()
+
+
+def test_row_fingerprints_containers():
+    df = pd.DataFrame({
+        'bbox': [[1, 2, 3, 4], [1., 2., 3., 4.], (1, 2, 3, 5), np.array([1, 2, 3, 4])],
+        'segmentation': [[[0, 0, 1, 1], [2, 2]], [[0., 0., 1., 1.], [2., 2.]], {'size': [1, 2], 'counts': 'a'},
+                         [[0, 0, 1, 1], [2, 2]]],
+    })
+
+    fingerprints = row_fingerprints(df)
+
+    # numbers are compared as floats, whatever container they are in:
+    assert fingerprints[0] == fingerprints[1] == fingerprints[3]
+    assert fingerprints[2] != fingerprints[0]
+    assert row_fingerprints(pd.DataFrame({'rle': [{'counts': 'a', 'size': [1., 2.]}]}))[0] == \
+        row_fingerprints(pd.DataFrame({'rle': [{'size': [1, 2], 'counts': 'a'}]}))[0]
+
+
+def test_drop_duplicate_rows():
+    df = pd.DataFrame({'image_id': [1, 1, 2, 1], 'bbox': [[0, 0, 1, 1], [0, 0, 1, 1], [0, 0, 1, 1], [0, 0, 2, 2]]},
+                      index=pd.Index([10, 11, 12, 13], name='annotation_id'))
+
+    dropped, (old_ids, new_ids) = drop_duplicate_rows(df)
+
+    assert dropped.index.tolist() == [10, 12, 13]
+    assert old_ids.tolist() == [10, 11, 12, 13]
+    assert new_ids.tolist() == [10, 10, 12, 13]
+    assert drop_duplicate_rows(df, ignore_columns=['bbox'])[0].index.tolist() == [10, 12]
+
+    fks = pd.DataFrame({'annotation_id': [11, 13, 99]})
+    assert fix_fk_after_drop_duplicate(fks.copy(), 'annotation_id', (old_ids, new_ids))['annotation_id'].tolist() == \
+        fix_fk_after_drop_duplicate(fks.copy(), 'annotation_id', {11: 10})['annotation_id'].tolist() == [10, 13, 99]
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cocohelper import COCOHelper
+from cocohelper.utils.image import read_image, downsample_image, ImageCache, ImagePrefetcher
+
+
+@pytest.fixture
+def ch():
+    return COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L'])
+def test_read_image_backends(tmp_path, mode):
+    rng = np.random.default_rng(0)
+    channels = {'RGB': (3,), 'RGBA': (4,), 'L': ()}[mode]
+    array = rng.integers(0, 256, (20, 30) + channels, dtype=np.uint8)
+    path = tmp_path / 'image.png'
+    Image.fromarray(array, mode=mode).save(path)
+
+    assert np.array_equal(read_image(path), array)
+    assert np.array_equal(read_image(path, backend='cv2'), array)
+    with pytest.raises(ValueError):
+        read_image(path, backend='unknown')
+
+
+@pytest.mark.parametrize('shape, max_size, expected', [((100, 50, 3), 20, (20, 10, 3)),
+                                                      ((50, 101), 10, (5, 10)),
+                                                      ((30, 40, 4), 40, (30, 40, 4))])
+def test_downsample_image(shape, max_size, expected):
+    image = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    assert downsample_image(image, max_size).shape == expected
+
+
+def test_image_cache(ch):
+    img_ids = ch.imgs.index[:3].tolist()
+    full_size = ch.get_img(img_ids[0]).nbytes
+    cached = ch.with_img_cache(int(2.5 * full_size))
+
+    for img_id in img_ids + img_ids[::-1]:
+        assert np.array_equal(cached.get_img(img_id), ch.get_img(img_id))
+    stats = cached.img_cache.stats
+    # the first image is evicted when the third one is loaded, then reloaded:
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 4, 2)
+    assert cached.img_cache.nbytes <= cached.img_cache.max_bytes
+    assert ch.img_cache is None
+
+
+def test_image_cache_copies(ch):
+    cached = ch.with_img_cache(ImageCache(max_bytes=10 ** 8))
+    img_id = ch.imgs.index[0]
+
+    image = cached.get_img(img_id)
+    image[:] = 0
+    assert np.array_equal(cached.get_img(img_id), ch.get_img(img_id))
+    # the copies (e.g. filtered datasets) share the cache:
+    assert cached.copy(img_df=ch.imgs.iloc[:1]).img_cache is cached.img_cache
+
+
+def test_image_cache_downsampled(ch):
+    cached = ch.with_img_cache(10 ** 8)
+    img_id = ch.imgs.index[0]
+
+    small = cached.get_img(img_id, max_size=64)
+    assert max(small.shape[:2]) == 64
+    assert np.array_equal(cached.get_img(img_id, max_size=64), small)
+    assert cached.get_img(img_id).shape == ch.get_img(img_id).shape
+    assert len(cached.img_cache) == 2
+    assert cached.img_cache.stats.hits == 1
+
+
+def test_iter_imgs(ch):
+    img_ids = ch.imgs.index[::-1].tolist()
+
+    loaded = list(ch.iter_imgs(img_ids, num_workers=3, queue_depth=2, backend='cv2'))
+    assert [img_id for img_id, _ in loaded] == img_ids
+    for img_id, image in loaded:
+        assert np.array_equal(image, ch.get_img(img_id))
+
+
+def test_prefetcher_ordered_delivery():
+    def load(key):
+        time.sleep(0.01 * (key % 3))
+        return np.full(2, key)
+
+    prefetcher = ImagePrefetcher(load, list(range(20)), num_workers=4, queue_depth=5)
+    assert len(prefetcher) == 20
+    assert [(key, image[0]) for key, image in prefetcher] == [(key, key) for key in range(20)]
+
+
+def test_prefetcher_queue_depth():
+    started = {key: threading.Event() for key in range(100)}
+
+    def load(key):
+        started[key].set()
+        return np.zeros(1)
+
+    prefetcher = iter(ImagePrefetcher(load, list(range(100)), num_workers=2, queue_depth=3))
+    next(prefetcher)
+    # the loads are submitted by the consumer: the first image and the next 3 ones, and no other image.
+    assert all(started[key].wait(timeout=10) for key in range(4))
+    assert not any(event.is_set() for event in list(started.values())[4:])
+    prefetcher.close()
+
+
+def test_prefetcher_errors():
+    def load(key):
+        if key == 3:
+            raise FileNotFoundError(key)
+        return np.zeros(1)
+
+    prefetcher = iter(ImagePrefetcher(load, list(range(10)), num_workers=2, queue_depth=4))
+    assert [next(prefetcher)[0] for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(FileNotFoundError):
+        next(prefetcher)
+    with pytest.raises(ValueError):
+        ImagePrefetcher(load, [], num_workers=0)
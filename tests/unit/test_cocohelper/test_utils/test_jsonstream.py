@@ -0,0 +1,88 @@
+import io
+import json
+import pytest
+from pandas import DataFrame
+from cocohelper.utils.jsonstream import read_coco_tables, JsonObjectWriter
+
+
+@pytest.fixture
+def json_data() -> dict:
+    return {
+        "info": {"version": "1.0", "year": 2023},
+        "images": [{"id": 0, "file_name": "a.jpg"}, {"id": 1, "file_name": "b.jpg", "license": 3}],
+        "annotations": [{"id": 10, "image_id": 0, "bbox": [1.5, 2, 3, 4], "segmentation": [[1, 2, 3, 4, 5, 6]]}],
+        "categories": [],
+        "extra": 12345,
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 2 ** 20])
+def test_read_coco_tables(json_data, chunk_size):
+    data = read_coco_tables(io.StringIO(json.dumps(json_data, indent=2)), chunk_size=chunk_size)
+
+    assert data["info"] == json_data["info"]
+    assert data["extra"] == json_data["extra"]
+    for table in ["images", "annotations", "categories"]:
+        assert isinstance(data[table], DataFrame)
+        assert data[table].equals(DataFrame.from_records(json_data[table]))
+
+
+def test_read_coco_tables_skip_columns(json_data):
+    data = read_coco_tables(io.StringIO(json.dumps(json_data)), skip_columns=["segmentation"])
+    assert list(data["annotations"].columns) == ["id", "image_id", "bbox"]
+
+
+def test_read_coco_tables_invalid_json():
+    with pytest.raises(json.JSONDecodeError):
+        read_coco_tables(io.StringIO('{"images": [{"id": 0}'))
+
+
+@pytest.mark.parametrize("indent", [None, 0, 4])
+def test_json_object_writer(json_data, indent):
+    out = io.StringIO()
+    with JsonObjectWriter(out, indent=indent) as writer:
+        writer.write("info", json_data["info"])
+        writer.write_array("images", iter(json_data["images"]))
+        writer.write_array("annotations", json_data["annotations"])
+        writer.write_array("categories", [])
+        writer.write("extra", json_data["extra"])
+    assert out.getvalue() == json.dumps(json_data, indent=indent)
+
+
+def test_json_object_writer_append(json_data):
+    out = io.StringIO()
+    with JsonObjectWriter(out, indent=2) as writer:
+        writer.write("info", json_data["info"])
+        writer.write("extra", json_data["extra"])
+        for image, ann in zip(json_data["images"], json_data["annotations"] + [None]):
+            writer.append("images", image)
+            if ann is not None:
+                writer.append("annotations", ann)
+    expected = {key: json_data[key] for key in ["info", "extra", "images", "annotations"]}
+    assert out.getvalue() == json.dumps(expected, indent=2)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_object_writer_declare_array(json_data, indent):
+    out = io.StringIO()
+    with JsonObjectWriter(out, indent=indent) as writer:
+        writer.write("info", json_data["info"])
+        writer.declare_array("images")
+        writer.declare_array("annotations")
+        writer.append("images", json_data["images"][0])
+    expected = {"info": json_data["info"], "images": json_data["images"][:1], "annotations": []}
+    assert out.getvalue() == json.dumps(expected, indent=indent)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_object_writer_extend(json_data, indent):
+    out = io.StringIO()
+    with JsonObjectWriter(out, indent=indent) as writer:
+        writer.write("info", json_data["info"])
+        writer.extend("images", json_data["images"][:1])
+        writer.extend("annotations", [])
+        writer.append("images", json_data["images"][1])
+        writer.extend("images", json_data["images"][2:])
+        writer.extend("annotations", json_data["annotations"])
+    expected = {key: json_data[key] for key in ["info", "images", "annotations"]}
+    assert out.getvalue() == json.dumps(expected, indent=indent)
@@ -6,6 +6,7 @@ from cocohelper.utils.segmentation import (
     mask_to_compressed_rle,
     mask_to_polygon,
     mask_to_rle,
+    masks_to_rle,
     rle_to_mask,
     compressed_rle_to_mask,
     polygon_to_mask,
@@ -89,6 +90,48 @@ def test_mask_to_rle(mask):
     assert np.array_equal(mask, decoded_mask)
 
 
+def _reference_rle(binary_mask):
+    # pixel by pixel encoding, as in the COCO format definition:
+    counts = []
+    last_elem = 0
+    running_length = 0
+    for elem in binary_mask.ravel(order='F'):
+        if elem != last_elem:
+            counts.append(running_length)
+            running_length = 0
+            last_elem = elem
+        running_length += 1
+    counts.append(running_length)
+    return {'counts': counts, 'size': list(binary_mask.shape)}
+
+
+def test_mask_to_rle_reference(mask):
+    rng = np.random.default_rng(0)
+    masks = [mask, 1 - mask, np.zeros((3, 4)), np.ones((4, 3)), np.zeros((0, 5)), rng.random((17, 9)) > 0.5]
+    for m in masks:
+        assert mask_to_rle(m) == _reference_rle(m)
+
+
+def test_masks_to_rle(mask):
+    rng = np.random.default_rng(0)
+    masks = np.stack([mask, 1 - mask, np.zeros_like(mask), np.ones_like(mask), rng.integers(0, 2, mask.shape)])
+    rles = masks_to_rle(masks)
+    assert rles == [_reference_rle(m) for m in masks]
+    for m, rle in zip(masks, rles):
+        assert np.array_equal(m, rle_to_mask(rle))
+
+
+def test_encode_cropped_mask(mask):
+    # a mask with the bottom-right object only, and a crop around it:
+    single_object = np.zeros_like(mask)
+    single_object[4:, 4:] = mask[4:, 4:]
+    crop, offset = single_object[3:, 3:], (3, 3)
+
+    for mode in ['RLE', 'cRLE', 'polygon']:
+        encoded = encode_mask(crop, mode, offset=offset, size=mask.shape)
+        assert encoded == encode_mask(single_object, mode)
+
+
 def test_get_segmentation_mode_exception():
     try:
         # Determine the format of the encoded mask
@@ -0,0 +1,92 @@
+import pickle
+
+import numpy as np
+import pytest
+from pycocotools import mask as coco_mask
+
+from cocohelper import COCOHelper
+from cocohelper import views
+from cocohelper.views import COCODatasetView, COCOIterableView
+
+
+@pytest.fixture
+def ch():
+    return COCOHelper.load_json('tests/data/coco_dataset/annotations/coco.json')
+
+
+def test_view_as_img_sample(ch):
+    view = ch.dataset_view(segmentation=True)
+
+    assert len(view) == len(ch.imgs)
+    for idx in range(len(view)):
+        img_id = ch.imgs.index[idx]
+        img, anns = ch.get_img_sample(img_id=img_id)
+        sample = view[idx]
+        assert sample['image_id'] == img_id
+        assert sample['file_name'] == img['file_name']
+        assert (sample['height'], sample['width']) == (img['height'], img['width'])
+        assert np.array_equal(sample['image'], img['image'])
+        assert sample['ann_ids'].tolist() == ch.anns.index[ch.index.img_ann_positions(img_id)].tolist()
+        assert sample['boxes'].tolist() == [ann['bbox'] for ann in anns]
+        assert sample['category_ids'].tolist() == [ann['category_id'] for ann in anns]
+        assert sample['areas'].tolist() == [ann['area'] for ann in anns]
+        assert sample['iscrowd'].tolist() == [ann['iscrowd'] for ann in anns]
+        assert [[poly.tolist() for poly in segm] for segm in sample['segmentations']] == \
+            [ann['segmentation'] for ann in anns]
+
+
+def test_view_img_ids(ch):
+    img_ids = ch.imgs.index[::-2].tolist()
+    view = COCODatasetView(ch, img_ids=img_ids, load_images=False)
+
+    assert view.img_ids.tolist() == img_ids
+    assert [sample['image_id'] for sample in view] == img_ids
+    assert 'image' not in view[0]
+    with pytest.raises(IndexError):
+        view[len(img_ids)]
+    with pytest.raises(ValueError):
+        COCODatasetView(ch, img_ids=img_ids + img_ids[:1])
+    with pytest.raises(ValueError):
+        COCODatasetView(ch, img_ids=[ch.imgs.index.max() + 1])
+
+
+def test_view_rle_segmentation(ch):
+    img_id = ch.imgs.index[0]
+    height, width = ch.imgs.loc[img_id, ['height', 'width']].astype(int)
+    anns = ch.anns.copy()
+    rle = coco_mask.frPyObjects(anns['segmentation'].iloc[0], height, width)[0]
+    anns['segmentation'] = [rle] + anns['segmentation'].iloc[1:].tolist()
+    anns['image_id'] = [img_id] + anns['image_id'].iloc[1:].tolist()
+
+    sample = COCODatasetView(ch.copy(ann_df=anns), img_ids=[img_id], load_images=False, segmentation=True)[0]
+    assert sample['segmentations'][0] == rle
+
+
+def test_view_is_picklable(ch):
+    view = COCODatasetView(ch, load_images=False, transform=None)
+    restored = pickle.loads(pickle.dumps(view))
+
+    assert [sample['ann_ids'].tolist() for sample in restored] == [sample['ann_ids'].tolist() for sample in view]
+
+
+def test_iterable_view_shuffle(ch):
+    view = COCODatasetView(ch, load_images=False)
+    iterable = COCOIterableView(view, shuffle=True, seed=0)
+
+    first = [sample['image_id'] for sample in iterable]
+    assert first == [sample['image_id'] for sample in iterable]
+    assert sorted(first) == sorted(view.img_ids.tolist())
+    iterable.set_epoch(1)
+    assert sorted([sample['image_id'] for sample in iterable]) == sorted(first)
+
+
+@pytest.mark.parametrize('seed', [None, 3])
+def test_iterable_view_workers(ch, monkeypatch, seed):
+    iterable = COCOIterableView(COCODatasetView(ch, load_images=False), shuffle=True, seed=seed)
+
+    num_workers = 3
+    img_ids = []
+    for worker_id in range(num_workers):
+        monkeypatch.setattr(views, '_worker_shard', lambda: (worker_id, num_workers))
+        img_ids += [sample['image_id'] for sample in iterable]
+    assert sorted(img_ids) == sorted(ch.imgs.index.tolist())
@@ -14,6 +14,14 @@ def test_load_images():
     assert img.shape == (2048, 1323, 3)
 
 
+def test_load_images_with_cache():
+    cached_visualizer = COCOVisualizer(ch, img_cache=10 ** 8)
+    img = cached_visualizer.load_image_array(0)
+    assert (img == cached_visualizer.load_image_array(0)).all()
+    assert cached_visualizer.load_image_array(0, max_size=256).shape == (256, 165, 3)
+    assert cached_visualizer.helper.img_cache.stats.hits == 1
+
+
 def test_draw_bounding_box_with_float():
     img = visualizer.load_image_array(0)
     visualizer.draw_bounding_box(img, (10.9, 10.9, 20.2, 20.2), (255, 255, 255), "bbox")